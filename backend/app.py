@@ -2,30 +2,102 @@ from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
+import sys
 
-# Load environment variables
-load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)
+def create_app() -> Flask:
+    """
+    Build the Flask app for this process. Nothing connects to Supabase here:
+    the client is created by the first query of each (forked) worker.
+    """
+    # Load environment variables before the modules below read their settings
+    load_dotenv()
 
-# Import and register blueprints
-from routes.gifts import gifts_bp
-from routes.capsules import capsules_bp
-from routes.music import music_bp
+    # Initialize Flask app
+    app = Flask(__name__)
+    CORS(app)
 
-app.register_blueprint(gifts_bp, url_prefix='/api/gifts')
-app.register_blueprint(capsules_bp, url_prefix='/api/capsules')
-app.register_blueprint(music_bp, url_prefix='/api/music')
+    # orjson when installed (JSON_PROVIDER), and gzip/brotli for larger JSON bodies
+    from utils.json_provider import get_json_provider_class
+    from utils.compression import install_compression
+    app.json = get_json_provider_class()(app)
+    install_compression(app)
 
-@app.route('/')
-def index():
-    return {'message': 'GiftCapsule API is running'}, 200
+    # Per-route latency histograms, split into Supabase/SMTP/render time (served on /metrics)
+    from utils.metrics import instrument_app
+    instrument_app(app)
+
+    # Per-client token buckets and per-route concurrency caps, checked before any handler runs
+    from utils.admission import install_admission_control, get_admission_controller
+    install_admission_control(app)
+
+    # Import and register blueprints
+    from routes.gifts import gifts_bp
+    from routes.capsules import capsules_bp
+    from routes.music import music_bp
+    from routes.exports import exports_bp
+    from routes.media import media_bp
+    from routes.metrics import metrics_bp
+
+    app.register_blueprint(gifts_bp, url_prefix='/api/gifts')
+    app.register_blueprint(capsules_bp, url_prefix='/api/capsules')
+    app.register_blueprint(music_bp, url_prefix='/api/music')
+    app.register_blueprint(exports_bp, url_prefix='/api/exports')
+    app.register_blueprint(media_bp, url_prefix='/api/media')
+    app.register_blueprint(metrics_bp)
+
+    # Compile email templates up front so a broken template fails at startup
+    from utils.email_templates import load_email_templates
+    load_email_templates()
+
+    # Start the email workers so jobs left over from a previous run get delivered
+    from utils.email_queue import start_email_workers, email_queue_stats
+    from utils.smtp_pool import smtp_pool_stats
+    from utils.cache import cache_stats
+    from utils.supabase_client import supabase_pool_stats
+    from utils.thumbnails import thumbnail_pool
+    start_email_workers()
+
+    # Send opening emails from the in-process dispatcher; with several workers one holds the leader lock
+    from utils.capsule_scheduler import capsule_scheduler
+    if os.getenv('CAPSULE_SCHEDULER_ENABLED', 'true').lower() == 'true':
+        capsule_scheduler.start()
+
+    @app.route('/')
+    def index():
+        return {'message': 'GiftCapsule API is running'}, 200
+
+    @app.route('/health')
+    def health():
+        # Only loaded (and only has pools) when serving through asgi.py
+        async_supabase = sys.modules.get('utils.async_supabase')
+        return {
+            'status': 'healthy',
+            'email_queue': email_queue_stats(),
+            'smtp_pool': smtp_pool_stats(),
+            'caches': cache_stats(),
+            'supabase_pool': supabase_pool_stats(),
+            'async_supabase_pools': async_supabase.async_supabase_pool_stats() if async_supabase else [],
+            'capsule_scheduler': capsule_scheduler.stats(),
+            'admission': get_admission_controller().stats(),
+            'thumbnails': thumbnail_pool.stats()
+        }, 200
+
+    return app
+
+
+_app = None
+
+
+def __getattr__(name):
+    # Keeps `app:app` (gunicorn, flask run) working while `import app` itself stays cheap
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-@app.route('/health')
-def health():
-    return {'status': 'healthy'}, 200
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    create_app().run(debug=True, port=5000)
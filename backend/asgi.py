@@ -0,0 +1,105 @@
+"""
+ASGI entry point for the async serving mode (needs requirements-async.txt):
+
+    cd backend && uvicorn asgi:app --workers 4
+
+The read endpoints in routes/async_reads.py run as coroutines on a shared async
+PostgREST connection pool, so a worker keeps many Supabase round trips in
+flight instead of pinning a thread per request. Every other route is served by
+the Flask app in app.py through asgiref's WSGI adapter.
+"""
+import asyncio
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+
+# Built first: create_app() loads .env, which the modules below read their settings from
+flask_app = create_app()
+wsgi_app = WsgiToAsgi(flask_app)
+
+from routes.async_reads import AsyncRequest, json_response, match_async_route
+from utils.async_supabase import close_async_supabase
+from utils.metrics import start_request, finish_request
+from utils.compression import compress, is_compressible, negotiate
+from utils.supabase_client import get_data_backend
+from utils.admission import client_address, get_admission_controller
+
+# The async pool talks to PostgREST directly; with DATA_BACKEND=memory every route goes through Flask
+ASYNC_ROUTES_ENABLED = get_data_backend() == 'supabase'
+
+# Async routes are timed under the same URL rules as their Flask twins
+url_adapter = flask_app.url_map.bind('localhost')
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_supabase()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    route = None
+    if ASYNC_ROUTES_ENABLED and scope['type'] == 'http':
+        route = match_async_route(scope.get('method'), scope.get('path', ''))
+    if route is None:
+        return await wsgi_app(scope, receive, send)
+
+    handler, params = route
+    request = AsyncRequest(
+        scope['method'],
+        scope['path'],
+        {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']},
+        dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'))),
+        scope['client'][0] if scope.get('client') else None,
+    )
+
+    rule, _ = url_adapter.match(request.path, request.method, return_rule=True)
+    token = start_request(rule.rule, request.method)
+    admission = get_admission_controller()
+    client = client_address(request.remote_addr, request.headers.get('x-forwarded-for'))
+    if admission.blocking:
+        # RATE_LIMIT_BACKEND=supabase takes tokens with a blocking RPC; other requests keep running meanwhile
+        rejection = await asyncio.to_thread(admission.admit, client, rule.rule)
+    else:
+        rejection = admission.admit(client, rule.rule)
+    if rejection is not None:
+        response = json_response({'error': rejection.error}, rejection.status)
+        response.headers.update({name.lower(): value for name, value in rejection.headers().items()})
+    else:
+        try:
+            response = await handler(flask_app, request, **params)
+        except Exception as e:
+            response = json_response({'error': str(e)}, 500)
+        finally:
+            admission.release(rule.rule)
+
+    # Same CORS policy and compression as on the Flask side
+    headers = {**response.headers, 'access-control-allow-origin': '*'}
+    body = response.body
+    if is_compressible(headers['content-type']):
+        headers['vary'] = 'Accept-Encoding'
+        encoding = negotiate(request.headers.get('accept-encoding', ''), len(body), headers['content-type'])
+        if response.status == 200 and encoding is not None:
+            body = response.cached.compressed(encoding) if response.cached is not None else compress(body, encoding)
+            headers['content-encoding'] = encoding
+            if 'etag' in headers:
+                headers['etag'] = f'W/{headers["etag"]}'
+    headers['content-length'] = str(len(body))
+    finish_request(token, response.status)
+
+    await send({
+        'type': 'http.response.start',
+        'status': response.status,
+        'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,108 @@
+"""
+Database round trips per capsule endpoint: the previous get/check/open handlers
+(select, then update, then select again) versus the shared capsule state
+service in utils/capsule_state.py. Runs the real routes against the in-memory
+stand-in from utils/memory_backend.py.
+
+    cd backend && python benchmarks/bench_capsule_db_calls.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:54321')
+os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench')
+os.environ['EMAIL_QUEUE_PATH'] = os.path.join(tempfile.mkdtemp(), 'email_queue.sqlite3')
+os.environ['CAPSULE_SCHEDULER_ENABLED'] = 'false'
+# One client sends everything; measure the handlers, not the rate limiter
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+
+from utils.memory_backend import MemorySupabase
+import utils.supabase_client
+
+db = MemorySupabase(record_calls=True)
+# Must be swapped in before the routes import `supabase`
+utils.supabase_client.supabase = db
+
+from app import create_app
+
+app = create_app()
+
+
+def add_capsule(open_date: datetime) -> int:
+    row = db.table('time_capsules').insert({
+        'creator_email': 'ayse@example.com',
+        'title': 'Gelecekteki bana',
+        'message': 'Merhaba',
+        'media_url': None,
+        'open_date': open_date.isoformat(),
+        'is_opened': False,
+        'notification_sent': False,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }).execute().data[0]
+    db.reset_calls()
+    return row['id']
+
+
+def legacy_get(capsule_id):
+    result = db.table('time_capsules').select('*').eq('id', capsule_id).execute()
+    capsule = result.data[0]
+    open_date = datetime.fromisoformat(capsule['open_date'])
+    if datetime.now(timezone.utc) >= open_date and not capsule['is_opened'] and not capsule['notification_sent']:
+        db.table('time_capsules').update({'notification_sent': True}).eq('id', capsule_id).execute()
+        db.table('time_capsules').select('*').eq('id', capsule_id).execute()
+
+
+def legacy_check(capsule_id):
+    result = db.table('time_capsules').select('*').eq('id', capsule_id).execute()
+    capsule = result.data[0]
+    open_date = datetime.fromisoformat(capsule['open_date'])
+    if datetime.now(timezone.utc) >= open_date and not capsule['is_opened'] and not capsule['notification_sent']:
+        db.table('time_capsules').update({'notification_sent': True}).eq('id', capsule_id).execute()
+
+
+def legacy_open(capsule_id):
+    result = db.table('time_capsules').select('*').eq('id', capsule_id).execute()
+    capsule = result.data[0]
+    if datetime.now(timezone.utc) >= datetime.fromisoformat(capsule['open_date']):
+        db.table('time_capsules').update({'is_opened': True}).eq('id', capsule_id).execute()
+
+
+def count(action) -> int:
+    db.reset_calls()
+    action()
+    return len(db.reset_calls())
+
+
+def main():
+    client = app.test_client()
+    past = datetime.now(timezone.utc) - timedelta(hours=1)
+    future = datetime.now(timezone.utc) + timedelta(days=30)
+
+    scenarios = []
+
+    def scenario(name, open_date, legacy, route, method='get'):
+        legacy_id = add_capsule(open_date)
+        new_id = add_capsule(open_date)
+        before = count(lambda: legacy(legacy_id))
+        cold = count(lambda: getattr(client, method)(route.format(new_id)))
+        warm = count(lambda: getattr(client, method)(route.format(new_id)))
+        scenarios.append((name, before, cold, warm))
+
+    scenario('GET capsule, not due', future, legacy_get, '/api/capsules/{}')
+    scenario('GET capsule, due', past, legacy_get, '/api/capsules/{}')
+    scenario('GET check, not due', future, legacy_check, '/api/capsules/check/{}')
+    scenario('GET check, due', past, legacy_check, '/api/capsules/check/{}')
+    scenario('PUT open, due', past, legacy_open, '/api/capsules/{}/open', 'put')
+    scenario('PUT open, not due', future, legacy_open, '/api/capsules/{}/open', 'put')
+
+    print(f'{"endpoint":<34}{"before":>8}{"cold":>8}{"repeat":>8}')
+    for name, before, cold, warm in scenarios:
+        print(f'{name:<34}{before:>8}{cold:>8}{warm:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Renders per second: inline f-string + MIMEMultipart (the previous senders)
+versus the precompiled templates in utils/email_templates.py.
+
+    cd backend && python benchmarks/bench_email_templates.py
+"""
+import os
+import sys
+import timeit
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.email_templates import load_email_templates
+
+GIFT_DATA = {
+    'sender_name': 'Ayşe',
+    'recipient_name': 'Mehmet',
+    'view_link': 'http://localhost:3000/view-gift.html?id=42',
+}
+
+
+def legacy_gift_email(recipient_email: str, gift_data: dict) -> str:
+    message = MIMEMultipart('alternative')
+    message['Subject'] = f"🎁 {gift_data['sender_name']} sana bir hediye gönderdi!"
+    message['From'] = 'giftcapsule@example.com'
+    message['To'] = recipient_email
+
+    html = f"""
+        <html>
+            <body style="font-family: Arial, sans-serif; padding: 20px;">
+                <h2>Merhaba {gift_data['recipient_name']}!</h2>
+                <p>{gift_data['sender_name']} sana özel bir dijital hediye gönderdi.</p>
+                <p>Hediyeni görüntülemek için aşağıdaki linke tıkla:</p>
+                <a href="{gift_data['view_link']}" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Hediyemi Görüntüle</a>
+                <br><br>
+                <p>Sevgiyle,<br>GiftCapsule Ekibi</p>
+            </body>
+        </html>
+        """
+
+    message.attach(MIMEText(html, 'html'))
+    return message.as_string()
+
+
+def main(number: int = 5000) -> None:
+    template = load_email_templates()['gift']
+    counter = iter(range(10 ** 9))
+
+    cases = {
+        'legacy f-string + MIMEMultipart': lambda: legacy_gift_email('mehmet@example.com', GIFT_DATA),
+        'compiled template (cache hit)': lambda: template.render('giftcapsule@example.com', 'mehmet@example.com', GIFT_DATA),
+        'compiled template (cache miss)': lambda: template.render(
+            'giftcapsule@example.com', 'mehmet@example.com', dict(GIFT_DATA, recipient_name=f'Mehmet {next(counter)}')
+        ),
+    }
+
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print(f'{name:34s} {number / seconds:>12,.0f} renders/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+"""
+Load benchmark of every API endpoint against the in-memory backend
+(DATA_BACKEND=memory) with a simulated database round trip, so it runs
+anywhere without a Supabase project. The app is served on a WSGI server with
+a fixed thread pool (like a gthread worker) and each endpoint is driven by
+`--concurrency` clients in turn; throughput and p50/p95/p99 latency are
+reported per endpoint.
+
+    cd backend && python benchmarks/bench_endpoints.py [--requests 500] [--concurrency 16]
+
+For CI, save a baseline once and compare later runs against it; the run
+exits with status 1 if an endpoint's p95 regressed by more than --tolerance:
+
+    python benchmarks/bench_endpoints.py --json baseline.json
+    python benchmarks/bench_endpoints.py --baseline baseline.json --tolerance 0.25
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import itertools
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADMIN_TOKEN = 'bench-admin-token'
+
+os.environ['DATA_BACKEND'] = 'memory'
+os.environ['EMAIL_QUEUE_PATH'] = os.path.join(tempfile.mkdtemp(), 'email_queue.sqlite3')
+os.environ['CAPSULE_SCHEDULER_ENABLED'] = 'false'
+# One client sends everything; measure the handlers, not the rate limiter
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+# Leave the queued emails alone; only the request path is measured
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ['ADMIN_API_TOKEN'] = ADMIN_TOKEN
+os.environ['MEDIA_BACKEND'] = 'local'
+os.environ['MEDIA_ROOT'] = tempfile.mkdtemp()
+os.environ['MEDIA_SIGNING_KEY'] = 'bench-signing-key'
+
+from app import create_app
+from utils.supabase_client import supabase
+from utils.media_storage import get_media_storage, new_media_id, original_key
+
+JAR_TYPES = ['happy', 'sad', 'energetic', 'calm']
+
+# Seeded rows per table
+SEED_ROWS = 500
+
+# Uploaded media files are audio, so no thumbnail rendering runs alongside the measured requests
+MEDIA_TYPE = 'audio/mpeg'
+MEDIA_BYTES = 64 * 1024
+
+_video_ids = itertools.count()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(app, port: int, threads: int):
+    """
+    The app on a WSGI server with a fixed pool of `threads`, in a background thread
+    """
+    from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    class PooledWSGIServer(WSGIServer):
+        pool = ThreadPoolExecutor(threads)
+        request_queue_size = 1024
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    server = make_server('127.0.0.1', port, app, server_class=PooledWSGIServer, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def gift(i: int) -> dict:
+    return {
+        'sender_name': 'GiftCapsule',
+        'recipient_name': f'Alıcı {i}',
+        'recipient_email': f'alici{i}@example.com',
+        'card_template': 'new_year',
+        'message': 'Mutlu yıllar!',
+    }
+
+
+def capsule(i: int, open_date: datetime) -> dict:
+    return {
+        'creator_email': f'kapsul{i}@example.com',
+        'title': f'Kapsül {i}',
+        'message': 'Gelecekteki bana',
+        'open_date': open_date.isoformat(),
+    }
+
+
+def song(i: int) -> dict:
+    return {
+        'jar_type': random.choice(JAR_TYPES),
+        'song_name': f'Şarkı {i}',
+        'artist_name': 'Sanatçı',
+        # Unique 11-character video ids, so every POST adds a new song
+        'youtube_url': f'https://youtu.be/bench{next(_video_ids):06d}',
+        'added_by': 'bench',
+    }
+
+
+def seed(db) -> dict:
+    """
+    Fill the backend through its query interface; returns the seeded ids per table
+    """
+    now = datetime.utcnow()
+    db.table('jar_types').insert([{'name': name} for name in JAR_TYPES]).execute()
+
+    gifts = db.table('gifts').insert([
+        {**gift(i), 'is_viewed': False, 'created_at': now.isoformat()} for i in range(SEED_ROWS)
+    ]).execute().data
+
+    # Half of the capsules can be opened, half open next year
+    capsules = db.table('time_capsules').insert([
+        {
+            **capsule(i, now + timedelta(days=365 if i % 2 else -1)),
+            'is_opened': False,
+            'notification_sent': False,
+            'created_at': now.isoformat(),
+        }
+        for i in range(SEED_ROWS)
+    ]).execute().data
+
+    songs = []
+    for i in range(SEED_ROWS):
+        row = song(i)
+        video_id = row['youtube_url'].rsplit('/', 1)[1]
+        songs.append({
+            **row,
+            'youtube_url': f'https://www.youtube.com/watch?v={video_id}',
+            'youtube_video_id': video_id,
+            'play_count': random.randint(0, 1000),
+            'created_at': now.isoformat(),
+        })
+    songs = db.table('music_jars').insert(songs).execute().data
+
+    storage = get_media_storage()
+    media = [new_media_id(MEDIA_TYPE) for _ in range(50)]
+    for media_id in media:
+        storage.write(original_key(media_id), b'\0' * MEDIA_BYTES, MEDIA_TYPE)
+
+    return {
+        # Exports are bounded to the seeded rows; the POST scenarios keep adding more
+        'seeded_until': (now + timedelta(microseconds=1)).isoformat(),
+        'gifts': [row['id'] for row in gifts],
+        'due_capsules': [row['id'] for i, row in enumerate(capsules) if i % 2 == 0],
+        'capsules': [row['id'] for row in capsules],
+        'songs': [row['id'] for row in songs],
+        'media': media,
+    }
+
+
+def scenarios(ids: dict) -> list:
+    """
+    (name, method, path, body factory, content type) per endpoint; factories take a request number
+    """
+    pick = random.choice
+    json_type = 'application/json'
+    batch = ''.join(json.dumps(gift(i)) + '\n' for i in range(50))
+    future = datetime.utcnow() + timedelta(days=30)
+    storage = get_media_storage()
+    upload = json.dumps({'content_type': MEDIA_TYPE, 'size': MEDIA_BYTES})
+    media_file = '\0' * MEDIA_BYTES
+
+    def upload_path(i):
+        # Every signed upload URL is for a new object
+        return storage.create_upload(new_media_id(MEDIA_TYPE), MEDIA_TYPE, MEDIA_BYTES)['url']
+
+    return [
+        ('GET /health', 'GET', lambda i: '/health', None, None),
+        ('GET /metrics', 'GET', lambda i: '/metrics', None, None),
+        ('POST /api/gifts', 'POST', lambda i: '/api/gifts', lambda i: json.dumps(gift(i)), json_type),
+        ('POST /api/gifts/batch (50)', 'POST', lambda i: '/api/gifts/batch', lambda i: batch, 'application/x-ndjson'),
+        ('GET /api/gifts/<id>', 'GET', lambda i: f'/api/gifts/{pick(ids["gifts"])}', None, None),
+        ('PUT /api/gifts/<id>/view', 'PUT', lambda i: f'/api/gifts/{pick(ids["gifts"])}/view', None, None),
+        ('POST /api/capsules', 'POST', lambda i: '/api/capsules', lambda i: json.dumps(capsule(i, future)), json_type),
+        ('GET /api/capsules/<id>', 'GET', lambda i: f'/api/capsules/{pick(ids["capsules"])}', None, None),
+        ('GET /api/capsules/check/<id>', 'GET', lambda i: f'/api/capsules/check/{pick(ids["capsules"])}', None, None),
+        ('PUT /api/capsules/<id>/open', 'PUT', lambda i: f'/api/capsules/{pick(ids["due_capsules"])}/open', None, None),
+        ('POST /api/capsules/check-and-send-emails', 'POST', lambda i: '/api/capsules/check-and-send-emails', None, None),
+        ('GET /api/music/jars', 'GET', lambda i: '/api/music/jars', None, None),
+        ('GET /api/music', 'GET', lambda i: f'/api/music?jar_type={pick(JAR_TYPES)}', None, None),
+        ('GET /api/music?sort=play_count', 'GET', lambda i: '/api/music?sort=play_count', None, None),
+        ('GET /api/music/top', 'GET', lambda i: '/api/music/top', None, None),
+        ('GET /api/music/top/<jar_type>', 'GET', lambda i: f'/api/music/top/{pick(JAR_TYPES)}', None, None),
+        ('GET /api/music/random', 'GET', lambda i: '/api/music/random', None, None),
+        ('GET /api/music/random/<jar_type>', 'GET', lambda i: f'/api/music/random/{pick(JAR_TYPES)}', None, None),
+        ('POST /api/music', 'POST', lambda i: '/api/music', lambda i: json.dumps(song(i)), json_type),
+        ('PUT /api/music/<id>/play', 'PUT', lambda i: f'/api/music/{pick(ids["songs"])}/play', None, None),
+        ('GET /api/exports/gifts', 'GET', lambda i: f'/api/exports/gifts?to={ids["seeded_until"]}', None, None),
+        ('GET /api/exports/capsules', 'GET', lambda i: f'/api/exports/capsules?to={ids["seeded_until"]}', None, None),
+        ('GET /api/exports/music', 'GET', lambda i: f'/api/exports/music?to={ids["seeded_until"]}', None, None),
+        ('POST /api/media/uploads', 'POST', lambda i: '/api/media/uploads', lambda i: upload, json_type),
+        ('PUT /api/media/uploads/<token>', 'PUT', upload_path, lambda i: media_file, MEDIA_TYPE),
+        ('POST /api/media/<id>/complete', 'POST', lambda i: f'/api/media/{pick(ids["media"])}/complete', None, None),
+        ('GET /api/media/files/<key>', 'GET', lambda i: f'/api/media/files/{original_key(pick(ids["media"]))}', None, None),
+    ]
+
+
+def request(port: int, method: str, path: str, body, content_type) -> int:
+    headers = {'Authorization': f'Bearer {ADMIN_TOKEN}'}
+    if content_type:
+        headers['Content-Type'] = content_type
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request(method, path, body=body.encode('utf-8') if body else None, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def run_scenario(port: int, scenario, total: int, concurrency: int) -> dict:
+    _, method, path, body, content_type = scenario
+    latencies = []
+    errors = 0
+    numbers = iter(range(total))
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors
+        while True:
+            with lock:
+                i = next(numbers, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            try:
+                failed = request(port, method, path(i), body(i) if body else None, content_type) >= 400
+            except OSError:
+                failed = True
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                errors += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total,
+        'rps': total / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95)],
+        'p99': latencies[int(len(latencies) * 0.99)],
+        'errors': errors,
+    }
+
+
+def regressions(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """
+    Endpoints whose p95 exceeds the baseline's by more than `tolerance` (and `min_delta_ms`)
+    """
+    found = []
+    for name, stats in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        limit = max(previous['p95'] * (1 + tolerance), previous['p95'] + min_delta_ms)
+        if stats['p95'] > limit:
+            found.append((name, previous['p95'], stats['p95']))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=8, help='server worker threads')
+    parser.add_argument('--latency-ms', type=float, default=2, help='simulated database round trip')
+    parser.add_argument('--only', help='run only endpoints whose name contains this text')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare p95 against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p95 increase')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='ignore p95 increases below this')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    app = create_app()
+    db = supabase.get()
+    ids = seed(db)
+    db.latency = args.latency_ms / 1000
+    db.record_calls = True
+
+    port = free_port()
+    server = serve(app, port, args.threads)
+
+    print(f'{args.requests} requests per endpoint, concurrency {args.concurrency}, '
+          f'{args.threads} server threads, database latency {args.latency_ms:g} ms')
+    print(f'{"endpoint":<44}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"db/req":>8}{"errors":>8}')
+
+    results = {}
+    try:
+        for scenario in scenarios(ids):
+            name = scenario[0]
+            if args.only and args.only not in name:
+                continue
+            # Warm caches and connections before measuring
+            run_scenario(port, scenario, args.concurrency, args.concurrency)
+            db.reset_calls()
+            stats = run_scenario(port, scenario, args.requests, args.concurrency)
+            stats['db_calls'] = len(db.reset_calls()) / args.requests
+            results[name] = stats
+            print(f'{name:<44}{stats["rps"]:>9.1f}{stats["p50"]:>9.1f}{stats["p95"]:>9.1f}'
+                  f'{stats["p99"]:>9.1f}{stats["db_calls"]:>8.2f}{stats["errors"]:>8}')
+    finally:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+
+    failed = any(stats['errors'] for stats in results.values())
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        slower = regressions(results, baseline, args.tolerance, args.min_delta_ms)
+        for name, before, after in slower:
+            print(f'REGRESSION {name}: p95 {before:.1f} ms -> {after:.1f} ms')
+        if not slower:
+            print(f'no p95 regression beyond {args.tolerance:.0%} of {args.baseline}')
+        failed = failed or bool(slower)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Creating a campaign's worth of gifts: one `POST /api/gifts` per gift versus a
+single NDJSON `POST /api/gifts/batch`. Runs the real routes against the
+in-memory backend (utils/memory_backend.py) with a simulated Supabase round trip.
+
+    cd backend && python benchmarks/bench_gift_batch.py [--gifts 2000] [--latency-ms 5]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:54321')
+os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench')
+os.environ['EMAIL_QUEUE_PATH'] = os.path.join(tempfile.mkdtemp(), 'email_queue.sqlite3')
+os.environ['CAPSULE_SCHEDULER_ENABLED'] = 'false'
+# One client sends everything; measure the handlers, not the rate limiter
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+# Leave the queued emails alone; only the request path is measured
+os.environ['EMAIL_WORKERS'] = '0'
+
+from utils.memory_backend import MemorySupabase
+import utils.supabase_client
+
+db = MemorySupabase(record_calls=True)
+# Must be swapped in before the routes import `supabase`
+utils.supabase_client.supabase = db
+
+from app import create_app
+
+app = create_app()
+
+
+def gift(i: int) -> dict:
+    return {
+        'sender_name': 'GiftCapsule',
+        'recipient_name': f'Alıcı {i}',
+        'recipient_email': f'alici{i}@example.com',
+        'card_template': 'new_year',
+        'message': 'Mutlu yıllar!',
+    }
+
+
+def run_single(client, count: int) -> int:
+    for i in range(count):
+        assert client.post('/api/gifts', json=gift(i)).status_code == 201
+    return count
+
+
+def run_batch(client, count: int) -> int:
+    body = ''.join(json.dumps(gift(i)) + '\n' for i in range(count))
+    response = client.post('/api/gifts/batch', data=body, content_type='application/x-ndjson')
+    summary = json.loads(response.data.splitlines()[-1])
+    assert summary['failed'] == 0, summary
+    return summary['created']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--gifts', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    db.latency = args.latency_ms / 1000
+    client = app.test_client()
+
+    print(f'{"mode":<10}{"gifts":>8}{"db calls":>10}{"seconds":>10}{"gifts/s":>10}')
+    for label, run in (('single', run_single), ('batch', run_batch)):
+        db.reset_calls()
+        started = time.perf_counter()
+        created = run(client, args.gifts)
+        elapsed = time.perf_counter() - started
+        print(f'{label:<10}{created:>8}{len(db.calls):>10}{elapsed:>10.2f}{created / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Cold-start cost of the backend, as seen by a serverless platform or a fresh
+gunicorn worker: wall time of each startup stage in a new interpreter, and the
+heaviest imports reported by `python -X importtime`.
+
+    cd backend && python benchmarks/bench_import_time.py [--runs 5] [--top 10]
+"""
+import os
+import re
+import sys
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = [
+    ('import app', 'import app'),
+    ('create_app()', 'import app; app.create_app()'),
+    ('create_app() + Supabase client', 'import app; app.create_app(); from utils.supabase_client import supabase; supabase.get()'),
+]
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_stage(code: str, env: dict) -> tuple:
+    """
+    Run `code` in a fresh interpreter; returns (wall ms, [(cumulative us, module)] of top-level imports)
+    """
+    timed = f'import time; _t = time.perf_counter(); {code}; print((time.perf_counter() - _t) * 1000)'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', timed], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            imports.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+
+    return float(result.stdout.strip().splitlines()[-1]), imports
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        'SUPABASE_URL': os.getenv('SUPABASE_URL', 'http://127.0.0.1:54321'),
+        'SUPABASE_KEY': os.getenv('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench'),
+        'CAPSULE_SCHEDULER_ENABLED': 'false',
+        'EMAIL_QUEUE_PATH': os.path.join(tempfile.mkdtemp(), 'email_queue.sqlite3'),
+    }
+
+    print(f'{"stage":<34}{"median ms":>12}{"min ms":>10}')
+    heaviest = None
+    for label, code in STAGES:
+        timings = []
+        for _ in range(args.runs):
+            wall_ms, imports = run_stage(code, env)
+            timings.append(wall_ms)
+        print(f'{label:<34}{statistics.median(timings):>12.1f}{min(timings):>10.1f}')
+        heaviest = imports
+
+    # Top-level packages (indent 1) of the last, fullest stage
+    top_level = sorted(((us, module) for us, indent, module in heaviest if indent == 1), reverse=True)
+    print(f'\nheaviest top-level imports ({STAGES[-1][0]}):')
+    for us, module in top_level[:args.top]:
+        print(f'  {module:<40}{us / 1000:>8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
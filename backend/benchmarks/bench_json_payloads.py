@@ -0,0 +1,123 @@
+"""
+Serialization time and wire size of the API's typical JSON payloads: the
+stdlib encoder versus orjson, full `select('*')` rows versus the projected
+columns the endpoints now serve, and gzip/brotli at the configured levels.
+orjson and brotli come from requirements-speedups.txt; missing ones are skipped.
+
+    cd backend && python benchmarks/bench_json_payloads.py [--number 200]
+"""
+import os
+import sys
+import timeit
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATA_BACKEND'] = 'memory'
+os.environ['EMAIL_QUEUE_PATH'] = os.path.join(tempfile.mkdtemp(), 'email_queue.sqlite3')
+os.environ['CAPSULE_SCHEDULER_ENABLED'] = 'false'
+os.environ['EMAIL_WORKERS'] = '0'
+
+from app import create_app
+from utils import compression
+from utils.json_provider import StdlibJSONProvider, OrjsonProvider, orjson
+from utils.music_leaderboard import MUSIC_COLUMNS
+from utils.repositories import gift_repository, capsule_repository
+
+LETTER = ('Sevgili gelecekteki ben, bu mektubu yazarken pencereden İstanbul\'un ışıklarına bakıyorum. '
+          'Umarım hayallerinin peşinden gitmeyi hiç bırakmamışsındır. ') * 30
+
+
+def gift_row(i: int) -> dict:
+    return {
+        'id': i,
+        'sender_name': 'Ayşe Yılmaz',
+        'recipient_name': 'Mehmet Demir',
+        'recipient_email': 'mehmet.demir@example.com',
+        'card_template': 'birthday',
+        'message': 'Doğum günün kutlu olsun! Nice mutlu yıllara.',
+        'is_viewed': False,
+        'created_at': '2025-06-01T12:00:00.123456',
+    }
+
+
+def capsule_row(i: int) -> dict:
+    return {
+        'id': i,
+        'creator_email': 'ayse@example.com',
+        'title': 'Gelecekteki bana',
+        'message': LETTER,
+        'media_url': 'https://example.com/foto.jpg',
+        'media_thumbnail_url': None,
+        'open_date': '2030-01-01T00:00:00+00:00',
+        'is_opened': False,
+        'notification_sent': False,
+        'notification_claim_token': None,
+        'notification_claimed_until': None,
+        'created_at': '2025-01-01T00:00:00',
+    }
+
+
+def music_row(i: int) -> dict:
+    return {
+        'id': i,
+        'jar_type': 'Mutlu',
+        'song_name': f'Şarkı {i}',
+        'artist_name': 'Sezen Aksu',
+        'youtube_url': f'https://www.youtube.com/watch?v=bench{i:06d}',
+        'youtube_video_id': f'bench{i:06d}',
+        'added_by': 'Zeynep',
+        'play_count': 1000 - i,
+        'created_at': '2025-03-01T09:30:00.000000',
+    }
+
+
+def project(row: dict, columns: str) -> dict:
+    return {column: row[column] for column in columns.split(',')}
+
+
+def payloads() -> list:
+    """
+    (name, full payload, projected payload)
+    """
+    songs = [music_row(i) for i in range(100)]
+    return [
+        ('GET /api/gifts/<id>', gift_row(1), gift_repository.public(gift_row(1))),
+        ('GET /api/capsules/<id>', capsule_row(1), capsule_repository.public(capsule_row(1))),
+        ('GET /api/music?limit=100', {'items': songs, 'next_cursor': 'WzEwMF0'},
+         {'items': [project(row, MUSIC_COLUMNS) for row in songs], 'next_cursor': 'WzEwMF0'}),
+        ('GET /api/music/top', songs[:10], [project(row, MUSIC_COLUMNS) for row in songs[:10]]),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=200, help='encodes per timing')
+    args = parser.parse_args()
+
+    app = create_app()
+    encoders = [('stdlib', StdlibJSONProvider(app))]
+    if orjson is not None:
+        encoders.append(('orjson', OrjsonProvider(app)))
+    else:
+        print('orjson not installed: pip install -r requirements-speedups.txt')
+    encodings = compression.supported_encodings()
+
+    print(f'{"payload":<26}{"columns":>9}' + ''.join(f'{name + " µs":>12}' for name, _ in encoders)
+          + f'{"bytes":>9}' + ''.join(f'{encoding + " bytes":>12}' for encoding in encodings))
+    for name, full, projected in payloads():
+        for label, payload in (('*', full), ('public', projected)):
+            line = f'{name:<26}{label:>9}'
+            for _, provider in encoders:
+                seconds = min(timeit.repeat(lambda: provider.dumps_bytes(payload), number=args.number, repeat=5))
+                line += f'{seconds / args.number * 1e6:>12.1f}'
+            body = encoders[-1][1].dumps_bytes(payload)
+            line += f'{len(body):>9}'
+            for encoding in encodings:
+                line += f'{len(compression.compress(body, encoding)):>12}'
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
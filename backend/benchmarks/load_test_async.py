@@ -0,0 +1,214 @@
+"""
+Load test of the sync (Flask, fixed thread pool) and async (ASGI, asgi.py)
+serving modes against a local PostgREST stand-in that answers after a fixed
+latency. The record cache is disabled so every request goes to "Supabase".
+The async mode needs requirements-async.txt installed.
+
+    cd backend && python benchmarks/load_test_async.py [--requests 2000] [--concurrency 200]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CAPSULE = {
+    'id': 1,
+    'creator_email': 'ayse@example.com',
+    'title': 'Gelecekteki bana',
+    'message': 'Merhaba',
+    'media_url': None,
+    'open_date': '2030-01-01T00:00:00+00:00',
+    'is_opened': False,
+    'notification_sent': False,
+    'created_at': '2025-01-01T00:00:00',
+}
+
+
+class PostgRESTStandIn(BaseHTTPRequestHandler):
+    """
+    Answers GET /rest/v1/time_capsules?id=eq.<id> after `latency` seconds; everything else with []
+    """
+    protocol_version = 'HTTP/1.1'
+    latency = 0.05
+
+    def do_GET(self):
+        # postgrest-py sends a JSON body even with GET; it must be drained for keep-alive
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+        rows = []
+        if url.path == '/rest/v1/time_capsules' and params.get('id') == f'eq.{CAPSULE["id"]}':
+            rows = [CAPSULE]
+        self._reply(rows)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._reply([])
+
+    do_PATCH = do_POST
+
+    def _reply(self, rows):
+        body = json.dumps(rows).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve_sync(port: int, threads: int) -> None:
+    """
+    The Flask app on a WSGI server with a fixed pool of `threads`, like a gthread worker
+    """
+    from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    class PooledWSGIServer(WSGIServer):
+        pool = ThreadPoolExecutor(threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    make_server('127.0.0.1', port, create_app(), server_class=PooledWSGIServer, handler_class=QuietHandler).serve_forever()
+
+
+def start_server(mode: str, port: int, env: dict, threads: int) -> subprocess.Popen:
+    if mode == 'sync':
+        command = [sys.executable, os.path.abspath(__file__), '--serve-sync', str(port), '--threads', str(threads)]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port), '--log-level', 'warning']
+
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+async def run_load(url: str, total: int, concurrency: int) -> dict:
+    import httpx
+
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker(client):
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        await client.get(url)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95)],
+        'p99': latencies[int(len(latencies) * 0.99)],
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8, help='sync mode worker threads')
+    parser.add_argument('--latency', type=float, default=0.05, help='stand-in PostgREST latency (s)')
+    parser.add_argument('--serve-sync', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_sync:
+        return serve_sync(args.serve_sync, args.threads)
+
+    PostgRESTStandIn.latency = args.latency
+    postgrest_port = free_port()
+    postgrest = ThreadingHTTPServer(('127.0.0.1', postgrest_port), PostgRESTStandIn)
+    postgrest.daemon_threads = True
+    threading.Thread(target=postgrest.serve_forever, daemon=True).start()
+
+    env = {
+        **os.environ,
+        'SUPABASE_URL': f'http://127.0.0.1:{postgrest_port}',
+        'SUPABASE_KEY': 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench',
+        'RECORD_CACHE_TTL': '0',
+        'CAPSULE_SCHEDULER_ENABLED': 'false',
+        'RATE_LIMIT_ENABLED': 'false',
+        'EMAIL_QUEUE_PATH': os.path.join(tempfile.mkdtemp(), 'email_queue.sqlite3'),
+    }
+
+    modes = ['sync']
+    try:
+        import uvicorn  # noqa: F401
+        import asgiref  # noqa: F401
+        modes.append('async')
+    except ImportError:
+        print('async mode skipped: pip install -r requirements-async.txt')
+
+    print(f'{args.requests} x GET /api/capsules/check/1, concurrency {args.concurrency}, '
+          f'PostgREST latency {args.latency * 1000:.0f} ms')
+    print(f'{"mode":<24}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}')
+    for mode in modes:
+        port = free_port()
+        server = start_server(mode, port, env, args.threads)
+        try:
+            stats = asyncio.run(run_load(f'http://127.0.0.1:{port}/api/capsules/check/1', args.requests, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+        label = f'sync ({args.threads} threads)' if mode == 'sync' else 'async (1 process)'
+        print(f'{label:<24}{stats["rps"]:>10.1f}{stats["p50"]:>10.1f}{stats["p95"]:>10.1f}'
+              f'{stats["p99"]:>10.1f}{stats["errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Event loop check for the admission control of the ASGI async routes. The
+rate limit backend takes tokens with a slow blocking call (as
+RATE_LIMIT_BACKEND=supabase does with its RPC) while many async requests
+arrive at once; a ticker on the same loop must keep running on time, and
+every request must still be answered.
+
+    cd backend && python benchmarks/stress_asgi_admission.py
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATA_BACKEND'] = 'memory'
+os.environ['EMAIL_QUEUE_PATH'] = os.path.join(tempfile.mkdtemp(), 'email_queue.sqlite3')
+os.environ['CAPSULE_SCHEDULER_ENABLED'] = 'false'
+os.environ['EMAIL_WORKERS'] = '0'
+
+import asgi
+from routes import async_reads
+from utils import admission
+from utils.admission import AdmissionController
+
+# Each token take blocks its thread this long
+TAKE_SECONDS = 0.2
+# Longest the loop may go without running the ticker; a blocked loop misses it by TAKE_SECONDS
+MAX_LAG_SECONDS = TAKE_SECONDS / 2
+
+
+class SlowRateLimitBackend:
+    blocking = True
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        time.sleep(TAKE_SECONDS)
+        return 0.0
+
+    def stats(self) -> dict:
+        return {'backend': 'slow'}
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class FastAsyncTable:
+    def __init__(self):
+        self.record_id = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.record_id = value
+        return self
+
+    async def execute(self):
+        return _Result([{'id': self.record_id, 'sender_name': 'Ayşe', 'recipient_name': 'Mehmet',
+                         'card_template': 'birthday', 'message': 'Merhaba', 'is_viewed': False,
+                         'created_at': '2025-06-01T12:00:00'}])
+
+
+class FastAsyncClient:
+    def table(self, name):
+        return FastAsyncTable()
+
+
+async def _get(path: str) -> int:
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': [], 'query_string': b'',
+             'client': ('127.0.0.1', 50000)}
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app(scope, receive, send)
+    return sent[0]['status']
+
+
+async def run(requests: int) -> list:
+    lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal lag
+        while not done.is_set():
+            started = time.monotonic()
+            await asyncio.sleep(0.005)
+            lag = max(lag, time.monotonic() - started - 0.005)
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    statuses = await asyncio.gather(*(_get(f'/api/gifts/{i + 1}') for i in range(requests)))
+    done.set()
+    await ticking
+
+    failures = []
+    if lag > MAX_LAG_SECONDS:
+        failures.append(f'the event loop stalled for {lag * 1000:.0f} ms while tokens were taken')
+    if any(status != 200 for status in statuses):
+        failures.append(f'unexpected statuses: {sorted(set(statuses))}')
+    return failures
+
+
+def main(requests: int = 20) -> int:
+    asgi.ASYNC_ROUTES_ENABLED = True
+    async_reads.get_async_supabase = lambda: FastAsyncClient()
+    admission._controller = AdmissionController(SlowRateLimitBackend())
+
+    failures = asyncio.run(run(requests))
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if failures:
+        return 1
+
+    print(f'OK: {requests} requests admitted through a blocking rate limit backend without stalling the loop')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
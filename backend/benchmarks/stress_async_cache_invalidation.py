@@ -0,0 +1,137 @@
+"""
+Consistency check for the async read routes' cache fills. A gift is fetched
+on the event loop while, mid-fetch, it is marked viewed and invalidated (as
+PUT /api/gifts/<id>/view does); the row read before the write may be served
+to that one request but must not be cached, so the next read sees the write.
+The same is checked for the jar types list, over many rounds.
+
+    cd backend && python benchmarks/stress_async_cache_invalidation.py
+"""
+import os
+import sys
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATA_BACKEND'] = 'memory'
+os.environ['EMAIL_QUEUE_PATH'] = os.path.join(tempfile.mkdtemp(), 'email_queue.sqlite3')
+os.environ['CAPSULE_SCHEDULER_ENABLED'] = 'false'
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+
+from app import create_app
+from routes import async_reads
+from routes.async_reads import AsyncRequest, get_gift, get_jar_types
+from routes.music import jar_types_cache
+from utils.record_cache import gift_cache
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class SlowAsyncTable:
+    """
+    Reads the rows when the query starts, then waits for `gate` before
+    answering, like a PostgREST response still in flight while a write lands
+    """
+
+    def __init__(self, rows: dict, gate: asyncio.Event):
+        self.rows = rows
+        self.gate = gate
+        self.record_id = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.record_id = str(value)
+        return self
+
+    async def execute(self):
+        if self.record_id is None:
+            snapshot = [dict(row) for row in self.rows.values()]
+        else:
+            snapshot = [dict(self.rows[self.record_id])] if self.record_id in self.rows else []
+        await self.gate.wait()
+        return _Result(snapshot)
+
+
+class SlowAsyncClient:
+    def __init__(self, tables: dict, gate: asyncio.Event):
+        self.tables = tables
+        self.gate = gate
+
+    def table(self, name):
+        return SlowAsyncTable(self.tables[name], self.gate)
+
+
+def _request() -> AsyncRequest:
+    return AsyncRequest('GET', '/', {}, {})
+
+
+async def _round(flask_app, tables: dict, gift_id: str) -> list:
+    """
+    Failures of one round: a gift marked viewed and jar types changed during the fetch
+    """
+    gate = asyncio.Event()
+    async_reads.get_async_supabase = lambda: SlowAsyncClient(tables, gate)
+
+    gift = asyncio.create_task(get_gift(flask_app, _request(), gift_id))
+    jars = asyncio.create_task(get_jar_types(flask_app, _request()))
+    await asyncio.sleep(0)
+
+    # The writes land while both fetches are in flight
+    tables['gifts'][gift_id]['is_viewed'] = True
+    gift_cache.invalidate(gift_id)
+    tables['jar_types']['1']['emoji'] = '🎉'
+    jar_types_cache.invalidate('all')
+
+    gate.set()
+    await asyncio.gather(gift, jars)
+
+    failures = []
+    entry = gift_cache.get_entry(gift_id)
+    if entry is not None and not entry.value.data['is_viewed']:
+        failures.append(f'gift {gift_id}: cached the row read before it was marked viewed')
+    entry = jar_types_cache.get_entry('all')
+    if entry is not None and entry.value.data[0]['emoji'] != '🎉':
+        failures.append('jar types: cached the list read before it changed')
+
+    response = await get_gift(flask_app, _request(), gift_id)
+    if response.status != 200 or b'"is_viewed":true' not in response.body:
+        failures.append(f'gift {gift_id}: the next read did not see the write')
+    return failures
+
+
+async def run(rounds: int) -> list:
+    flask_app = create_app()
+    failures = []
+    for i in range(rounds):
+        gift_id = str(i + 1)
+        tables = {
+            'gifts': {gift_id: {'id': i + 1, 'sender_name': 'Ayşe', 'recipient_name': 'Mehmet',
+                                'card_template': 'birthday', 'message': 'Merhaba', 'is_viewed': False,
+                                'created_at': '2025-06-01T12:00:00'}},
+            'jar_types': {'1': {'id': 1, 'name': 'Mutlu', 'emoji': '😊', 'description': 'Neşeli', 'color': '#FFD700'}},
+        }
+        failures.extend(await _round(flask_app, tables, gift_id))
+    return failures
+
+
+def main(rounds: int = 200) -> int:
+    failures = asyncio.run(run(rounds))
+    for failure in failures[:10]:
+        print(f'FAIL: {failure}')
+    if failures:
+        print(f'MISMATCH: {len(failures)} stale reads in {rounds} rounds')
+        return 1
+
+    print(f'OK: {rounds} rounds, no row read before an invalidation was cached')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Exactly-once check for capsule opening notifications. Hundreds of threads hit
+GET /api/capsules/<id> and /check/<id> for a due capsule while the cron
+endpoint and dispatcher runs race each other, against the in-memory stand-in
+from utils/memory_backend.py with a small per-query latency to widen race windows.
+Exactly one email must be queued and the GETs must not send anything.
+The previous read-then-send-then-flag handler is run the same way for
+comparison, an abandoned claim is checked to be taken over after its lease,
+a claim whose emails were queued but never marked sent must not queue them
+again, and only one of several processes may hold the dispatcher leader lock.
+
+    cd backend && python benchmarks/stress_capsule_notifications.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:54321')
+os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench')
+os.environ['EMAIL_QUEUE_PATH'] = os.path.join(tempfile.mkdtemp(), 'email_queue.sqlite3')
+os.environ['CAPSULE_SCHEDULER_ENABLED'] = 'false'
+os.environ['EMAIL_WORKERS'] = '0'
+# One client sends everything; measure the handlers, not the rate limiter
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+
+from utils.memory_backend import MemorySupabase
+import utils.supabase_client
+
+db = MemorySupabase(latency=0.002)
+# Must be swapped in before the routes import `supabase`
+utils.supabase_client.supabase = db
+
+import utils.capsule_scheduler
+import utils.email_queue
+from utils.capsule_scheduler import CapsuleScheduler, claim_notifications
+from utils.leader_lock import LeaderLock
+from app import create_app
+
+app = create_app()
+
+THREADS = 300
+
+sent = []
+sent_lock = threading.Lock()
+
+
+def record_enqueue(jobs):
+    with sent_lock:
+        sent.extend(job[2]['view_link'] for job in jobs)
+    return True
+
+
+utils.capsule_scheduler.enqueue_emails = record_enqueue
+
+
+def add_due_capsule() -> int:
+    return db.table('time_capsules').insert({
+        'creator_email': 'ayse@example.com',
+        'title': 'Gelecekteki bana',
+        'message': 'Merhaba',
+        'media_url': None,
+        'open_date': (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat(),
+        'is_opened': False,
+        'notification_sent': False,
+        'notification_claimed_until': None,
+        'notification_claim_token': None,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }).execute().data[0]['id']
+
+
+def legacy_get(capsule_id):
+    capsule = db.table('time_capsules').select('*').eq('id', capsule_id).execute().data[0]
+    if not capsule['notification_sent']:
+        with sent_lock:
+            sent.append(str(capsule_id))
+        db.table('time_capsules').update({'notification_sent': True}).eq('id', capsule_id).execute()
+
+
+def try_lead(lock_path: str, tried, results) -> None:
+    lock = LeaderLock(lock_path)
+    results.put(lock.try_acquire())
+    # The leader holds on until every process has tried
+    tried.wait(timeout=60)
+    lock.release()
+
+
+def count_leaders(lock_path: str, processes: int = 4) -> int:
+    tried = multiprocessing.Barrier(processes)
+    results = multiprocessing.Queue()
+    contenders = [multiprocessing.Process(target=try_lead, args=(lock_path, tried, results)) for _ in range(processes)]
+    for contender in contenders:
+        contender.start()
+    leaders = sum(results.get(timeout=60) for _ in contenders)
+    for contender in contenders:
+        contender.join()
+    return leaders
+
+
+def hammer(targets: list) -> None:
+    barrier = threading.Barrier(len(targets))
+
+    def run(target):
+        barrier.wait()
+        target()
+
+    threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def main():
+    failures = 0
+
+    legacy_id = add_due_capsule()
+    sent.clear()
+    hammer([lambda: legacy_get(legacy_id)] * THREADS)
+    print(f'previous handler:  {len(sent)} emails for {THREADS} concurrent GETs')
+
+    capsule_id = add_due_capsule()
+    sent.clear()
+    hammer([
+        lambda: app.test_client().get(f'/api/capsules/{capsule_id}'),
+        lambda: app.test_client().get(f'/api/capsules/check/{capsule_id}'),
+    ] * (THREADS // 2))
+    from_gets = len(sent)
+    hammer([
+        lambda: app.test_client().post('/api/capsules/check-and-send-emails'),
+        lambda: CapsuleScheduler().run_once(datetime.now(timezone.utc)),
+    ] * (THREADS // 2))
+    print(f'GETs:              {from_gets} emails for {THREADS} concurrent GETs')
+    print(f'claim protocol:    {len(sent)} emails for {THREADS} concurrent cron + dispatcher runs')
+    failures += from_gets != 0 or len(sent) != 1
+
+    # A sender that claims and then dies must not block the capsule forever
+    orphan_id = add_due_capsule()
+    sent.clear()
+    now = datetime.now(timezone.utc)
+    _, claimed = claim_notifications([orphan_id], now, lease=60)
+    utils.capsule_scheduler.send_due_notifications(now)
+    blocked = len(sent)
+    utils.capsule_scheduler.send_due_notifications(now + timedelta(seconds=61))
+    print(f'expired lease:     {blocked} emails while claimed, {len(sent)} after the lease ran out')
+    failures += not claimed or blocked != 0 or len(sent) != 1
+
+    # Emails queued, then marking them sent fails: the retry after the lease must not queue them again
+    unmarked_id = add_due_capsule()
+    utils.capsule_scheduler.enqueue_emails = utils.email_queue.enqueue_emails
+    finish_notification_claim = utils.capsule_scheduler.finish_notification_claim
+
+    def fail_once(token, queued):
+        utils.capsule_scheduler.finish_notification_claim = finish_notification_claim
+        raise ConnectionError('simulated failure after the emails were queued')
+
+    utils.capsule_scheduler.finish_notification_claim = fail_once
+    now = datetime.now(timezone.utc)
+    utils.capsule_scheduler.send_due_notifications(now)
+    utils.capsule_scheduler.send_due_notifications(now + timedelta(seconds=utils.capsule_scheduler.NOTIFICATION_LEASE_SECONDS + 1))
+    queued = sum(utils.email_queue.email_queue_stats().values())
+    notified = db.table('time_capsules').select('notification_sent').eq('id', unmarked_id).execute().data[0]
+    print(f'failed marking:    {queued} emails queued over the failed run and its retry')
+    failures += queued != 1 or not notified['notification_sent']
+    utils.capsule_scheduler.enqueue_emails = record_enqueue
+
+    lock_path = os.path.join(tempfile.mkdtemp(), 'dispatcher.lock')
+    leaders = count_leaders(lock_path)
+    print(f'leader lock:       {leaders} of 4 processes became leader')
+    failures += leaders != 1
+
+    print('OK' if not failures else 'FAILED')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
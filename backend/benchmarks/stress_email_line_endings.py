@@ -0,0 +1,55 @@
+"""
+Line ending check for rendered emails. Every template is rendered with
+non-ASCII sender names of growing length, so long subjects get folded over
+several header lines; each message must use CRLF only (a bare LF or CR in
+SMTP DATA is rejected by major receivers) and its Subject must decode back
+to the text it was rendered from.
+
+    cd backend && python benchmarks/stress_email_line_endings.py
+"""
+import os
+import re
+import sys
+from email import message_from_bytes, policy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.email_templates import EMAIL_SUBJECTS, load_email_templates
+
+BARE_LINE_BREAK = re.compile(rb'(?<!\r)\n|\r(?!\n)')
+
+CONTEXT = {
+    'recipient_name': 'Mehmet',
+    'view_link': 'http://localhost:3000/view-gift.html?id=42',
+    'open_date': '2026-01-01',
+    'capsule_link': 'http://localhost:3000/view-capsule.html?id=7',
+}
+
+
+def main() -> int:
+    failures = []
+    for name, template in load_email_templates().items():
+        for length in range(1, 120, 7):
+            context = dict(CONTEXT, sender_name='Şükrü Çağlayan Öztürk ' * (length // 20 + 1))
+            context.update({field: 'değer' for field in template.text.fields + template.html.fields
+                            if field not in context})
+            message = template.render('giftcapsule@example.com', 'mehmet@example.com', context)
+
+            if BARE_LINE_BREAK.search(message):
+                failures.append(f'{name} ({length}): bare line break in {message[:200]!r}')
+            subject = message_from_bytes(message, policy=policy.default)['Subject']
+            expected = EMAIL_SUBJECTS[name].format(**context)
+            if subject != expected:
+                failures.append(f'{name} ({length}): subject decodes to {subject!r}, expected {expected!r}')
+
+    for failure in failures[:10]:
+        print(f'FAIL: {failure}')
+    if failures:
+        print(f'MISMATCH: {len(failures)} bad messages')
+        return 1
+
+    print('OK: every rendered email uses CRLF line endings and decodes to its subject')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
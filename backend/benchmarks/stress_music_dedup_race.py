@@ -0,0 +1,157 @@
+"""
+Race check for POST /api/music duplicates the worker's dedup index does not
+know about. Several requests add the same new video at once, so all but one
+hit the unique index; every 409 must carry the id of the stored song. Then a
+song added behind the index's back is deleted right after the insert
+conflicts with it; the request must add the song instead of answering 409
+without an id. Last, a song the index knows is deleted by another worker;
+adding the video again must succeed instead of naming the deleted row.
+
+    cd backend && python benchmarks/stress_music_dedup_race.py
+"""
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATA_BACKEND'] = 'memory'
+os.environ['EMAIL_QUEUE_PATH'] = os.path.join(tempfile.mkdtemp(), 'email_queue.sqlite3')
+os.environ['CAPSULE_SCHEDULER_ENABLED'] = 'false'
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+
+from app import create_app
+from utils.supabase_client import supabase
+from utils.repositories import music_repository
+from utils.music_dedup import canonical_youtube_url, get_music_dedup_index, is_unique_violation
+
+JAR_TYPE = 'Mutlu'
+
+
+def _song(video_id: str, added_by: str) -> dict:
+    return {
+        'jar_type': JAR_TYPE, 'song_name': 'Şarkı', 'artist_name': 'Sanatçı',
+        'youtube_url': canonical_youtube_url(video_id), 'added_by': added_by
+    }
+
+
+def _stored_ids(video_id: str) -> list:
+    rows = supabase.table('music_jars').select('id').eq('jar_type', JAR_TYPE).eq('youtube_video_id', video_id).execute()
+    return [row['id'] for row in rows.data]
+
+
+def concurrent_adds(flask_app, video_id: str, requests: int = 8) -> list:
+    """
+    Every request passes the index check before any of them inserts
+    """
+    dedup_index = get_music_dedup_index(supabase)
+    dedup_index.find(JAR_TYPE, video_id)  # build the index before the race
+    barrier = threading.Barrier(requests)
+    find = dedup_index.find
+
+    def find_then_wait(jar_type, video):
+        music_id = find(jar_type, video)
+        barrier.wait()
+        return music_id
+
+    dedup_index.find = find_then_wait
+    responses = []
+
+    def add(i):
+        with flask_app.test_client() as client:
+            response = client.post('/api/music', json=_song(video_id, f'user {i}'))
+            responses.append((response.status_code, response.get_json()))
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    dedup_index.find = find
+
+    failures = []
+    stored = _stored_ids(video_id)
+    if len(stored) != 1:
+        return [f'race: {len(stored)} rows stored for one video']
+    created = [body for status, body in responses if status == 201]
+    if len(created) != 1:
+        failures.append(f'race: {len(created)} requests got 201, expected 1')
+    for status, body in responses:
+        if status == 409 and body.get('music_id') != stored[0]:
+            failures.append(f'race: 409 with music_id {body.get("music_id")!r}, the stored song is {stored[0]}')
+        elif status not in (201, 409):
+            failures.append(f'race: unexpected {status} {body}')
+    return failures
+
+
+def deleted_after_conflict(flask_app, video_id: str) -> list:
+    """
+    Another worker's song, unknown to this index, is deleted once the insert has conflicted with it
+    """
+    get_music_dedup_index(supabase).find(JAR_TYPE, video_id)
+    other = music_repository.insert({**_song(video_id, 'other worker'), 'youtube_video_id': video_id})
+    insert = music_repository.insert
+
+    def insert_then_delete(payload):
+        try:
+            return insert(payload)
+        except Exception as e:
+            if is_unique_violation(e):
+                supabase.table('music_jars').delete().eq('id', other['id']).execute()
+            raise
+
+    music_repository.insert = insert_then_delete
+    try:
+        with flask_app.test_client() as client:
+            response = client.post('/api/music', json=_song(video_id, 'this worker'))
+    finally:
+        music_repository.insert = insert
+
+    body = response.get_json()
+    if response.status_code == 409:
+        return [f'deleted: 409 with music_id {body.get("music_id")!r} for a song that is gone']
+    stored = _stored_ids(video_id)
+    if response.status_code != 201 or stored != [body.get('music_id')]:
+        return [f'deleted: expected the song to be added, got {response.status_code} {body}, stored {stored}']
+    return []
+
+
+def deleted_from_index(flask_app, video_id: str) -> list:
+    """
+    The index learned the song from this worker's add; another worker deletes it
+    """
+    with flask_app.test_client() as client:
+        first = client.post('/api/music', json=_song(video_id, 'first')).get_json()
+        supabase.table('music_jars').delete().eq('id', first['music_id']).execute()
+        response = client.post('/api/music', json=_song(video_id, 'again'))
+
+    body = response.get_json()
+    if response.status_code != 201:
+        return [f'stale: re-adding a deleted song got {response.status_code} {body}']
+    if get_music_dedup_index(supabase).find(JAR_TYPE, video_id) != body['music_id']:
+        return ['stale: the index does not point at the re-added song']
+    return []
+
+
+def main() -> int:
+    flask_app = create_app()
+    failures = []
+    for i in range(20):
+        failures += concurrent_adds(flask_app, f'race{i:07d}')
+    failures += deleted_after_conflict(flask_app, 'deleted0001')
+    failures += deleted_from_index(flask_app, 'deleted0002')
+
+    for failure in failures[:10]:
+        print(f'FAIL: {failure}')
+    if failures:
+        print(f'MISMATCH: {len(failures)} failures')
+        return 1
+
+    print('OK: every 409 named a stored song, deleted songs could be added again')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
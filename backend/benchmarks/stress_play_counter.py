@@ -0,0 +1,103 @@
+"""
+Consistency check for the play counter write-behind buffer under concurrent load.
+Many threads record plays while the flusher runs against a stand-in for the
+`increment_play_counts` RPC that randomly fails; after shutdown every play must
+be accounted for exactly once.
+
+    cd backend && python benchmarks/stress_play_counter.py
+"""
+import os
+import sys
+import time
+import random
+import threading
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.play_counter import PlayCounterBuffer
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class FlakyPlayCountRPC:
+    """
+    Applies increment_play_counts atomically in memory and fails `failure_rate` of the calls
+    """
+
+    def __init__(self, failure_rate: float = 0.1):
+        self.failure_rate = failure_rate
+        self.play_counts = Counter()
+        self.calls = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def rpc(self, name: str, params: dict):
+        return self._Call(self, params['deltas'])
+
+    class _Call:
+        def __init__(self, store, deltas):
+            self.store = store
+            self.deltas = deltas
+
+        def execute(self):
+            store = self.store
+            with store._lock:
+                store.calls += 1
+                if random.random() < store.failure_rate:
+                    store.failures += 1
+                    raise ConnectionError('simulated network failure')
+                for music_id, delta in self.deltas.items():
+                    store.play_counts[music_id] += delta
+                return _Result([{'id': music_id, 'play_count': store.play_counts[music_id]} for music_id in self.deltas])
+
+
+def main(threads: int = 32, plays_per_thread: int = 5000, songs: int = 50) -> int:
+    rpc = FlakyPlayCountRPC()
+    buffer = PlayCounterBuffer(rpc, flush_interval=0.01, max_pending=500)
+    buffer.start()
+
+    expected = Counter()
+    expected_lock = threading.Lock()
+
+    def play():
+        local = Counter()
+        for _ in range(plays_per_thread):
+            music_id = str(random.randint(1, songs))
+            buffer.add(music_id)
+            local[music_id] += 1
+        with expected_lock:
+            expected.update(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=play) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    # A final failure during shutdown leaves deltas pending; keep flushing until drained
+    buffer.stop()
+    while buffer.pending():
+        try:
+            buffer.flush()
+        except ConnectionError:
+            pass
+
+    total = threads * plays_per_thread
+    print(f'{total:,} plays from {threads} threads in {elapsed:.2f}s ({total / elapsed:,.0f} plays/s)')
+    print(f'{rpc.calls} RPC calls ({rpc.failures} failed), {total / max(rpc.calls, 1):,.0f} plays per call')
+
+    if rpc.play_counts != expected:
+        print('MISMATCH: stored play counts differ from recorded plays')
+        return 1
+
+    print('OK: every play was stored exactly once')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Session bookkeeping check for the SMTP pool against an in-memory SMTP
+stand-in. Covers the paths where send_many ends up on a new session: a
+message rejected on a freshly recycled session, a message rejected right
+after a reconnect, and a reconnect that cannot log in. Afterwards no message
+may have been sent on a closed session, every open session must be back in
+the pool and no closed one may be.
+
+    cd backend && python benchmarks/stress_smtp_pool_sessions.py
+"""
+import os
+import sys
+import smtplib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import smtp_pool
+from utils.smtp_pool import SMTPConnectionPool
+
+REFUSED = 'refused@example.com'
+
+
+class FakeSMTP:
+    """
+    Accepts everything except REFUSED; a closed session raises like a dropped connection
+    """
+    sessions = []
+    # The session (1-based, in opening order) whose login fails
+    failing_login = None
+
+    def __init__(self, host, port, timeout=None):
+        self.closed = False
+        self.sent = []
+        FakeSMTP.sessions.append(self)
+
+    def ehlo(self):
+        pass
+
+    def has_extn(self, name):
+        return name == 'auth'
+
+    def login(self, username, password):
+        if FakeSMTP.sessions.index(self) + 1 == FakeSMTP.failing_login:
+            self.closed = True
+            raise smtplib.SMTPAuthenticationError(535, b'Authentication failed')
+
+    def noop(self):
+        if self.closed:
+            raise smtplib.SMTPServerDisconnected('closed')
+
+    def sendmail(self, from_addr, to_addrs, message, mail_options=()):
+        if self.closed:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        if to_addrs == REFUSED:
+            raise smtplib.SMTPRecipientsRefused({REFUSED: (550, b'No such user')})
+        self.sent.append(message)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+def _pool(max_messages: int = 100) -> SMTPConnectionPool:
+    FakeSMTP.sessions = []
+    FakeSMTP.failing_login = None
+    return SMTPConnectionPool('localhost', 25, 'user', 'password', use_ssl=False, size=1,
+                              max_messages_per_connection=max_messages)
+
+
+def _messages(recipients: list) -> list:
+    return [('from@example.com', to, f'message {i}') for i, to in enumerate(recipients)]
+
+
+def _check_sessions(name: str, pool: SMTPConnectionPool) -> list:
+    failures = []
+    idle = list(pool._idle.queue)
+    if any(conn.server.closed for conn in idle):
+        failures.append(f'{name}: a closed session went back to the pool')
+    open_sessions = [session for session in FakeSMTP.sessions if not session.closed]
+    if len(open_sessions) != len(idle):
+        failures.append(f'{name}: {len(open_sessions)} open sessions but {len(idle)} in the pool (leaked)')
+    if not pool._slots.acquire(blocking=False):
+        failures.append(f'{name}: the pool slot was never released')
+    else:
+        pool._slots.release()
+    return failures
+
+
+def rejected_on_recycled_session() -> list:
+    pool = _pool(max_messages=2)
+    to = ['a@example.com', 'b@example.com', REFUSED, 'c@example.com', 'd@example.com']
+    results = pool.send_many(_messages(to))
+
+    failures = []
+    if results != [True, True, False, True, True]:
+        failures.append(f'recycled: expected only the refused message to fail, got {results}')
+    delivered = sum(len(session.sent) for session in FakeSMTP.sessions)
+    if delivered != 4:
+        failures.append(f'recycled: {delivered} messages delivered, expected 4')
+    return failures + _check_sessions('recycled', pool)
+
+
+def rejected_after_reconnect() -> list:
+    pool = _pool()
+    pool.send_many(_messages(['a@example.com']))
+    # The server drops the pooled session; the retry on a new one is refused
+    FakeSMTP.sessions[0].closed = True
+    results = pool.send_many(_messages([REFUSED, 'b@example.com']))
+
+    failures = []
+    if results != [False, True]:
+        failures.append(f'reconnect: expected [False, True], got {results}')
+    return failures + _check_sessions('reconnect', pool)
+
+
+def login_fails_on_recycle() -> list:
+    pool = _pool(max_messages=2)
+    # The session replacing the first one after two messages cannot log in
+    FakeSMTP.failing_login = 2
+    results = pool.send_many(_messages(['a@example.com', 'b@example.com', 'c@example.com', 'd@example.com']))
+
+    failures = []
+    if results != [True, True, False, False]:
+        failures.append(f'login: expected [True, True, False, False], got {results}')
+    failures += _check_sessions('login', pool)
+
+    # The next batch opens a working session
+    if pool.send_many(_messages(['d@example.com'])) != [True]:
+        failures.append('login: the pool did not recover once logging in worked again')
+    return failures
+
+
+def main() -> int:
+    smtp_pool.smtplib.SMTP = FakeSMTP
+    failures = rejected_on_recycled_session() + rejected_after_reconnect() + login_fails_on_recycle()
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if failures:
+        return 1
+
+    print('OK: no message sent on a closed session, no session leaked or pooled after closing')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import re
+import asyncio
+from datetime import datetime, timezone
+from email.utils import formatdate
+
+from utils.async_supabase import get_async_supabase
+from utils.capsule_scheduler import parse_timestamp
+from utils.http_cache import build_cached_body
+from utils.json_provider import dumps_bytes
+from utils.music_sampler import get_music_sampler
+from utils.record_cache import gift_cache, capsule_cache
+from utils.repositories import gift_repository, capsule_repository, jar_type_repository
+from utils.music_leaderboard import MUSIC_COLUMNS
+from utils.supabase_client import supabase
+from routes.music import jar_types_cache
+
+# Async versions of the read endpoints served on every page view. They share the
+# record caches with the Flask routes and answer with the same bodies and ETags.
+
+
+class AsyncRequest:
+    def __init__(self, method: str, path: str, headers: dict, query: dict, remote_addr: str = None):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.query = query
+        self.remote_addr = remote_addr
+
+
+class AsyncResponse:
+    def __init__(self, status: int, body: bytes = b'', headers: dict = None, cached=None):
+        self.status = status
+        self.body = body
+        self.headers = {'content-type': 'application/json', **(headers or {})}
+        # The CachedBody the body came from, whose compressed copies can be reused
+        self.cached = cached
+
+
+def json_response(payload, status: int = 200) -> AsyncResponse:
+    return AsyncResponse(status, dumps_bytes(payload))
+
+
+def conditional_response(request: AsyncRequest, cached, max_age: int, last_modified: float = None,
+                         public: bool = True) -> AsyncResponse:
+    """
+    Counterpart of utils.http_cache.conditional_response for the async routes
+    """
+    cache_control = f'public, max-age={max_age}' if public else f'private, no-cache, max-age={max_age}'
+    headers = {'etag': f'"{cached.etag}"', 'cache-control': cache_control}
+    if last_modified is not None:
+        headers['last-modified'] = formatdate(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get('if-none-match', '')
+    if cached.etag in [tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')]:
+        return AsyncResponse(304, b'', headers)
+
+    return AsyncResponse(200, cached.body, headers, cached)
+
+
+async def _cached_row(flask_app, cache, repository, record_id):
+    """
+    Read a row through `cache`; misses are fetched on the async pool. There is no
+    single-flight here: waiting on another loader would block the event loop.
+    A row invalidated while its fetch was awaited is served once but not cached.
+    """
+    key = str(record_id)
+    entry = cache.get_entry(key)
+    if entry is not None:
+        return entry
+
+    token = cache.begin_load(key)
+    try:
+        result = await (
+            get_async_supabase().table(repository.table).select(repository.public_columns).eq('id', record_id).execute()
+        )
+        with flask_app.app_context():
+            value = build_cached_body(result.data[0]) if result.data else None
+    except BaseException:
+        cache.abort_load(key, token)
+        raise
+    return cache.finish_load(key, token, value)
+
+
+async def get_gift(flask_app, request: AsyncRequest, gift_id: str) -> AsyncResponse:
+    entry = await _cached_row(flask_app, gift_cache, gift_repository, gift_id)
+    if entry.value is None:
+        return json_response({'error': 'Gift not found'}, 404)
+    return conditional_response(request, entry.value, max_age=0, last_modified=entry.stored_at, public=False)
+
+
+async def get_capsule(flask_app, request: AsyncRequest, capsule_id: str) -> AsyncResponse:
+    entry = await _cached_row(flask_app, capsule_cache, capsule_repository, capsule_id)
+    if entry.value is None:
+        return json_response({'error': 'Capsule not found'}, 404)
+    return conditional_response(request, entry.value, max_age=0, last_modified=entry.stored_at, public=False)
+
+
+async def check_capsule(flask_app, request: AsyncRequest, capsule_id: str) -> AsyncResponse:
+    entry = await _cached_row(flask_app, capsule_cache, capsule_repository, capsule_id)
+    if entry.value is None:
+        return json_response({'error': 'Capsule not found'}, 404)
+
+    capsule = entry.value.data
+    return json_response({
+        'can_open': datetime.now(timezone.utc) >= parse_timestamp(capsule['open_date']),
+        'open_date': capsule['open_date'],
+        'is_opened': capsule['is_opened']
+    })
+
+
+async def get_jar_types(flask_app, request: AsyncRequest) -> AsyncResponse:
+    entry = jar_types_cache.get_entry('all')
+    if entry is None:
+        token = jar_types_cache.begin_load('all')
+        try:
+            result = await get_async_supabase().table('jar_types').select(jar_type_repository.public_columns).execute()
+            with flask_app.app_context():
+                value = build_cached_body(result.data or [])
+        except BaseException:
+            jar_types_cache.abort_load('all', token)
+            raise
+        entry = jar_types_cache.finish_load('all', token, value)
+    return conditional_response(request, entry.value, max_age=int(jar_types_cache.ttl),
+                                last_modified=entry.stored_at)
+
+
+async def get_random_music(flask_app, request: AsyncRequest, jar_type: str = None) -> AsyncResponse:
+    client_id = None
+    if request.query.get('no_repeat', 'false').lower() == 'true':
+        client_id = request.query.get('client_id') or request.headers.get('x-client-id') or request.remote_addr
+    weighted = request.query.get('weighted', 'false').lower() == 'true'
+
+    sampler = get_music_sampler(supabase)
+    for _ in range(3):
+        # The index lives in memory but may refresh itself over the sync client
+        music_id = await asyncio.to_thread(sampler.pick, jar_type, weighted, client_id)
+        if music_id is None:
+            break
+
+        result = await get_async_supabase().table('music_jars').select(MUSIC_COLUMNS).eq('id', music_id).execute()
+        if result.data:
+            return json_response(result.data[0])
+        sampler.remove(music_id)
+
+    return json_response({'error': 'No music found in this jar' if jar_type else 'No music found'}, 404)
+
+
+ASYNC_ROUTES = [
+    ('GET', re.compile(r'/api/gifts/(?P<gift_id>[^/]+)'), get_gift),
+    ('GET', re.compile(r'/api/capsules/check/(?P<capsule_id>[^/]+)'), check_capsule),
+    ('GET', re.compile(r'/api/capsules/(?P<capsule_id>[^/]+)'), get_capsule),
+    ('GET', re.compile(r'/api/music/jars'), get_jar_types),
+    ('GET', re.compile(r'/api/music/random'), get_random_music),
+    ('GET', re.compile(r'/api/music/random/(?P<jar_type>[^/]+)'), get_random_music),
+]
+
+
+def match_async_route(method: str, path: str):
+    """
+    Return (handler, path params) for an async route, or None to fall through to Flask
+    """
+    for route_method, pattern, handler in ASYNC_ROUTES:
+        if route_method == method:
+            match = pattern.fullmatch(path)
+            if match:
+                return handler, match.groupdict()
+    return None
@@ -1,20 +1,39 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timezone
-import sys
-import os
-
-# Add parent directory to path to import utils
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.supabase_client import supabase
-from utils.email_sender import send_capsule_email, send_capsule_opened_email
+import time
+
+from utils.repositories import capsule_repository
+from utils.email_queue import enqueue_email
+from utils.capsule_scheduler import send_due_notifications, capsule_scheduler
+from utils.capsule_state import load_capsule_state, mark_capsule_opened
+from utils.record_cache import capsule_cache
+from utils.http_cache import conditional_response
+from utils.idempotency import idempotent
+from utils.media_storage import MediaError, get_media_storage, parse_media_id, original_key
+from utils.thumbnails import media_payload, thumbnail_pool
 
 capsules_bp = Blueprint('capsules', __name__)
 
 
+def _attach_thumbnail(capsule_id):
+    """
+    on_ready callback that stores a thumbnail rendered after the capsule was created
+    """
+
+    def attach(thumbnail_url: str) -> None:
+        capsule_repository.update(capsule_id, {'media_thumbnail_url': thumbnail_url})
+        capsule_cache.invalidate(str(capsule_id))
+
+    return attach
+
+
 @capsules_bp.route('', methods=['POST'])
+@idempotent
 def create_capsule():
     """
     Create a new time capsule
+    Media is either a link (media_url) or a file uploaded through /api/media (media_id)
+    Retries with the same Idempotency-Key get the first response back
     """
     try:
         data = request.get_json()
@@ -25,26 +44,45 @@ def create_capsule():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
 
+        media_url = data.get('media_url', None)
+        media_thumbnail_url = None
+        media_id = None
+        if data.get('media_id'):
+            media_id = parse_media_id(data['media_id'])
+            storage = get_media_storage()
+            if not storage.exists(original_key(media_id)):
+                return jsonify({'error': 'Media not found, upload it first'}), 400
+            media = media_payload(storage, media_id)
+            media_url = media['media_url']
+            media_thumbnail_url = media['thumbnail_url']
+
         # Insert capsule into database
         capsule_data = {
             'creator_email': data['creator_email'],
             'title': data['title'],
             'message': data['message'],
-            'media_url': data.get('media_url', None),
+            'media_url': media_url,
+            'media_thumbnail_url': media_thumbnail_url,
             'open_date': data['open_date'],
             'is_opened': False,
             'notification_sent': False,
             'created_at': datetime.utcnow().isoformat()
         }
 
-        result = supabase.table('time_capsules').insert(capsule_data).execute()
+        capsule = capsule_repository.insert(capsule_data)
 
-        if not result.data:
+        if capsule is None:
             return jsonify({'error': 'Failed to create capsule'}), 500
 
-        capsule_id = result.data[0]['id']
+        capsule_id = capsule['id']
+        # Drop a cached "not found" for this id
+        capsule_cache.invalidate(str(capsule_id))
 
-        # Send confirmation email
+        # Not rendered yet: fill in media_thumbnail_url once it is. Until then readers use media_url.
+        if media_id is not None and media_thumbnail_url is None:
+            thumbnail_pool.submit(media_id, on_ready=_attach_thumbnail(capsule_id))
+
+        # Queue confirmation email
         view_link = f'http://localhost:3000/view-capsule.html?id={capsule_id}'
         email_data = {
             'title': data['title'],
@@ -52,7 +90,10 @@ def create_capsule():
             'view_link': view_link
         }
 
-        send_capsule_email(data['creator_email'], email_data)
+        enqueue_email('capsule_created', data['creator_email'], email_data)
+
+        # Let the scheduler fire the opening email close to open_date
+        capsule_scheduler.schedule(capsule_id, data['open_date'])
 
         return jsonify({
             'success': True,
@@ -60,6 +101,8 @@ def create_capsule():
             'message': 'Zaman kapsülünüz başarıyla oluşturuldu!'
         }), 201
 
+    except MediaError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -68,36 +111,18 @@ def create_capsule():
 def get_capsule(capsule_id):
     """
     Get capsule details by ID (supports both UUID and integer)
-    Also sends opening notification email if time has arrived and not sent yet
+    Served from the record cache; repeat viewers revalidate with If-None-Match
+    Opening emails are sent by the capsule dispatcher, never from here
     """
     try:
-        result = supabase.table('time_capsules').select('*').eq('id', capsule_id).execute()
+        state = load_capsule_state(capsule_id)
 
-        if not result.data:
+        if state is None:
             return jsonify({'error': 'Capsule not found'}), 404
 
-        capsule = result.data[0]
-        
-        # Check if opening time has arrived and send email if needed
-        open_date = datetime.fromisoformat(capsule['open_date'].replace('Z', '+00:00'))
-        current_date = datetime.now(timezone.utc)
-        
-        if current_date >= open_date and not capsule.get('is_opened', False) and not capsule.get('notification_sent', False):
-            view_link = f'http://localhost:3000/view-capsule.html?id={capsule_id}'
-            email_data = {
-                'title': capsule['title'],
-                'view_link': view_link
-            }
-            
-            if send_capsule_opened_email(capsule['creator_email'], email_data):
-                # Mark as email sent
-                supabase.table('time_capsules').update({'notification_sent': True}).eq('id', capsule_id).execute()
-                # Refresh capsule data
-                result = supabase.table('time_capsules').select('*').eq('id', capsule_id).execute()
-                if result.data:
-                    capsule = result.data[0]
-
-        return jsonify(capsule), 200
+        entry = state.entry
+
+        return conditional_response(entry.value, max_age=0, last_modified=entry.stored_at, public=False)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -107,34 +132,17 @@ def get_capsule(capsule_id):
 def check_capsule(capsule_id):
     """
     Check if capsule can be opened (supports both UUID and integer)
-    Also sends opening notification email if time has arrived and not sent yet
     """
     try:
-        result = supabase.table('time_capsules').select('*').eq('id', capsule_id).execute()
+        state = load_capsule_state(capsule_id)
 
-        if not result.data:
+        if state is None:
             return jsonify({'error': 'Capsule not found'}), 404
 
-        capsule = result.data[0]
-        open_date = datetime.fromisoformat(capsule['open_date'].replace('Z', '+00:00'))
-        current_date = datetime.now(timezone.utc)
-
-        can_open = current_date >= open_date
-
-        # Send opening notification email if time has arrived and not sent yet
-        if can_open and not capsule.get('is_opened', False) and not capsule.get('notification_sent', False):
-            view_link = f'http://localhost:3000/view-capsule.html?id={capsule_id}'
-            email_data = {
-                'title': capsule['title'],
-                'view_link': view_link
-            }
-            
-            if send_capsule_opened_email(capsule['creator_email'], email_data):
-                # Mark as email sent
-                supabase.table('time_capsules').update({'notification_sent': True}).eq('id', capsule_id).execute()
+        capsule = state.capsule
 
         return jsonify({
-            'can_open': can_open,
+            'can_open': state.can_open,
             'open_date': capsule['open_date'],
             'is_opened': capsule['is_opened']
         }), 200
@@ -147,25 +155,16 @@ def check_capsule(capsule_id):
 def open_capsule(capsule_id):
     """
     Mark capsule as opened (supports both UUID and integer)
+    A single conditional update checks the open date and writes the flag
     """
     try:
-        # First check if it can be opened
-        result = supabase.table('time_capsules').select('*').eq('id', capsule_id).execute()
+        status, _ = mark_capsule_opened(capsule_id)
 
-        if not result.data:
+        if status == 'not_found':
             return jsonify({'error': 'Capsule not found'}), 404
-
-        capsule = result.data[0]
-        open_date = datetime.fromisoformat(capsule['open_date'].replace('Z', '+00:00'))
-        current_date = datetime.now(timezone.utc)
-
-        if current_date < open_date:
+        if status == 'too_early':
             return jsonify({'error': 'Capsule cannot be opened yet'}), 403
-
-        # Mark as opened
-        result = supabase.table('time_capsules').update({'is_opened': True}).eq('id', capsule_id).execute()
-
-        if not result.data:
+        if status == 'failed':
             return jsonify({'error': 'Failed to open capsule'}), 500
 
         return jsonify({'success': True}), 200
@@ -181,43 +180,16 @@ def check_and_send_opening_emails():
     This endpoint should be called periodically (e.g., via cron job)
     """
     try:
-        current_date = datetime.now(timezone.utc)
-        
-        # Find capsules that:
-        # 1. Have not had notification_sent yet
-        # 2. Are not yet opened
-        result = supabase.table('time_capsules').select('*').eq('notification_sent', False).eq('is_opened', False).execute()
-        
-        if not result.data:
-            return jsonify({
-                'success': True,
-                'message': 'No capsules ready for opening',
-                'checked': 0
-            }), 200
-        
-        sent_count = 0
-        for capsule in result.data:
-            open_date = datetime.fromisoformat(capsule['open_date'].replace('Z', '+00:00'))
-            
-            # Check if opening time has arrived
-            if current_date >= open_date:
-                view_link = f'http://localhost:3000/view-capsule.html?id={capsule["id"]}'
-                email_data = {
-                    'title': capsule['title'],
-                    'view_link': view_link
-                }
-                
-                # Send email
-                if send_capsule_opened_email(capsule['creator_email'], email_data):
-                    # Mark as email sent
-                    supabase.table('time_capsules').update({'notification_sent': True}).eq('id', capsule['id']).execute()
-                    sent_count += 1
-        
+        started = time.perf_counter()
+        result = send_due_notifications(datetime.now(timezone.utc))
+
         return jsonify({
             'success': True,
-            'message': f'Sent {sent_count} opening notification email(s)',
-            'sent': sent_count
+            'message': f'Sent {result["sent"]} opening notification email(s)',
+            'sent': result['sent'],
+            'batches': result['batches'],
+            'total_ms': round((time.perf_counter() - started) * 1000, 2)
         }), 200
-        
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
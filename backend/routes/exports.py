@@ -0,0 +1,93 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from datetime import datetime
+import os
+
+from utils.repositories import gift_repository, capsule_repository, music_repository
+from utils.admin_auth import require_admin_token
+from utils.ndjson import ndjson_line
+
+exports_bp = Blueprint('exports', __name__)
+
+# Rows per keyset page; only one page is held in memory at a time
+EXPORT_PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', '1000'))
+
+# Exported columns per table (the columns the API writes)
+EXPORT_COLUMNS = {
+    'gifts': 'id,sender_name,recipient_name,recipient_email,card_template,message,is_viewed,created_at',
+    'time_capsules': 'id,creator_email,title,message,media_url,media_thumbnail_url,open_date,is_opened,notification_sent,created_at',
+    'music_jars': 'id,jar_type,song_name,artist_name,youtube_url,added_by,play_count,created_at',
+}
+
+
+def _date_filters() -> list:
+    """
+    (operator, value) filters on created_at from ?from= (inclusive) and ?to= (exclusive)
+    """
+    filters = []
+    for param, operator in (('from', 'gte'), ('to', 'lt')):
+        value = request.args.get(param)
+        if value:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f'{param} must be an ISO 8601 date or timestamp')
+            filters.append((operator, 'created_at', value))
+    return filters
+
+
+def _export(repository, filters: list) -> Response:
+    table = repository.table
+
+    def generate():
+        try:
+            for row in repository.iter_rows(EXPORT_COLUMNS[table], filters, EXPORT_PAGE_SIZE):
+                yield ndjson_line(row)
+        except Exception as e:
+            # Headers are already sent; a trailing error line marks the export as incomplete
+            yield ndjson_line({'error': str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={table}.ndjson'}
+    )
+
+
+@exports_bp.route('/gifts', methods=['GET'])
+@require_admin_token
+def export_gifts():
+    """
+    Stream every gift as NDJSON (?from=&to= filter on created_at)
+    """
+    try:
+        return _export(gift_repository, _date_filters())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@exports_bp.route('/capsules', methods=['GET'])
+@require_admin_token
+def export_capsules():
+    """
+    Stream every time capsule as NDJSON (?from=&to= filter on created_at)
+    """
+    try:
+        return _export(capsule_repository, _date_filters())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@exports_bp.route('/music', methods=['GET'])
+@require_admin_token
+def export_music():
+    """
+    Stream every song as NDJSON (?jar_type=, ?from=&to= filter on created_at)
+    """
+    try:
+        filters = _date_filters()
+        jar_type = request.args.get('jar_type')
+        if jar_type:
+            filters.append(('eq', 'jar_type', jar_type))
+        return _export(music_repository, filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
@@ -1,80 +1,207 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from datetime import datetime
-import sys
 import os
 
-# Add parent directory to path to import utils
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.supabase_client import supabase
-from utils.email_sender import send_gift_email
+from utils.repositories import gift_repository
+from utils.email_queue import enqueue_email, enqueue_emails
+from utils.record_cache import gift_cache, get_cached_gift
+from utils.http_cache import conditional_response
+from utils.idempotency import idempotent
+from utils.ndjson import iter_json_array, iter_ndjson, ndjson_line
 
 gifts_bp = Blueprint('gifts', __name__)
 
+GIFT_REQUIRED_FIELDS = ['sender_name', 'recipient_name', 'recipient_email', 'card_template', 'message']
+
+# Rows per multi-row insert and the most gifts one batch request may create
+GIFT_BATCH_CHUNK = int(os.getenv('GIFT_BATCH_CHUNK', '500'))
+GIFT_BATCH_MAX_ITEMS = int(os.getenv('GIFT_BATCH_MAX_ITEMS', '50000'))
+
+
+def _missing_field(data: dict):
+    for field in GIFT_REQUIRED_FIELDS:
+        if field not in data:
+            return field
+    return None
+
+
+def _gift_row(data: dict) -> dict:
+    return {
+        'sender_name': data['sender_name'],
+        'recipient_name': data['recipient_name'],
+        'recipient_email': data['recipient_email'],
+        'card_template': data['card_template'],
+        'message': data['message'],
+        'is_viewed': False,
+        'created_at': datetime.utcnow().isoformat()
+    }
+
+
+def _view_link(gift_id) -> str:
+    return f'http://localhost:3000/view-gift.html?id={gift_id}'
+
+
+def _gift_email(data: dict, gift_id) -> dict:
+    return {
+        'sender_name': data['sender_name'],
+        'recipient_name': data['recipient_name'],
+        'view_link': _view_link(gift_id)
+    }
+
 
 @gifts_bp.route('', methods=['POST'])
+@idempotent
 def create_gift():
     """
     Create a new gift and send email notification
+    Retries with the same Idempotency-Key get the first response back
     """
     try:
         data = request.get_json()
 
         # Validate required fields
-        required_fields = ['sender_name', 'recipient_name', 'recipient_email', 'card_template', 'message']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
+        missing = _missing_field(data)
+        if missing:
+            return jsonify({'error': f'Missing required field: {missing}'}), 400
 
         # Insert gift into database
-        gift_data = {
-            'sender_name': data['sender_name'],
-            'recipient_name': data['recipient_name'],
-            'recipient_email': data['recipient_email'],
-            'card_template': data['card_template'],
-            'message': data['message'],
-            'is_viewed': False,
-            'created_at': datetime.utcnow().isoformat()
-        }
-
-        result = supabase.table('gifts').insert(gift_data).execute()
+        gift = gift_repository.insert(_gift_row(data))
 
-        if not result.data:
+        if gift is None:
             return jsonify({'error': 'Failed to create gift'}), 500
 
-        gift_id = result.data[0]['id']
+        gift_id = gift['id']
+        # Drop a cached "not found" for this id
+        gift_cache.invalidate(str(gift_id))
 
-        # Send email notification
-        view_link = f'http://localhost:3000/view-gift.html?id={gift_id}'
-        email_data = {
-            'sender_name': data['sender_name'],
-            'recipient_name': data['recipient_name'],
-            'view_link': view_link
-        }
-
-        send_gift_email(data['recipient_email'], email_data)
+        # Queue email notification
+        enqueue_email('gift', data['recipient_email'], _gift_email(data, gift_id))
 
         return jsonify({
             'success': True,
             'gift_id': gift_id,
-            'view_link': view_link
+            'view_link': _view_link(gift_id)
         }), 201
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def _insert_gift_chunk(chunk: list) -> list:
+    """
+    Insert (index, data) pairs with one multi-row insert and queue their emails
+    in one transaction; returns one result dict per pair
+    """
+    try:
+        rows = gift_repository.insert_many([_gift_row(data) for _, data in chunk])
+        if len(rows) != len(chunk):
+            raise ValueError('Failed to create gifts')
+    except Exception as e:
+        return [{'index': index, 'success': False, 'error': str(e)} for index, _ in chunk]
+
+    # PostgREST returns inserted rows in request order
+    jobs = []
+    for (_, data), row in zip(chunk, rows):
+        gift_cache.invalidate(str(row['id']))
+        jobs.append(('gift', data['recipient_email'], _gift_email(data, row['id'])))
+    email_queued = enqueue_emails(jobs)
+
+    return [
+        {
+            'index': index,
+            'success': True,
+            'gift_id': row['id'],
+            'view_link': _view_link(row['id']),
+            'email_queued': email_queued
+        }
+        for (index, _), row in zip(chunk, rows)
+    ]
+
+
+def _create_gifts(items):
+    """
+    Validate, insert and report gifts as they are read; yields NDJSON lines
+    """
+    created = failed = 0
+    chunk = []
+
+    def flush():
+        nonlocal created, failed
+        for result in _insert_gift_chunk(chunk):
+            if result['success']:
+                created += 1
+            else:
+                failed += 1
+            yield ndjson_line(result)
+        chunk.clear()
+
+    error = None
+    try:
+        for index, (data, item_error) in enumerate(items):
+            if index >= GIFT_BATCH_MAX_ITEMS:
+                error = f'Batch is limited to {GIFT_BATCH_MAX_ITEMS} gifts'
+                break
+
+            if item_error is None and not isinstance(data, dict):
+                item_error = 'Each gift must be a JSON object'
+            if item_error is None:
+                missing = _missing_field(data)
+                if missing:
+                    item_error = f'Missing required field: {missing}'
+
+            if item_error is not None:
+                failed += 1
+                yield ndjson_line({'index': index, 'success': False, 'error': item_error})
+                continue
+
+            chunk.append((index, data))
+            if len(chunk) >= GIFT_BATCH_CHUNK:
+                yield from flush()
+
+    except ValueError as e:
+        # Malformed JSON array: keep what was read before the error
+        error = str(e)
+
+    if chunk:
+        yield from flush()
+
+    summary = {'done': True, 'created': created, 'failed': failed}
+    if error:
+        summary['error'] = error
+    yield ndjson_line(summary)
+
+
+@gifts_bp.route('/batch', methods=['POST'])
+def create_gifts_batch():
+    """
+    Create many gifts from a JSON array or an NDJSON body (one gift per line).
+    Gifts are inserted GIFT_BATCH_CHUNK rows at a time and one NDJSON result
+    line per gift ({index, success, gift_id | error}) is streamed back as each
+    chunk completes, followed by a {done, created, failed} summary line.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        items = iter_ndjson(request.stream)
+    elif request.mimetype == 'application/json':
+        items = iter_json_array(request.stream)
+    else:
+        return jsonify({'error': 'Send a JSON array (application/json) or NDJSON (application/x-ndjson)'}), 415
+
+    return Response(stream_with_context(_create_gifts(items)), mimetype='application/x-ndjson')
+
+
 @gifts_bp.route('/<gift_id>', methods=['GET'])
 def get_gift(gift_id):
     """
     Get gift details by ID (supports both UUID and integer)
+    Served from the record cache; repeat viewers revalidate with If-None-Match
     """
     try:
-        result = supabase.table('gifts').select('*').eq('id', gift_id).execute()
+        entry = get_cached_gift(gift_id)
 
-        if not result.data:
+        if entry.value is None:
             return jsonify({'error': 'Gift not found'}), 404
 
-        return jsonify(result.data[0]), 200
+        return conditional_response(entry.value, max_age=0, last_modified=entry.stored_at, public=False)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -86,9 +213,10 @@ def mark_gift_viewed(gift_id):
     Mark gift as viewed (supports both UUID and integer)
     """
     try:
-        result = supabase.table('gifts').update({'is_viewed': True}).eq('id', gift_id).execute()
+        updated = gift_repository.mark_viewed(gift_id)
+        gift_cache.invalidate(str(gift_id))
 
-        if not result.data:
+        if not updated:
             return jsonify({'error': 'Gift not found'}), 404
 
         return jsonify({'success': True}), 200
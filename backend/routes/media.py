@@ -0,0 +1,135 @@
+from flask import Blueprint, request, jsonify, send_file
+from urllib.parse import urljoin
+
+from utils.media_storage import (
+    MEDIA_MAX_BYTES, MEDIA_UPLOAD_URL_TTL, MediaError, get_media_storage, new_media_id, parse_media_id,
+    original_key, content_type_of
+)
+from utils.thumbnails import thumbnail_pool, media_payload
+
+media_bp = Blueprint('media', __name__)
+
+# Stored objects never change (every upload gets a new key), so browsers may keep them for good
+MEDIA_CACHE_MAX_AGE = 31536000
+
+
+@media_bp.route('/uploads', methods=['POST'])
+def create_upload():
+    """
+    Reserve a media_id and return a signed URL to PUT the file to
+    Body: {"content_type": "image/jpeg", "size": 123456}
+    """
+    try:
+        data = request.get_json()
+
+        for field in ('content_type', 'size'):
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+
+        size = data['size']
+        if not isinstance(size, int) or size <= 0:
+            return jsonify({'error': 'size must be a positive integer'}), 400
+        if size > MEDIA_MAX_BYTES:
+            return jsonify({'error': f'File is larger than {MEDIA_MAX_BYTES} bytes'}), 413
+
+        storage = get_media_storage()
+        media_id = new_media_id(data['content_type'])
+        upload = storage.create_upload(media_id, data['content_type'], size)
+        # The local backend answers with a path on this API
+        upload['url'] = urljoin(request.host_url, upload['url'])
+
+        response = {
+            **media_payload(storage, media_id, check_thumbnail=False),
+            'upload': upload,
+            'max_bytes': size,
+            'expires_in': MEDIA_UPLOAD_URL_TTL
+        }
+        if storage.name != 'local':
+            # The file goes around the API, so the client reports when it is in place
+            response['complete_url'] = urljoin(request.host_url, f'/api/media/{media_id}/complete')
+
+        return jsonify(response), 201
+
+    except MediaError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@media_bp.route('/uploads/<token>', methods=['PUT'])
+def put_upload(token):
+    """
+    Receive the file for a signed upload URL (MEDIA_BACKEND=local). The body
+    is streamed to disk chunk by chunk; a Content-Length over the signed size
+    is refused before anything is read. A URL stores one file: replaying it
+    once the file is in place gets 409 instead of replacing an immutable object.
+    """
+    try:
+        storage = get_media_storage()
+        if storage.name != 'local':
+            return jsonify({'error': 'Uploads go directly to storage'}), 404
+
+        claims = storage.signer.verify(token)
+
+        if request.content_length is None:
+            return jsonify({'error': 'Content-Length is required'}), 411
+        if request.content_length > claims['max']:
+            return jsonify({'error': f'File is larger than {claims["max"]} bytes'}), 413
+        if request.mimetype != claims['type']:
+            return jsonify({'error': f'Content-Type must be {claims["type"]}'}), 415
+
+        media_id = claims['id']
+        storage.write_stream(original_key(media_id), request.stream, claims['max'])
+        thumbnail_pool.submit(media_id)
+
+        return jsonify(media_payload(storage, media_id)), 201
+
+    except MediaError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@media_bp.route('/<media_id>/complete', methods=['POST'])
+def complete_upload(media_id):
+    """
+    Called after a direct-to-storage upload: checks the file arrived and queues its thumbnail
+    """
+    try:
+        parse_media_id(media_id)
+        storage = get_media_storage()
+
+        if not storage.exists(original_key(media_id)):
+            return jsonify({'error': 'Media not found'}), 404
+
+        thumbnail_pool.submit(media_id)
+
+        return jsonify(media_payload(storage, media_id)), 200
+
+    except MediaError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@media_bp.route('/files/<path:key>', methods=['GET'])
+def get_file(key):
+    """
+    Serve an uploaded file or thumbnail (MEDIA_BACKEND=local), with range and conditional requests
+    """
+    try:
+        storage = get_media_storage()
+        if storage.name != 'local' or not storage.exists(key):
+            return jsonify({'error': 'Media not found'}), 404
+
+        response = send_file(
+            storage.path(key), mimetype=content_type_of(key), conditional=True, max_age=MEDIA_CACHE_MAX_AGE
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    except MediaError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
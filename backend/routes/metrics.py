@@ -0,0 +1,54 @@
+from flask import Blueprint, Response, request, jsonify
+
+from utils.metrics import render_metrics
+from utils.profiler import profiler
+from utils.admin_auth import require_admin_token
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Request, Supabase, SMTP and render histograms of this worker in the Prometheus text format
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@metrics_bp.route('/metrics/profiler', methods=['GET'])
+@require_admin_token
+def get_profile():
+    """
+    Collapsed stacks of the current/last profiling session (?format=json for its status)
+    """
+    if request.args.get('format') == 'json':
+        return jsonify(profiler.stats()), 200
+    limit = request.args.get('limit', type=int)
+    return Response(profiler.collapsed(limit), mimetype='text/plain')
+
+
+@metrics_bp.route('/metrics/profiler', methods=['POST'])
+@require_admin_token
+def start_profile():
+    """
+    Start sampling this worker: ?interval_ms=5&seconds=30
+    """
+    interval_ms = request.args.get('interval_ms', 5.0, type=float)
+    seconds = request.args.get('seconds', 30.0, type=float)
+    if not 1 <= interval_ms <= 1000 or not 0 < seconds <= 600:
+        return jsonify({'error': 'interval_ms must be 1-1000 and seconds 0-600'}), 400
+
+    if not profiler.start(interval=interval_ms / 1000, duration=seconds):
+        return jsonify({'error': 'Profiler is already running', **profiler.stats()}), 409
+    return jsonify(profiler.stats()), 202
+
+
+@metrics_bp.route('/metrics/profiler', methods=['DELETE'])
+@require_admin_token
+def stop_profile():
+    """
+    Stop sampling and return what was collected
+    """
+    profiler.stop()
+    limit = request.args.get('limit', type=int)
+    return Response(profiler.collapsed(limit), mimetype='text/plain')
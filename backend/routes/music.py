@@ -1,37 +1,134 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import sys
 import os
-import random
 
-# Add parent directory to path to import utils
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.supabase_client import supabase
+from utils.repositories import music_repository, jar_type_repository
+from utils.play_counter import get_play_counter, increment_play_count as atomic_increment_play_count
+from utils.music_sampler import get_music_sampler
+from utils.music_leaderboard import MUSIC_COLUMNS, get_music_leaderboard
+from utils.cache import TTLCache
+from utils.http_cache import build_cached_body, conditional_response
+from utils.idempotency import idempotent
+from utils.pagination import encode_cursor, decode_cursor
+from utils.youtube import extract_video_id
+from utils.music_dedup import canonical_youtube_url, get_music_dedup_index, is_unique_violation
 
 music_bp = Blueprint('music', __name__)
 
+# Jar types are near-static reference data; call jar_types_cache.invalidate('all') after changing them
+jar_types_cache = TTLCache('jar_types', maxsize=1, ttl=float(os.getenv('JAR_TYPES_CACHE_TTL', '300')))
+
+# Keep play_count weights in the random sampler and the leaderboard in step with flushed play counts
+get_play_counter(supabase).on_flush(get_music_sampler(supabase).update_play_counts)
+get_play_counter(supabase).on_flush(get_music_leaderboard(supabase).update_play_counts)
+
+MUSIC_PAGE_SIZE = 20
+MUSIC_MAX_PAGE_SIZE = 100
+
+
+def _load_jar_types():
+    return build_cached_body(jar_type_repository.all())
+
 
 @music_bp.route('/jars', methods=['GET'])
 def get_jar_types():
     """
     Get all jar types
+    Served from a read-through cache; clients can revalidate with If-None-Match
+    """
+    try:
+        entry = jar_types_cache.get_or_load_entry('all', _load_jar_types)
+        return conditional_response(entry.value, max_age=int(jar_types_cache.ttl), last_modified=entry.stored_at)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _page_limit(default: int, maximum: int) -> int:
+    limit = request.args.get('limit', default, type=int)
+    if not 1 <= limit <= maximum:
+        raise ValueError(f'limit must be between 1 and {maximum}')
+    return limit
+
+
+@music_bp.route('', methods=['GET'])
+def list_music():
+    """
+    List songs, newest first or with ?sort=play_count most played first
+    Optional ?jar_type= filter; pages of ?limit= rows continue from ?cursor=
+    (the next_cursor of the previous page). Keyset pagination keeps every page
+    an index range scan however deep the client pages.
+    """
+    try:
+        sort = request.args.get('sort', 'newest')
+        if sort not in ('newest', 'play_count'):
+            return jsonify({'error': 'sort must be newest or play_count'}), 400
+        limit = _page_limit(MUSIC_PAGE_SIZE, MUSIC_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+
+        after = decode_cursor(cursor, 2 if sort == 'play_count' else 1) if cursor else None
+
+        # One extra row tells whether there is a next page
+        rows = music_repository.page(
+            MUSIC_COLUMNS, jar_type=request.args.get('jar_type'), sort=sort, after=after, limit=limit + 1
+        )
+        items = rows[:limit]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor([last['play_count'] or 0, last['id']] if sort == 'play_count' else [last['id']])
+
+        return jsonify({'items': items, 'next_cursor': next_cursor}), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@music_bp.route('/top', methods=['GET'])
+def get_top_music_any():
+    """
+    Most played songs across all jars (?limit=, up to MUSIC_LEADERBOARD_SIZE)
+    Served from the in-memory leaderboard
     """
     try:
-        result = supabase.table('jar_types').select('*').execute()
+        leaderboard = get_music_leaderboard(supabase)
+        return jsonify(leaderboard.top(limit=_page_limit(leaderboard.size, leaderboard.size))), 200
 
-        if not result.data:
-            return jsonify([]), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        return jsonify(result.data), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@music_bp.route('/top/<jar_type>', methods=['GET'])
+def get_top_music(jar_type):
+    """
+    Most played songs of a specific jar type (?limit=, up to MUSIC_LEADERBOARD_SIZE)
+    """
+    try:
+        leaderboard = get_music_leaderboard(supabase)
+        return jsonify(leaderboard.top(jar_type, limit=_page_limit(leaderboard.size, leaderboard.size))), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @music_bp.route('', methods=['POST'])
+@idempotent
 def add_music():
     """
     Add a new music to a jar
+    A video that is already in the jar is rejected with 409 and the existing song's id
+    Retries with the same Idempotency-Key get the first response back
     """
     try:
         data = request.get_json()
@@ -42,25 +139,53 @@ def add_music():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
 
+        video_id = extract_video_id(data['youtube_url'])
+        if video_id is None:
+            return jsonify({'error': 'Invalid YouTube URL'}), 400
+
+        # Known duplicates are answered after one primary key lookup instead of an insert attempt
+        dedup_index = get_music_dedup_index(supabase)
+        existing_id = dedup_index.find(data['jar_type'], video_id)
+        if existing_id is not None:
+            return _duplicate_music(existing_id)
+
         # Insert music into database
         music_data = {
             'jar_type': data['jar_type'],
             'song_name': data['song_name'],
             'artist_name': data['artist_name'],
-            'youtube_url': data['youtube_url'],
+            'youtube_url': canonical_youtube_url(video_id),
+            'youtube_video_id': video_id,
             'added_by': data['added_by'],
             'play_count': 0,
             'created_at': datetime.utcnow().isoformat()
         }
 
-        result = supabase.table('music_jars').insert(music_data).execute()
-
-        if not result.data:
+        # Only a song deleted between the conflict and reading it back makes the second attempt
+        for _ in range(2):
+            try:
+                music = music_repository.insert(music_data)
+                break
+            except Exception as e:
+                # Added by another worker since this one's index was built
+                if not is_unique_violation(e):
+                    raise
+                existing_id = dedup_index.lookup_existing(data['jar_type'], video_id)
+                if existing_id is not None:
+                    return _duplicate_music(existing_id)
+        else:
+            return jsonify({'error': 'The jar changed while adding the song, please retry'}), 503, {'Retry-After': '1'}
+
+        if music is None:
             return jsonify({'error': 'Failed to add music'}), 500
 
+        dedup_index.add(data['jar_type'], video_id, music['id'])
+        get_music_sampler(supabase).add(music)
+        get_music_leaderboard(supabase).add(music)
+
         return jsonify({
             'success': True,
-            'music_id': result.data[0]['id'],
+            'music_id': music['id'],
             'message': 'Müzik başarıyla eklendi!'
         }), 201
 
@@ -68,21 +193,36 @@ def add_music():
         return jsonify({'error': str(e)}), 500
 
 
+def _duplicate_music(music_id):
+    return jsonify({'error': 'This song is already in the jar', 'music_id': music_id}), 409
+
+
+def _random_music_options() -> dict:
+    """
+    Sampling options from the query string: ?weighted=true favours often played songs,
+    ?no_repeat=true avoids the client's recent picks (client_id param or X-Client-Id header)
+    """
+    client_id = None
+    if request.args.get('no_repeat', 'false').lower() == 'true':
+        client_id = request.args.get('client_id') or request.headers.get('X-Client-Id') or request.remote_addr
+
+    return {
+        'weighted': request.args.get('weighted', 'false').lower() == 'true',
+        'client_id': client_id
+    }
+
+
 @music_bp.route('/random', methods=['GET'])
 def get_random_music_any():
     """
     Get a random music from any jar type
     """
     try:
-        # Get all music from all jar types
-        result = supabase.table('music_jars').select('*').execute()
+        random_music = get_music_sampler(supabase).random_row(columns=MUSIC_COLUMNS, **_random_music_options())
 
-        if not result.data or len(result.data) == 0:
+        if not random_music:
             return jsonify({'error': 'No music found'}), 404
 
-        # Select a random music
-        random_music = random.choice(result.data)
-
         return jsonify(random_music), 200
 
     except Exception as e:
@@ -95,15 +235,11 @@ def get_random_music(jar_type):
     Get a random music from a specific jar type
     """
     try:
-        # Get all music from this jar type
-        result = supabase.table('music_jars').select('*').eq('jar_type', jar_type).execute()
+        random_music = get_music_sampler(supabase).random_row(jar_type, columns=MUSIC_COLUMNS, **_random_music_options())
 
-        if not result.data or len(result.data) == 0:
+        if not random_music:
             return jsonify({'error': 'No music found in this jar'}), 404
 
-        # Select a random music
-        random_music = random.choice(result.data)
-
         return jsonify(random_music), 200
 
     except Exception as e:
@@ -113,23 +249,24 @@ def get_random_music(jar_type):
 @music_bp.route('/<music_id>/play', methods=['PUT'])
 def increment_play_count(music_id):
     """
-    Increment play count for a music (supports both UUID and integer)
+    Increment play count for a music
+    Plays are buffered and flushed in batches unless PLAY_COUNT_BUFFER=false
     """
     try:
-        # First get current play count
-        result = supabase.table('music_jars').select('play_count').eq('id', music_id).execute()
-
-        if not result.data:
+        if not music_id.isdigit():
             return jsonify({'error': 'Music not found'}), 404
 
-        current_count = result.data[0]['play_count']
-        new_count = current_count + 1
+        if os.getenv('PLAY_COUNT_BUFFER', 'true').lower() == 'true':
+            get_play_counter(supabase).add(music_id)
+            return jsonify({'success': True, 'queued': True}), 202
+
+        new_count = atomic_increment_play_count(supabase, music_id)
 
-        # Update play count
-        result = supabase.table('music_jars').update({'play_count': new_count}).eq('id', music_id).execute()
+        if new_count is None:
+            return jsonify({'error': 'Music not found'}), 404
 
-        if not result.data:
-            return jsonify({'error': 'Failed to update play count'}), 500
+        get_music_sampler(supabase).update_play_counts({music_id: new_count})
+        get_music_leaderboard(supabase).update_play_counts({music_id: new_count})
 
         return jsonify({
             'success': True,
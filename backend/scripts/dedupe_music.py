@@ -0,0 +1,103 @@
+"""
+One-off cleanup before creating the unique (jar_type, youtube_video_id) index:
+backfills youtube_video_id (and the canonical youtube_url) on existing songs
+and merges duplicates in each jar into the oldest copy, adding their play
+counts to it. Runs as a dry run unless --apply is given.
+
+    cd backend && python scripts/dedupe_music.py [--apply]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from utils.youtube import extract_video_id
+from utils.music_dedup import canonical_youtube_url
+
+PAGE_SIZE = 1000
+
+
+def load_songs(client) -> list:
+    rows = []
+    last_id = None
+    while True:
+        query = client.table('music_jars').select('id,jar_type,youtube_url,youtube_video_id,play_count')
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        page = query.order('id').limit(PAGE_SIZE).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        last_id = page[-1]['id']
+
+
+def plan(rows: list):
+    """
+    Group songs by (jar_type, video id). Returns ({keeper id: (update, [duplicate ids])}, [unparseable rows])
+    """
+    keepers = {}
+    changes = {}
+    invalid = []
+
+    # Rows are in id order, so the first of each group is the oldest
+    for row in rows:
+        video_id = row.get('youtube_video_id') or extract_video_id(row.get('youtube_url'))
+        if not video_id:
+            invalid.append(row)
+            continue
+
+        key = (row['jar_type'], video_id)
+        keeper = keepers.get(key)
+        if keeper is None:
+            keepers[key] = row
+            url = canonical_youtube_url(video_id)
+            if row.get('youtube_video_id') != video_id or row.get('youtube_url') != url:
+                changes[row['id']] = ({'youtube_video_id': video_id, 'youtube_url': url}, [])
+            continue
+
+        update, duplicates = changes.setdefault(keeper['id'], ({}, []))
+        duplicates.append(row['id'])
+        keeper['play_count'] = (keeper.get('play_count') or 0) + (row.get('play_count') or 0)
+        update['play_count'] = keeper['play_count']
+
+    return changes, invalid
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--apply', action='store_true', help='write the changes (default: dry run)')
+    args = parser.parse_args()
+
+    load_dotenv()
+    from utils.supabase_client import supabase
+
+    rows = load_songs(supabase)
+    changes, invalid = plan(rows)
+
+    print(f'songs: {len(rows)}')
+    print(f'duplicates to merge: {sum(len(duplicates) for _, duplicates in changes.values())}')
+    print(f'songs to update: {len(changes)}')
+    print(f'songs without a recognizable YouTube URL (left as they are): {len(invalid)}')
+    for row in invalid[:20]:
+        print(f'  {row["id"]}: {row.get("youtube_url")!r}')
+
+    if not args.apply:
+        print('dry run, nothing written (use --apply)')
+        return
+
+    # One group at a time, so an interrupted run loses or doubles at most one song's merged plays
+    for done, (music_id, (update, duplicates)) in enumerate(changes.items(), 1):
+        supabase.table('music_jars').update(update).eq('id', music_id).execute()
+        if duplicates:
+            supabase.table('music_jars').delete().in_('id', duplicates).execute()
+        if done % 100 == 0:
+            print(f'  {done}/{len(changes)}')
+
+    print('done; now create the unique index (see README)')
+
+
+if __name__ == '__main__':
+    main()
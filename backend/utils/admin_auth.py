@@ -0,0 +1,25 @@
+import os
+import hmac
+import functools
+
+from flask import request, jsonify
+
+
+def require_admin_token(view):
+    """
+    Guard an operator endpoint with `Authorization: Bearer $ADMIN_API_TOKEN`.
+    Without ADMIN_API_TOKEN set these endpoints are disabled.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.getenv('ADMIN_API_TOKEN')
+        if not token:
+            return jsonify({'error': 'Admin API is disabled'}), 403
+
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+            return jsonify({'error': 'Unauthorized'}), 401
+
+        return view(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,271 @@
+import os
+import math
+import threading
+from collections import OrderedDict
+
+from utils.rate_limit import TokenBucket
+
+# Routes never limited: probes and scrapes must get through an overload
+EXEMPT_ROUTES = {'/', '/health', '/metrics'}
+
+# Per client and route, in requests per second / burst. RATE_LIMIT_DEFAULT and
+# RATE_LIMIT_ROUTES override these.
+DEFAULT_RATE = (20.0, 40.0)
+ROUTE_RATES = {
+    '/api/music/random': (5.0, 10.0),
+    '/api/music/random/<jar_type>': (5.0, 10.0),
+    '/api/capsules/check-and-send-emails': (0.2, 2.0),
+    '/api/gifts/batch': (0.5, 2.0),
+    '/api/media/uploads': (0.5, 5.0),
+}
+
+# Requests a worker runs at once per route, over all clients. CONCURRENCY_LIMITS overrides these.
+ROUTE_CONCURRENCY = {
+    '/api/capsules/check-and-send-emails': 1,
+    '/api/gifts/batch': 2,
+    '/api/exports/gifts': 2,
+    '/api/exports/capsules': 2,
+    '/api/exports/music': 2,
+    # Slow uploads hold a thread each until the last byte arrives
+    '/api/media/uploads/<token>': 4,
+}
+
+
+def parse_rate(value: str) -> tuple:
+    """
+    '5/10' -> (5.0, 10.0) requests per second and burst; '5' uses a burst of max(5, 1)
+    """
+    rate, _, burst = value.partition('/')
+    rate = float(rate)
+    return rate, float(burst) if burst else max(rate, 1.0)
+
+
+def parse_route_settings(value: str, parse) -> dict:
+    """
+    '/api/a=1,/api/b/<id>=2' -> {'/api/a': parse('1'), '/api/b/<id>': parse('2')}
+    """
+    settings = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        route, _, setting = item.rpartition('=')
+        if not route:
+            raise ValueError(f'Expected <route>=<value>, got {item!r}')
+        settings[route.strip()] = parse(setting.strip())
+    return settings
+
+
+class Rejection:
+    """
+    Why a request was not admitted: 429 (rate limit) or 503 (concurrency cap)
+    """
+    __slots__ = ('status', 'retry_after', 'error')
+
+    def __init__(self, status: int, retry_after: float, error: str):
+        self.status = status
+        self.retry_after = retry_after
+        self.error = error
+
+    def headers(self) -> dict:
+        # Whole seconds, rounded up so a client that waits exactly this long gets in
+        return {'Retry-After': str(max(1, math.ceil(self.retry_after)))}
+
+
+class LocalRateLimitBackend:
+    """
+    Token buckets in this process, keyed by client and route. Buckets of
+    clients that went quiet are evicted least recently used first; a
+    returning client starts with a full bucket, which only ever errs towards
+    letting it through.
+    """
+    blocking = False
+
+    def __init__(self, max_buckets: int = 10000):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, burst)
+                while len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+        return bucket.try_acquire()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'backend': 'local', 'buckets': len(self._buckets)}
+
+
+class SupabaseRateLimitBackend:
+    """
+    Buckets shared by every worker and host, kept in the rate_limit_buckets
+    table and taken atomically by the take_rate_limit_tokens function (see
+    the README schema). Costs one round trip per limited request. If the
+    database cannot be reached the request is let through rather than
+    failing every request with it.
+    """
+    # take() waits on a database round trip
+    blocking = True
+
+    def __init__(self, client):
+        self.client = client
+        self._errors = 0
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        try:
+            result = self.client.rpc('take_rate_limit_tokens', {
+                'bucket_key': key, 'rate': rate, 'capacity': burst, 'cost': 1
+            }).execute()
+            return float(result.data or 0)
+        except Exception as e:
+            self._errors += 1
+            print(f'Rate limit check failed: {str(e)}')
+            return 0.0
+
+    def stats(self) -> dict:
+        return {'backend': 'supabase', 'errors': self._errors}
+
+
+class AdmissionController:
+    """
+    Decides, before a handler runs, whether a request may run now: a token
+    bucket per client and route caps the request rate (429), and a cap on
+    requests in flight per route sheds load on the expensive endpoints (503).
+    Both answers carry Retry-After.
+    """
+
+    def __init__(self, backend, default_rate: tuple = DEFAULT_RATE, route_rates: dict = None,
+                 route_concurrency: dict = None, enabled: bool = True):
+        self.backend = backend
+        self.default_rate = default_rate
+        self.route_rates = {**ROUTE_RATES, **(route_rates or {})}
+        self.route_concurrency = {**ROUTE_CONCURRENCY, **(route_concurrency or {})}
+        self.enabled = enabled
+
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {'admitted': 0, 'rate_limited': 0, 'shed': 0}
+
+    @property
+    def blocking(self) -> bool:
+        """
+        Whether admit() may wait on I/O, so async callers must run it off the event loop
+        """
+        return self.enabled and self.backend.blocking
+
+    def admit(self, client: str, route: str):
+        """
+        Returns None if the request may run (call release(route) when it is
+        done), otherwise a Rejection
+        """
+        if not self.enabled or route in EXEMPT_ROUTES:
+            return None
+
+        rate, burst = self.route_rates.get(route, self.default_rate)
+        if rate > 0:
+            wait = self.backend.take(f'{client} {route}', rate, burst)
+            if wait:
+                with self._lock:
+                    self._stats['rate_limited'] += 1
+                return Rejection(429, wait, 'Too many requests')
+
+        limit = self.route_concurrency.get(route)
+        with self._lock:
+            if limit:
+                running = self._in_flight.get(route, 0)
+                if running >= limit:
+                    self._stats['shed'] += 1
+                    return Rejection(503, 1, 'Server is busy, try again shortly')
+                self._in_flight[route] = running + 1
+            self._stats['admitted'] += 1
+        return None
+
+    def release(self, route: str) -> None:
+        if not self.route_concurrency.get(route):
+            return
+        with self._lock:
+            self._in_flight[route] = max(0, self._in_flight.get(route, 0) - 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = {route: count for route, count in self._in_flight.items() if count}
+        stats.update(self.backend.stats())
+        return stats
+
+
+def create_admission_controller(client=None) -> AdmissionController:
+    backend_name = os.getenv('RATE_LIMIT_BACKEND', 'local').lower()
+    if backend_name == 'supabase':
+        if client is None:
+            from utils.supabase_client import supabase as client
+        backend = SupabaseRateLimitBackend(client)
+    elif backend_name == 'local':
+        backend = LocalRateLimitBackend(int(os.getenv('RATE_LIMIT_MAX_BUCKETS', '10000')))
+    else:
+        raise ValueError('RATE_LIMIT_BACKEND must be local or supabase')
+
+    default_rate = os.getenv('RATE_LIMIT_DEFAULT')
+    return AdmissionController(
+        backend,
+        default_rate=parse_rate(default_rate) if default_rate else DEFAULT_RATE,
+        route_rates=parse_route_settings(os.getenv('RATE_LIMIT_ROUTES', ''), parse_rate),
+        route_concurrency=parse_route_settings(os.getenv('CONCURRENCY_LIMITS', ''), int),
+        enabled=os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true',
+    )
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+
+    with _controller_lock:
+        if _controller is None:
+            _controller = create_admission_controller()
+        return _controller
+
+
+def client_address(remote_addr: str, forwarded_for: str = None) -> str:
+    """
+    The client to rate limit; X-Forwarded-For is only believed behind a
+    proxy that sets it (RATE_LIMIT_TRUST_PROXY=true)
+    """
+    if forwarded_for and os.getenv('RATE_LIMIT_TRUST_PROXY', 'false').lower() == 'true':
+        return forwarded_for.split(',')[0].strip()
+    return remote_addr or 'unknown'
+
+
+def install_admission_control(app) -> None:
+    """
+    Run the admission check before every Flask handler and release its slot
+    once the response has been sent (streamed responses included)
+    """
+    from flask import g, jsonify, request
+
+    controller = get_admission_controller()
+
+    @app.before_request
+    def _admit():
+        # CORS preflights are answered without running the handler
+        if request.url_rule is None or request.method == 'OPTIONS':
+            return None
+        route = request.url_rule.rule
+        rejection = controller.admit(
+            client_address(request.remote_addr, request.headers.get('X-Forwarded-For')), route
+        )
+        if rejection is not None:
+            return jsonify({'error': rejection.error}), rejection.status, rejection.headers()
+        g.admitted_route = route
+        return None
+
+    @app.teardown_request
+    def _release(error):
+        route = g.pop('admitted_route', None)
+        if route is not None:
+            controller.release(route)
@@ -0,0 +1,69 @@
+import os
+import asyncio
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+from utils.http_pool import InstrumentedAsyncTransport, http2_enabled, pool_limits, pool_timeout
+
+_clients = {}
+
+
+class PooledAsyncPostgrestClient(AsyncPostgrestClient):
+    """
+    Async PostgREST client whose httpx session goes through one pooled,
+    instrumented transport, so all coroutines of an event loop share one set
+    of keep-alive connections
+    """
+
+    def __init__(self, base_url: str, headers: dict, timeout, transport: InstrumentedAsyncTransport):
+        self.transport = transport
+        super().__init__(base_url, headers=headers, timeout=timeout)
+
+    def create_session(self, base_url: str, headers: dict, timeout) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout, transport=self.transport)
+
+
+def _create_client() -> PooledAsyncPostgrestClient:
+    url = os.getenv('SUPABASE_URL')
+    key = os.getenv('SUPABASE_KEY')
+
+    if not url or not key:
+        raise ValueError('SUPABASE_URL and SUPABASE_KEY must be set in environment variables')
+
+    return PooledAsyncPostgrestClient(
+        f'{url}/rest/v1',
+        headers={**DEFAULT_POSTGREST_CLIENT_HEADERS, 'apiKey': key, 'Authorization': f'Bearer {key}'},
+        timeout=pool_timeout(),
+        transport=InstrumentedAsyncTransport(limits=pool_limits(), http2=http2_enabled()),
+    )
+
+
+def get_async_supabase() -> PooledAsyncPostgrestClient:
+    """
+    Return the async PostgREST client of the running event loop. httpx pools are
+    bound to the loop they were created on, so each loop (one per ASGI worker
+    process) gets its own, created on first use.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = _create_client()
+    return client
+
+
+async def close_async_supabase() -> None:
+    """
+    Close the running loop's client and its connections (ASGI lifespan shutdown)
+    """
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def async_supabase_pool_stats() -> list:
+    """
+    Pool metrics of each event loop's client in this process
+    """
+    return [client.transport.stats() for client in list(_clients.values())]
@@ -0,0 +1,227 @@
+import time
+import threading
+from collections import OrderedDict
+
+_caches = {}
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'stored_at')
+
+    def __init__(self, value, ttl: float):
+        self.value = value
+        self.stored_at = time.time()
+        self.expires_at = time.monotonic() + ttl
+
+
+class _Flight:
+    """
+    One in-progress load that concurrent callers for the same key wait on
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.stale = False
+
+
+class _Load:
+    """
+    A load the caller runs itself (begin_load/finish_load); marked stale if the key is invalidated meanwhile
+    """
+    __slots__ = ('stale',)
+
+    def __init__(self):
+        self.stale = False
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries expire after `ttl` seconds.
+    `get_or_load` is a read-through with single-flight: while one caller runs
+    the loader for a key, others asking for the same key wait for its result
+    instead of hitting the database too.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._loads = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'loads': 0, 'load_errors': 0, 'evictions': 0, 'invalidations': 0}
+
+        _caches[name] = self
+
+    def _get_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_entry(self, key):
+        """
+        Return the live entry (with .value and .stored_at) or None, without loading
+        """
+        with self._lock:
+            entry = self._get_entry(key)
+            self._stats['hits' if entry else 'misses'] += 1
+            return entry
+
+    def set(self, key, value, ttl: float = None):
+        with self._lock:
+            return self._set(key, value, ttl)
+
+    def _set(self, key, value, ttl: float = None):
+        entry = _Entry(value, self.ttl if ttl is None else ttl)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+        return entry
+
+    def get_or_load_entry(self, key, loader):
+        """
+        Return the cached entry for `key`, calling `loader()` once on a miss
+        """
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is not None:
+                self._stats['hits'] += 1
+                return entry
+
+            self._stats['misses'] += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self._stats['load_errors'] += 1
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.error = e
+            flight.done.set()
+            raise
+
+        with self._lock:
+            self._stats['loads'] += 1
+            if flight.stale:
+                # Invalidated while loading: hand the value to waiters but do not keep it
+                entry = _Entry(value, 0)
+            else:
+                entry = self._set(key, value)
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+
+        flight.value = entry
+        flight.done.set()
+        return entry
+
+    def get_or_load(self, key, loader):
+        return self.get_or_load_entry(key, loader).value
+
+    def begin_load(self, key) -> _Load:
+        """
+        Start loading `key` outside get_or_load (e.g. awaited on an event loop,
+        where waiting on another loader would block). Pass the token to
+        finish_load() with the value, or to abort_load() if loading failed.
+        """
+        token = _Load()
+        with self._lock:
+            self._loads.setdefault(key, set()).add(token)
+        return token
+
+    def finish_load(self, key, token: _Load, value):
+        """
+        Store the loaded value and return its entry; if the key was
+        invalidated since begin_load() the value may predate the write, so it
+        is returned without being kept
+        """
+        with self._lock:
+            self._end_load(key, token)
+            self._stats['loads'] += 1
+            if token.stale:
+                return _Entry(value, 0)
+            return self._set(key, value)
+
+    def abort_load(self, key, token: _Load) -> None:
+        with self._lock:
+            self._end_load(key, token)
+            self._stats['load_errors'] += 1
+
+    def _end_load(self, key, token: _Load) -> None:
+        loads = self._loads.get(key)
+        if loads is not None:
+            loads.discard(token)
+            if not loads:
+                del self._loads[key]
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            flight = self._inflight.pop(key, None)
+            if flight is not None:
+                flight.stale = True
+            for token in self._loads.pop(key, ()):
+                token.stale = True
+            self._stats['invalidations'] += 1
+
+        for listener in self._listeners:
+            listener(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            for flight in self._inflight.values():
+                flight.stale = True
+            self._inflight.clear()
+            for loads in self._loads.values():
+                for token in loads:
+                    token.stale = True
+            self._loads.clear()
+            self._stats['invalidations'] += 1
+
+        for listener in self._listeners:
+            listener(None)
+
+    def on_invalidate(self, listener) -> None:
+        """
+        Register a callback run with the key after each invalidation (None for clear())
+        """
+        self._listeners.append(listener)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['maxsize'] = self.maxsize
+        stats['ttl'] = self.ttl
+        return stats
+
+
+def cache_stats() -> dict:
+    """
+    Stats of every cache created in this process, by name
+    """
+    return {name: cache.stats() for name, cache in _caches.items()}
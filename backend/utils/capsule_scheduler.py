@@ -0,0 +1,357 @@
+import os
+import time
+import uuid
+import heapq
+import atexit
+import threading
+from datetime import datetime, timezone, timedelta
+
+from utils.repositories import capsule_repository
+from utils.email_queue import enqueue_emails
+from utils.record_cache import capsule_cache
+from utils.leader_lock import LeaderLock
+
+
+# How long a sender may hold a capsule's notification before others can take it over
+NOTIFICATION_LEASE_SECONDS = float(os.getenv('CAPSULE_NOTIFICATION_LEASE', '300'))
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parse a Supabase timestamp; naive values are stored in UTC
+    """
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def capsule_view_link(capsule_id) -> str:
+    return f'http://localhost:3000/view-capsule.html?id={capsule_id}'
+
+
+def iter_due_capsules(now: datetime, batch_size: int = 500):
+    """
+    Yield batches of capsules whose open_date has passed and whose notification
+    is still pending. The open_date predicate runs in the database and the walk
+    uses keyset pagination on id, so each query is bounded. Capsules claimed by
+    another sender are skipped until their lease runs out.
+    """
+    last_id = None
+
+    while True:
+        rows = capsule_repository.due_page(now, last_id, batch_size)
+        if not rows:
+            return
+
+        yield rows
+
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]['id']
+
+
+def claim_notifications(capsule_ids: list, now: datetime = None, lease: float = None):
+    """
+    Atomically claim the opening notification of the given capsules for
+    `lease` seconds. A single conditional update takes only rows that are not
+    notified yet and have no live claim, so concurrent senders (viewers, the
+    cron endpoint, the scheduler) never get the same capsule. A claim whose
+    holder died is taken over once its lease has expired.
+    Returns the claim token and the claimed rows.
+    """
+    now = now or datetime.now(timezone.utc)
+    lease = NOTIFICATION_LEASE_SECONDS if lease is None else lease
+    token = str(uuid.uuid4())
+
+    return token, capsule_repository.claim_notifications(capsule_ids, token, now, lease)
+
+
+def finish_notification_claim(token: str, sent: bool) -> list:
+    """
+    Release a claim, marking its capsules as notified if the email went out.
+    Only rows still holding `token` are touched, so a claim that expired and
+    was taken over is left to its new owner. Returns the updated rows.
+    """
+    rows = capsule_repository.finish_notification_claim(token, sent)
+
+    for row in rows:
+        capsule_cache.invalidate(str(row['id']))
+
+    return rows
+
+
+def _notify_chunk(capsules: list, now: datetime, timings: dict) -> None:
+    """
+    Claim a chunk, queue the emails of the claimed capsules in one transaction,
+    then mark them as notified. If queueing fails the claim is released so the
+    chunk is retried on the next run instead of being lost. Each email carries
+    a per-capsule dedupe key: if marking fails after the emails were queued,
+    the retry once the claim expires finds them queued already.
+    """
+    started = time.perf_counter()
+    token, claimed = claim_notifications([capsule['id'] for capsule in capsules], now)
+    timings['update_ms'] += (time.perf_counter() - started) * 1000
+
+    claimed_ids = {str(row['id']) for row in claimed}
+    capsules = [capsule for capsule in capsules if str(capsule['id']) in claimed_ids]
+    if not capsules:
+        return
+
+    jobs = [
+        ('capsule_opened', capsule['creator_email'], {
+            'title': capsule['title'],
+            'view_link': capsule_view_link(capsule['id'])
+        }, f'capsule_opened:{capsule["id"]}')
+        for capsule in capsules
+    ]
+
+    started = time.perf_counter()
+    queued = enqueue_emails(jobs)
+    timings['enqueue_ms'] += (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    finish_notification_claim(token, queued)
+    timings['update_ms'] += (time.perf_counter() - started) * 1000
+
+    if queued:
+        timings['sent'] += len(capsules)
+    else:
+        timings['failed'] += len(capsules)
+
+
+def _notify_batch(batch: list, now: datetime) -> dict:
+    """
+    Notify one page of due capsules in chunks of CAPSULE_UPDATE_CHUNK ids per
+    update. A failing chunk is left pending and does not affect the others.
+    """
+    chunk_size = int(os.getenv('CAPSULE_UPDATE_CHUNK', '100'))
+    timings = {'size': len(batch), 'sent': 0, 'failed': 0, 'update_ms': 0.0, 'enqueue_ms': 0.0}
+
+    for start in range(0, len(batch), chunk_size):
+        chunk = batch[start:start + chunk_size]
+        try:
+            _notify_chunk(chunk, now, timings)
+        except Exception as e:
+            print(f'Capsule notification update failed: {str(e)}')
+            timings['failed'] += len(chunk)
+
+    timings['update_ms'] = round(timings['update_ms'], 2)
+    timings['enqueue_ms'] = round(timings['enqueue_ms'], 2)
+    return timings
+
+
+def send_due_notifications(now: datetime = None, batch_size: int = None) -> dict:
+    """
+    Queue the opening email for every due capsule and mark it as notified.
+    Returns the total number queued and per-batch timings.
+    """
+    now = now or datetime.now(timezone.utc)
+    batch_size = batch_size or int(os.getenv('CAPSULE_BATCH_SIZE', '500'))
+    batches = []
+    sent_count = 0
+
+    due_batches = iter_due_capsules(now, batch_size)
+    while True:
+        started = time.perf_counter()
+        batch = next(due_batches, None)
+        fetch_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        if batch is None:
+            break
+
+        timings = _notify_batch(batch, now)
+        timings['fetch_ms'] = fetch_ms
+        batches.append(timings)
+        sent_count += timings['sent']
+
+    return {'sent': sent_count, 'batches': batches}
+
+
+class UpcomingCapsules:
+    """
+    Min-heap of (open_date, capsule_id) for capsules opening before `loaded_until`.
+    Capsules further in the future are left in the database until the window moves.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._ids = set()
+        self.loaded_until = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def reload(self, rows: list, loaded_until: datetime) -> None:
+        self._heap = [(parse_timestamp(row['open_date']), str(row['id'])) for row in rows]
+        heapq.heapify(self._heap)
+        self._ids = {capsule_id for _, capsule_id in self._heap}
+        self.loaded_until = loaded_until
+
+    def push(self, open_date: datetime, capsule_id) -> None:
+        capsule_id = str(capsule_id)
+        if self.loaded_until is None or open_date > self.loaded_until or capsule_id in self._ids:
+            return
+        heapq.heappush(self._heap, (open_date, capsule_id))
+        self._ids.add(capsule_id)
+
+    def peek(self):
+        """
+        Return the earliest open_date in the heap, or None
+        """
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, capsule_id = heapq.heappop(self._heap)
+            self._ids.discard(capsule_id)
+            due.append(capsule_id)
+        return due
+
+
+def load_upcoming_capsules(start: datetime, end: datetime, limit: int) -> list:
+    """
+    Fetch pending capsules opening in (start, end], earliest first
+    """
+    return capsule_repository.upcoming(start, end, limit)
+
+
+class CapsuleScheduler:
+    """
+    Background dispatcher that sleeps until the next known open_date and then
+    sends the due notifications. Only a bounded window of upcoming capsules is
+    kept in memory; it is reloaded when the window runs out and at least every
+    `poll_interval` seconds, which also picks up capsules created by other
+    processes. With a `leader_lock`, only the process holding it dispatches;
+    the others retry every `poll_interval` and take over if the leader exits.
+    """
+
+    def __init__(self, horizon: float = 300, max_upcoming: int = 10000, poll_interval: float = 30,
+                 leader_lock: LeaderLock = None):
+        self.horizon = timedelta(seconds=horizon)
+        self.max_upcoming = max_upcoming
+        self.poll_interval = timedelta(seconds=poll_interval)
+        self.leader_lock = leader_lock
+        self.upcoming = UpcomingCapsules()
+        self._reloaded_at = None
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def schedule(self, capsule_id, open_date: str) -> None:
+        """
+        Register a newly created capsule so it fires without waiting for a reload
+        """
+        try:
+            open_at = parse_timestamp(open_date)
+        except (TypeError, ValueError):
+            # Left for the next reload to pick up from the database
+            return
+
+        with self._condition:
+            self.upcoming.push(open_at, capsule_id)
+            self._condition.notify()
+
+    def _reload(self, now: datetime) -> None:
+        end = now + self.horizon
+        rows = load_upcoming_capsules(now, end, self.max_upcoming)
+
+        # A full page means the window holds more capsules than we keep in memory
+        if len(rows) >= self.max_upcoming:
+            end = parse_timestamp(rows[-1]['open_date'])
+
+        with self._condition:
+            self.upcoming.reload(rows, end)
+            self._reloaded_at = now
+
+    def run_once(self, now: datetime) -> None:
+        if (
+            self.upcoming.loaded_until is None
+            or now >= self.upcoming.loaded_until
+            or now >= self._reloaded_at + self.poll_interval
+        ):
+            # Also catches capsules that became due while no window covered them
+            send_due_notifications(now)
+            self._reload(now)
+
+        with self._condition:
+            due = self.upcoming.pop_due(now)
+
+        if due:
+            send_due_notifications(now)
+
+    def _seconds_until_next(self, now: datetime) -> float:
+        with self._condition:
+            moments = [self.upcoming.peek(), self.upcoming.loaded_until]
+            if self._reloaded_at is not None:
+                moments.append(self._reloaded_at + self.poll_interval)
+        candidates = [moment for moment in moments if moment]
+        if not candidates:
+            return self.poll_interval.total_seconds()
+        return min(max((min(candidates) - now).total_seconds(), 0.1), self.poll_interval.total_seconds())
+
+    def _wait(self, seconds: float) -> None:
+        with self._condition:
+            if not self._stop_event.is_set():
+                self._condition.wait(seconds)
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            if self.leader_lock is not None and not self.leader_lock.try_acquire():
+                self._wait(self.poll_interval.total_seconds())
+                continue
+
+            now = datetime.now(timezone.utc)
+            try:
+                self.run_once(now)
+            except Exception as e:
+                print(f'Capsule scheduler error: {str(e)}')
+
+            self._wait(self._seconds_until_next(datetime.now(timezone.utc)))
+
+    def start(self) -> None:
+        """
+        Start the dispatcher thread in this process (no-op if it is already running)
+        """
+        with self._condition:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, name='capsule-scheduler', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self, timeout: float = 10) -> None:
+        """
+        Let the current run finish, stop the thread and hand leadership to another process
+        """
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        if self.leader_lock is not None:
+            self.leader_lock.release()
+
+    def stats(self) -> dict:
+        with self._condition:
+            next_open = self.upcoming.peek()
+            return {
+                'running': self._pid == os.getpid() and self._thread is not None and self._thread.is_alive(),
+                'leader': self.leader_lock.held if self.leader_lock is not None else None,
+                'upcoming': len(self.upcoming),
+                'next_open_date': next_open.isoformat() if next_open else None,
+            }
+
+
+DEFAULT_LOCK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'capsule_dispatcher.lock')
+
+capsule_scheduler = CapsuleScheduler(
+    horizon=float(os.getenv('CAPSULE_SCHEDULER_HORIZON', '300')),
+    max_upcoming=int(os.getenv('CAPSULE_SCHEDULER_MAX_UPCOMING', '10000')),
+    poll_interval=float(os.getenv('CAPSULE_SCHEDULER_POLL_INTERVAL', '30')),
+    leader_lock=LeaderLock(os.getenv('CAPSULE_DISPATCHER_LOCK', DEFAULT_LOCK_PATH)),
+)
+atexit.register(capsule_scheduler.stop)
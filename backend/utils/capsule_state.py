@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+
+from utils.repositories import capsule_repository
+from utils.capsule_scheduler import parse_timestamp
+from utils.record_cache import capsule_cache, get_cached_capsule
+from utils.http_cache import build_cached_body
+
+
+class CapsuleState:
+    """
+    A capsule row (from the record cache) and its opening state at `now`
+    """
+
+    def __init__(self, entry, now: datetime):
+        self.entry = entry
+        self.capsule = entry.value.data
+        self.open_date = parse_timestamp(self.capsule['open_date'])
+        self.can_open = now >= self.open_date
+
+
+def _store(row: dict):
+    """
+    Put a row returned by an UPDATE into the record cache so it is not selected again
+    """
+    return capsule_cache.set(str(row['id']), build_cached_body(capsule_repository.public(row)))
+
+
+def load_capsule_state(capsule_id, now: datetime = None):
+    """
+    Fetch a capsule once (through the record cache) and derive its state.
+    Returns None if the capsule does not exist.
+    """
+    entry = get_cached_capsule(capsule_id)
+    if entry.value is None:
+        return None
+    return CapsuleState(entry, now or datetime.now(timezone.utc))
+
+
+def mark_capsule_opened(capsule_id, now: datetime = None):
+    """
+    Mark a capsule as opened with one conditional UPDATE (open_date <= now).
+    Returns ('opened', row), ('too_early', None), ('not_found', None) or ('failed', None).
+    """
+    now = now or datetime.now(timezone.utc)
+    row = capsule_repository.open_if_due(capsule_id, now)
+
+    if row is not None:
+        _store(row)
+        return 'opened', row
+
+    # Nothing matched: tell a missing capsule apart from one that is not due yet.
+    # open_date never changes, so a cached row is good enough unless it claims to be due.
+    state = load_capsule_state(capsule_id, now)
+    if state is not None and state.can_open:
+        capsule_cache.invalidate(str(capsule_id))
+        state = load_capsule_state(capsule_id, now)
+
+    if state is None:
+        return 'not_found', None
+    if state.can_open:
+        return 'failed', None
+    return 'too_early', None
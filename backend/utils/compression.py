@@ -0,0 +1,84 @@
+import os
+import gzip
+
+from flask import request
+from werkzeug.http import parse_accept_header
+
+from utils import metrics
+
+try:
+    import brotli
+except ImportError:  # optional, see requirements-speedups.txt
+    brotli = None
+
+COMPRESSIBLE_TYPES = {'application/json', 'text/plain', 'text/html'}
+
+COMPRESSION_ENABLED = os.getenv('COMPRESSION', 'true').lower() == 'true'
+# Smaller bodies fit in a packet or two anyway and are sent as they are
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+
+
+def supported_encodings() -> list:
+    # Preferred first when the client accepts several with the same q
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.split(';', 1)[0].strip() in COMPRESSIBLE_TYPES
+
+
+def negotiate(accept_encoding: str, size: int, content_type: str):
+    """
+    Encoding to compress a `size`-byte body with, or None to send it as it is
+    """
+    if not COMPRESSION_ENABLED or size < COMPRESS_MIN_SIZE or not accept_encoding:
+        return None
+    if not is_compressible(content_type):
+        return None
+    return parse_accept_header(accept_encoding).best_match(supported_encodings())
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    with metrics.timed('render'):
+        if encoding == 'br':
+            return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+        # mtime=0 keeps the output (and so any cached copy) byte-identical across runs
+        return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """
+    after_request hook: compress buffered JSON/text responses for clients that
+    accept it. Streamed responses (NDJSON exports, batch results) are left alone.
+    """
+    if not is_compressible(response.content_type or ''):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if response.is_streamed or response.direct_passthrough or response.status_code != 200:
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+
+    body = response.get_data()
+    encoding = negotiate(request.headers.get('Accept-Encoding', ''), len(body), response.content_type or '')
+    if encoding is None:
+        return response
+
+    # Cached bodies keep their compressed copies, so a hot record is compressed once
+    cached = getattr(response, 'cached_body', None)
+    response.set_data(cached.compressed(encoding) if cached is not None else compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+
+    # The entity differs from the uncompressed one, so its validator may only be weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    return response
+
+
+def install_compression(app) -> None:
+    app.after_request(compress_response)
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import atexit
+import threading
+
+from utils.email_sender import build_gift_email, build_capsule_email, build_capsule_opened_email, send_messages
+
+# Job kinds and the builder that turns a job into a message
+EMAIL_BUILDERS = {
+    'gift': build_gift_email,
+    'capsule_created': build_capsule_email,
+    'capsule_opened': build_capsule_opened_email,
+}
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'email_queue.sqlite3')
+
+# A job that is picked up but not finished within the lease goes back to the queue
+JOB_LEASE_SECONDS = 300
+
+# How long a dedupe key keeps a second job with the same key out of the queue
+EMAIL_DEDUPE_TTL = float(os.getenv('EMAIL_DEDUPE_TTL', str(7 * 86400)))
+
+_local = threading.local()
+_state_lock = threading.Lock()
+_wakeup = threading.Condition()
+_stop_event = threading.Event()
+_workers = []
+_workers_pid = None
+_schema_ready = set()
+
+
+def _queue_path() -> str:
+    return os.getenv('EMAIL_QUEUE_PATH', DEFAULT_QUEUE_PATH)
+
+
+def _get_connection() -> sqlite3.Connection:
+    """
+    Return this thread's connection to the queue database, creating the schema on first use
+    """
+    path = _queue_path()
+    conn = getattr(_local, 'conn', None)
+
+    if conn is None or getattr(_local, 'path', None) != path or getattr(_local, 'pid', None) != os.getpid():
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        _local.conn = conn
+        _local.path = path
+        _local.pid = os.getpid()
+
+    if path not in _schema_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS email_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                locked_until REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_email_jobs_due ON email_jobs (status, next_attempt_at)')
+        # Kept apart from email_jobs, whose rows are deleted once sent
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS email_dedupe (
+                dedupe_key TEXT PRIMARY KEY,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_email_dedupe_created ON email_dedupe (created_at)')
+        _schema_ready.add(path)
+
+    return conn
+
+
+def enqueue_email(kind: str, recipient_email: str, email_data: dict) -> bool:
+    """
+    Persist an email job and wake a worker to deliver it
+    """
+    return enqueue_emails([(kind, recipient_email, email_data)])
+
+
+def enqueue_emails(jobs: list) -> bool:
+    """
+    Persist several (kind, recipient_email, email_data) jobs in one transaction.
+    Either every job is queued or none is. A job may carry a dedupe key as a
+    fourth item: if a job with that key was queued in the last
+    EMAIL_DEDUPE_TTL seconds it is left out (and still counts as queued), so
+    a caller that retries after failing past this point sends nothing twice.
+    """
+    try:
+        for job in jobs:
+            if job[0] not in EMAIL_BUILDERS:
+                raise ValueError(f'Unknown email kind: {job[0]}')
+
+        now = time.time()
+        conn = _get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = []
+            if any(len(job) > 3 for job in jobs):
+                conn.execute('DELETE FROM email_dedupe WHERE created_at < ?', (now - EMAIL_DEDUPE_TTL,))
+            for kind, recipient_email, email_data, *dedupe_key in jobs:
+                if dedupe_key and conn.execute(
+                    'INSERT OR IGNORE INTO email_dedupe (dedupe_key, created_at) VALUES (?, ?)', (dedupe_key[0], now)
+                ).rowcount == 0:
+                    continue
+                rows.append((kind, recipient_email, json.dumps(email_data), now, now))
+            conn.executemany(
+                'INSERT INTO email_jobs (kind, recipient, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        start_email_workers()
+        with _wakeup:
+            _wakeup.notify_all()
+
+        return True
+
+    except Exception as e:
+        print(f'Email enqueue failed: {str(e)}')
+        return False
+
+
+def _claim_jobs(limit: int) -> list:
+    """
+    Atomically move up to `limit` due jobs to 'running' and return them
+    """
+    now = time.time()
+    conn = _get_connection()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        rows = conn.execute(
+            """
+            SELECT * FROM email_jobs
+            WHERE (status = 'pending' AND next_attempt_at <= ?)
+               OR (status = 'running' AND locked_until < ?)
+            ORDER BY next_attempt_at
+            LIMIT ?
+            """,
+            (now, now, limit)
+        ).fetchall()
+
+        if rows:
+            conn.executemany(
+                "UPDATE email_jobs SET status = 'running', attempts = attempts + 1, locked_until = ? WHERE id = ?",
+                [(now + JOB_LEASE_SECONDS, row['id']) for row in rows]
+            )
+
+        conn.execute('COMMIT')
+        return rows
+
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def _retry_delay(attempts: int) -> float:
+    """
+    Exponential backoff with jitter, capped at one hour
+    """
+    base = float(os.getenv('EMAIL_RETRY_BACKOFF', '5'))
+    delay = min(base * (2 ** (attempts - 1)), 3600)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _finish_job(job, sent: bool, error: str = None) -> None:
+    conn = _get_connection()
+    attempts = job['attempts'] + 1
+
+    if sent:
+        conn.execute('DELETE FROM email_jobs WHERE id = ?', (job['id'],))
+        return
+
+    max_attempts = int(os.getenv('EMAIL_MAX_ATTEMPTS', '5'))
+    if attempts >= max_attempts:
+        conn.execute(
+            "UPDATE email_jobs SET status = 'failed', locked_until = NULL, last_error = ? WHERE id = ?",
+            (error or 'send failed', job['id'])
+        )
+        print(f'Email job {job["id"]} failed after {attempts} attempt(s)')
+    else:
+        conn.execute(
+            "UPDATE email_jobs SET status = 'pending', locked_until = NULL, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (time.time() + _retry_delay(attempts), error or 'send failed', job['id'])
+        )
+
+
+def _run_jobs(jobs: list) -> None:
+    """
+    Build every job's message and send them together over one SMTP session
+    """
+    ready = []
+    messages = []
+
+    for job in jobs:
+        try:
+            messages.append(EMAIL_BUILDERS[job['kind']](job['recipient'], json.loads(job['payload'])))
+            ready.append(job)
+        except Exception as e:
+            _finish_job(job, False, str(e))
+
+    if not messages:
+        return
+
+    for job, sent in zip(ready, send_messages(messages)):
+        _finish_job(job, sent)
+
+
+def _worker_loop() -> None:
+    poll_interval = float(os.getenv('EMAIL_QUEUE_POLL_INTERVAL', '5'))
+    batch_size = int(os.getenv('EMAIL_BATCH_SIZE', '20'))
+
+    while not _stop_event.is_set():
+        try:
+            jobs = _claim_jobs(batch_size)
+        except Exception as e:
+            print(f'Email queue error: {str(e)}')
+            jobs = []
+
+        if not jobs:
+            with _wakeup:
+                _wakeup.wait(poll_interval)
+            continue
+
+        _run_jobs(jobs)
+
+
+def start_email_workers() -> None:
+    """
+    Start the worker pool for this process (no-op if it is already running)
+    """
+    global _workers, _workers_pid
+
+    with _state_lock:
+        if _workers_pid == os.getpid() and any(worker.is_alive() for worker in _workers):
+            return
+
+        _stop_event.clear()
+        worker_count = int(os.getenv('EMAIL_WORKERS', '2'))
+        _workers = [
+            threading.Thread(target=_worker_loop, name=f'email-worker-{i}', daemon=True)
+            for i in range(worker_count)
+        ]
+        for worker in _workers:
+            worker.start()
+        _workers_pid = os.getpid()
+
+
+def stop_email_workers(timeout: float = 10) -> None:
+    """
+    Ask the workers to finish their current job and wait for them
+    """
+    _stop_event.set()
+    with _wakeup:
+        _wakeup.notify_all()
+    for worker in _workers:
+        worker.join(timeout)
+
+
+def email_queue_stats() -> dict:
+    """
+    Return the number of jobs per status
+    """
+    conn = _get_connection()
+    rows = conn.execute('SELECT status, COUNT(*) AS count FROM email_jobs GROUP BY status').fetchall()
+    return {row['status']: row['count'] for row in rows}
+
+
+atexit.register(stop_email_workers)
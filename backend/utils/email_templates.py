@@ -0,0 +1,142 @@
+import os
+import re
+import uuid
+import functools
+from email.header import Header
+
+from markupsafe import escape
+
+from utils import metrics
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'email')
+
+# Subject lines per template; formatted with the same data as the body
+EMAIL_SUBJECTS = {
+    'gift': '🎁 {sender_name} sana bir hediye gönderdi!',
+    'capsule_created': '⏰ Zaman Kapsülün Oluşturuldu!',
+    'capsule_opened': '🎉 Zaman Kapsülün Açılma Zamanı Geldi!',
+}
+
+_PLACEHOLDER = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+_NEWLINES = re.compile(r'\r\n|\r|\n')
+
+
+def _crlf(text: str) -> str:
+    return _NEWLINES.sub('\r\n', text)
+
+
+class CompiledTemplate:
+    """
+    A template split once into pre-encoded static segments and placeholder names.
+    Rendering only escapes and encodes the values, and recent renders are cached.
+    """
+
+    def __init__(self, source: str, autoescape: bool):
+        self.autoescape = autoescape
+        self.fields = []
+        self._statics = []
+
+        source = _crlf(source)
+        position = 0
+        for match in _PLACEHOLDER.finditer(source):
+            self._statics.append(source[position:match.start()].encode('utf-8'))
+            self.fields.append(match.group(1))
+            position = match.end()
+        self._tail = source[position:].encode('utf-8')
+
+        self.render_values = functools.lru_cache(maxsize=256)(self._render_values)
+
+    def _render_values(self, values: tuple) -> bytes:
+        parts = []
+        for static, value in zip(self._statics, values):
+            parts.append(static)
+            if self.autoescape:
+                value = str(escape(value))
+            parts.append(_crlf(value).encode('utf-8'))
+        parts.append(self._tail)
+        return b''.join(parts)
+
+    def render(self, context: dict) -> bytes:
+        return self.render_values(tuple(str(context[field]) for field in self.fields))
+
+
+class EmailTemplate:
+    """
+    A multipart/alternative email (plain text + HTML) whose MIME envelope is built once.
+    """
+
+    def __init__(self, subject: str, text_source: str, html_source: str):
+        self.subject = subject
+        self.text = CompiledTemplate(text_source, autoescape=False)
+        self.html = CompiledTemplate(html_source, autoescape=True)
+
+        boundary = f'==giftcapsule-{uuid.uuid4().hex}=='
+        self._envelope = (
+            'MIME-Version: 1.0\r\n'
+            f'Content-Type: multipart/alternative; boundary="{boundary}"\r\n'
+            '\r\n'
+        ).encode('ascii')
+        self._text_header = (
+            f'--{boundary}\r\n'
+            'Content-Type: text/plain; charset="utf-8"\r\n'
+            'Content-Transfer-Encoding: 8bit\r\n'
+            '\r\n'
+        ).encode('ascii')
+        self._html_header = (
+            f'\r\n--{boundary}\r\n'
+            'Content-Type: text/html; charset="utf-8"\r\n'
+            'Content-Transfer-Encoding: 8bit\r\n'
+            '\r\n'
+        ).encode('ascii')
+        self._footer = f'\r\n--{boundary}--\r\n'.encode('ascii')
+
+    def render(self, from_addr: str, to_addr: str, context: dict) -> bytes:
+        """
+        Render the full RFC 5322 message as bytes ready for SMTP
+        """
+        if _NEWLINES.search(from_addr) or _NEWLINES.search(to_addr):
+            raise ValueError('Email addresses must not contain line breaks')
+
+        subject = _NEWLINES.sub(' ', self.subject.format(**context))
+        # Long subjects are folded; the fold must be CRLF like every other line (bare LF breaks SMTP)
+        subject = Header(subject, 'utf-8').encode(linesep='\r\n')
+        headers = (
+            f'Subject: {subject}\r\n'
+            f'From: {from_addr}\r\n'
+            f'To: {to_addr}\r\n'
+        ).encode('utf-8')
+
+        return b''.join([
+            headers,
+            self._envelope,
+            self._text_header,
+            self.text.render(context),
+            self._html_header,
+            self.html.render(context),
+            self._footer,
+        ])
+
+
+def _read(filename: str) -> str:
+    with open(os.path.join(TEMPLATE_DIR, filename), encoding='utf-8') as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def load_email_templates() -> dict:
+    """
+    Load and compile every email template (once per process)
+    """
+    return {
+        name: EmailTemplate(subject, _read(f'{name}.txt'), _read(f'{name}.html'))
+        for name, subject in EMAIL_SUBJECTS.items()
+    }
+
+
+def render_email(name: str, from_addr: str, to_addr: str, context: dict) -> bytes:
+    """
+    Render the named email template into a complete message
+    """
+    template = load_email_templates()[name]
+    with metrics.timed('render'):
+        return template.render(from_addr, to_addr, context)
@@ -0,0 +1,54 @@
+import hashlib
+
+from flask import Response, current_app, request
+
+from utils import metrics
+from utils.compression import compress
+
+
+class CachedBody:
+    """
+    A JSON payload, its serialized body and ETag, computed once and served many times.
+    Compressed copies of the body are made on first request per encoding.
+    """
+    __slots__ = ('data', 'body', 'etag', 'encoded')
+
+    def __init__(self, data, body: bytes, etag: str):
+        self.data = data
+        self.body = body
+        self.etag = etag
+        self.encoded = {}
+
+    def compressed(self, encoding: str) -> bytes:
+        body = self.encoded.get(encoding)
+        if body is None:
+            body = self.encoded[encoding] = compress(self.body, encoding)
+        return body
+
+
+def build_cached_body(payload) -> CachedBody:
+    with metrics.timed('render'):
+        body = current_app.json.dumps_bytes(payload)
+    return CachedBody(payload, body, hashlib.sha1(body).hexdigest())
+
+
+def conditional_response(cached: CachedBody, max_age: int, last_modified=None, public: bool = True) -> Response:
+    """
+    Build a JSON response with ETag/Cache-Control (and Last-Modified if given)
+    that turns into a 304 when the client's validators still match
+    """
+    response = Response(cached.body, mimetype='application/json')
+    # Lets compress_response reuse the cached compressed copy
+    response.cached_body = cached
+    response.set_etag(cached.etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+
+    response.cache_control.max_age = max_age
+    if public:
+        response.cache_control.public = True
+    else:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+
+    return response.make_conditional(request)
@@ -0,0 +1,189 @@
+import os
+import time
+import threading
+import importlib.util
+
+import httpx
+
+from utils import metrics
+
+
+def http2_enabled() -> bool:
+    """
+    SUPABASE_HTTP2=auto (default) turns HTTP/2 on when the `h2` package is installed
+    """
+    setting = os.getenv('SUPABASE_HTTP2', 'auto').lower()
+    if setting == 'auto':
+        return importlib.util.find_spec('h2') is not None
+    return setting == 'true'
+
+
+def pool_limits() -> httpx.Limits:
+    max_connections = int(os.getenv('SUPABASE_MAX_CONNECTIONS', '20'))
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=int(os.getenv('SUPABASE_MAX_KEEPALIVE', str(max_connections))),
+        keepalive_expiry=float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', '30')),
+    )
+
+
+def pool_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        float(os.getenv('SUPABASE_READ_TIMEOUT', '10')),
+        connect=float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '5')),
+        pool=float(os.getenv('SUPABASE_POOL_TIMEOUT', '10')),
+    )
+
+
+class PoolMetrics:
+    """
+    Request counters and pool wait times of one transport. The wait is the time
+    from sending a request until it got a connection: either a new one started
+    connecting or an existing one started sending the request headers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def started(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+
+    def finished(self, wait: float, error: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.errors += error
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def snapshot(self, pool) -> dict:
+        connections = list(pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'in_flight': self.in_flight,
+                'errors': self.errors,
+                'connections': len(connections),
+                'in_use': len(connections) - idle,
+                'idle': idle,
+                'avg_wait_ms': round(self.wait_total / self.requests * 1000, 3) if self.requests else 0.0,
+                'max_wait_ms': round(self.wait_max * 1000, 3),
+            }
+
+
+class _TimedStream(httpx.SyncByteStream):
+    """
+    Response body that charges the whole Supabase call, body included, to the
+    current request's DB time once httpx has read and closed it
+    """
+
+    def __init__(self, stream, started: float):
+        self._stream = stream
+        self._started = started
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            metrics.record('db', time.perf_counter() - self._started)
+
+
+class _TimedAsyncStream(httpx.AsyncByteStream):
+    def __init__(self, stream, started: float):
+        self._stream = stream
+        self._started = started
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            metrics.record('db', time.perf_counter() - self._started)
+
+
+def _got_connection(event: str) -> bool:
+    return event.endswith(('connect_tcp.started', 'connect_unix_socket.started', 'send_request_headers.started'))
+
+
+class InstrumentedTransport(httpx.HTTPTransport):
+    """
+    httpx transport that records PoolMetrics through httpcore's trace hook and
+    the duration of each call in utils.metrics
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = PoolMetrics()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        waited = []
+        previous = request.extensions.get('trace')
+
+        def trace(event, info):
+            if not waited and _got_connection(event):
+                waited.append(time.perf_counter() - started)
+            if previous is not None:
+                previous(event, info)
+
+        request.extensions['trace'] = trace
+        self.metrics.started()
+        error = True
+        try:
+            response = super().handle_request(request)
+            error = False
+            response.stream = _TimedStream(response.stream, started)
+            return response
+        finally:
+            self.metrics.finished(waited[0] if waited else time.perf_counter() - started, error)
+
+    def stats(self) -> dict:
+        return self.metrics.snapshot(self._pool)
+
+
+class InstrumentedAsyncTransport(httpx.AsyncHTTPTransport):
+    """
+    Async counterpart of InstrumentedTransport
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = PoolMetrics()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        waited = []
+        previous = request.extensions.get('trace')
+
+        async def trace(event, info):
+            if not waited and _got_connection(event):
+                waited.append(time.perf_counter() - started)
+            if previous is not None:
+                await previous(event, info)
+
+        request.extensions['trace'] = trace
+        self.metrics.started()
+        error = True
+        try:
+            response = await super().handle_async_request(request)
+            error = False
+            response.stream = _TimedAsyncStream(response.stream, started)
+            return response
+        finally:
+            self.metrics.finished(waited[0] if waited else time.perf_counter() - started, error)
+
+    def stats(self) -> dict:
+        return self.metrics.snapshot(self._pool)
@@ -0,0 +1,75 @@
+import os
+import hashlib
+from functools import wraps
+
+from flask import Response, current_app, jsonify, request
+
+from utils.cache import TTLCache
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Responses of requests sent with an Idempotency-Key, replayed when the key comes again
+idempotency_cache = TTLCache(
+    'idempotency',
+    maxsize=int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('IDEMPOTENCY_TTL', '86400'))
+)
+
+
+class StoredResponse:
+    __slots__ = ('fingerprint', 'status', 'body', 'headers')
+
+    def __init__(self, fingerprint: str, response: Response):
+        self.fingerprint = fingerprint
+        self.status = response.status_code
+        self.body = response.get_data()
+        self.headers = [(name, value) for name, value in response.headers if name.lower() != 'set-cookie']
+
+    def replay(self) -> Response:
+        response = Response(self.body, status=self.status, headers=self.headers)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+
+def idempotent(view):
+    """
+    Make a POST view safe to retry: the first request with a given
+    Idempotency-Key runs the view and its response is kept for IDEMPOTENCY_TTL
+    seconds; repeats get that response back without running the view again.
+    Repeats that arrive while the first is still running wait for it instead
+    of inserting a second row. Reusing a key for a different body is a 422.
+    5xx responses are not kept, so a retry after a server error runs again.
+    Requests without the header are unaffected.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({'error': f'{IDEMPOTENCY_HEADER} must be 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters'}), 400
+
+        cache_key = f'{request.method} {request.path} {key}'
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        original = None
+
+        def run() -> StoredResponse:
+            nonlocal original
+            original = current_app.make_response(view(*args, **kwargs))
+            return StoredResponse(fingerprint, original)
+
+        stored = idempotency_cache.get_or_load(cache_key, run)
+
+        if stored.fingerprint != fingerprint:
+            return jsonify({'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'}), 422
+
+        if original is not None:
+            if original.status_code >= 500:
+                idempotency_cache.invalidate(cache_key)
+            return original
+
+        return stored.replay()
+
+    return wrapper
@@ -0,0 +1,72 @@
+import os
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional, see requirements-speedups.txt
+    orjson = None
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """
+    Flask's default provider, plus dumps_bytes() for callers that want the encoded body
+    """
+
+    def dumps_bytes(self, obj) -> bytes:
+        return self.dumps(obj).encode('utf-8')
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """
+    Serializes with orjson straight to bytes. The output matches the default
+    provider (sorted keys, compact, same handling of dates, decimals and
+    UUIDs) except that non-ASCII text is written as UTF-8 instead of \\u
+    escapes. Calls with encoder options orjson does not have, and objects it
+    cannot encode, fall back to the stdlib encoder.
+    """
+    option = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def dumps_bytes(self, obj) -> bytes:
+        try:
+            return orjson.dumps(obj, default=self.default, option=self.option)
+        except orjson.JSONEncodeError:
+            return super().dumps(obj).encode('utf-8')
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def get_json_provider_class():
+    """
+    JSON_PROVIDER=auto (orjson if installed), orjson or stdlib
+    """
+    choice = os.getenv('JSON_PROVIDER', 'auto').lower()
+    if choice not in ('auto', 'orjson', 'stdlib'):
+        raise ValueError('JSON_PROVIDER must be auto, orjson or stdlib')
+    if choice == 'orjson' and orjson is None:
+        raise ValueError('JSON_PROVIDER=orjson needs the orjson package (requirements-speedups.txt)')
+    if choice == 'stdlib' or orjson is None:
+        return StdlibJSONProvider
+    return OrjsonProvider
+
+
+def dumps_bytes(obj) -> bytes:
+    """
+    Encode outside a Flask app (async routes) the way the configured provider does
+    """
+    if get_json_provider_class() is OrjsonProvider:
+        return orjson.dumps(obj, option=OrjsonProvider.option & ~orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(obj, sort_keys=True, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,69 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: there is only ever one dev server process
+    fcntl = None
+
+
+class LeaderLock:
+    """
+    Non-blocking exclusive lock on a file, used to elect one process among the
+    gunicorn workers on a host. The OS drops the lock when its holder exits,
+    so another worker can take over on its next attempt.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _forget_inherited(self) -> None:
+        # A forked child shares the parent's lock; closing our copy keeps the parent's lock held
+        if self._file is not None and self._pid != os.getpid():
+            self._file.close()
+            self._file = None
+
+    @property
+    def held(self) -> bool:
+        with self._lock:
+            self._forget_inherited()
+            return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """
+        Take the lock if no other process holds it; True if this process is the leader
+        """
+        with self._lock:
+            self._forget_inherited()
+            if self._file is not None:
+                return True
+            if fcntl is None:
+                self._file, self._pid = open(os.devnull), os.getpid()
+                return True
+
+            lock_file = open(self.path, 'a+')
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(str(os.getpid()))
+            lock_file.flush()
+            self._file, self._pid = lock_file, os.getpid()
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._forget_inherited()
+            if self._file is None:
+                return
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,264 @@
+"""
+Object storage for capsule media. Browsers upload straight to storage with a
+short-lived signed URL instead of sending the file through a JSON request:
+with MEDIA_BACKEND=supabase the URL points at Supabase Storage and the file
+never touches a worker; with MEDIA_BACKEND=local (development, single host)
+it points at PUT /api/media/uploads/<token>, which streams the body to disk
+in MEDIA_CHUNK_SIZE pieces. Either way a worker holds at most one chunk.
+"""
+import os
+import re
+import hmac
+import json
+import time
+import uuid
+import base64
+import hashlib
+import secrets
+import mimetypes
+import threading
+
+from utils import metrics
+
+MEDIA_MAX_BYTES = int(os.getenv('MEDIA_MAX_BYTES', str(25 * 1024 * 1024)))
+MEDIA_UPLOAD_URL_TTL = int(os.getenv('MEDIA_UPLOAD_URL_TTL', '900'))
+MEDIA_CHUNK_SIZE = int(os.getenv('MEDIA_CHUNK_SIZE', '65536'))
+# Where MEDIA_BACKEND=local files are served from (GET /api/media/files/<key>)
+MEDIA_PUBLIC_URL = os.getenv('MEDIA_PUBLIC_URL', 'http://localhost:5000/api/media/files').rstrip('/')
+MEDIA_ALLOWED_TYPES = {
+    content_type.strip() for content_type in os.getenv(
+        'MEDIA_ALLOWED_TYPES',
+        'image/jpeg,image/png,image/webp,image/gif,video/mp4,video/webm,audio/mpeg,audio/mp4,audio/ogg'
+    ).split(',') if content_type.strip()
+}
+
+# Extensions the stored objects get, so the type can be told from the key alone
+EXTENSIONS = {
+    'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp', 'image/gif': '.gif',
+    'video/mp4': '.mp4', 'video/webm': '.webm',
+    'audio/mpeg': '.mp3', 'audio/mp4': '.m4a', 'audio/ogg': '.ogg',
+}
+
+MEDIA_ID_PATTERN = re.compile(r'^[0-9a-f]{32}\.[a-z0-9]{2,4}$')
+
+
+class MediaError(Exception):
+    """
+    An upload the client has to fix; `status` is the HTTP status to answer with
+    """
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def new_media_id(content_type: str) -> str:
+    """
+    Random, unguessable id of a new upload: '<32 hex digits><extension>'
+    """
+    if content_type not in MEDIA_ALLOWED_TYPES:
+        raise MediaError(f'Unsupported media type: {content_type}', 415)
+    extension = EXTENSIONS.get(content_type) or mimetypes.guess_extension(content_type) or '.bin'
+    return uuid.uuid4().hex + extension
+
+
+def parse_media_id(media_id: str) -> str:
+    if not isinstance(media_id, str) or not MEDIA_ID_PATTERN.match(media_id):
+        raise MediaError('Invalid media_id')
+    return media_id
+
+
+def original_key(media_id: str) -> str:
+    return f'originals/{media_id}'
+
+
+def thumbnail_key(media_id: str) -> str:
+    return f'thumbnails/{media_id.split(".", 1)[0]}.jpg'
+
+
+def content_type_of(media_id: str) -> str:
+    return mimetypes.guess_type(media_id)[0] or 'application/octet-stream'
+
+
+def has_thumbnail(media_id: str) -> bool:
+    return content_type_of(media_id).startswith('image/')
+
+
+class UploadSigner:
+    """
+    HMAC-signed upload tokens: the token names the object, its type and size
+    limit and when it expires, so the upload endpoint needs no lookup to
+    trust it. Every worker must share MEDIA_SIGNING_KEY.
+    """
+
+    def __init__(self, key: bytes):
+        self.key = key
+
+    def _signature(self, payload: bytes) -> str:
+        return base64.urlsafe_b64encode(hmac.new(self.key, payload, hashlib.sha256).digest()).rstrip(b'=').decode()
+
+    def sign(self, claims: dict) -> str:
+        payload = base64.urlsafe_b64encode(json.dumps(claims, separators=(',', ':')).encode()).rstrip(b'=')
+        return f'{payload.decode()}.{self._signature(payload)}'
+
+    def verify(self, token: str) -> dict:
+        payload, _, signature = token.partition('.')
+        if not signature or not hmac.compare_digest(signature, self._signature(payload.encode())):
+            raise MediaError('Invalid upload token', 403)
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        if claims['exp'] < time.time():
+            raise MediaError('Upload URL has expired', 403)
+        return claims
+
+
+class LocalMediaStorage:
+    """
+    Files under MEDIA_ROOT, served by GET /api/media/files/<key>. Uploads go
+    to a temporary file next to the target and are linked into place once
+    complete, so a half-written upload is never served and a stored object
+    (served as immutable) is never replaced.
+    """
+    name = 'local'
+
+    def __init__(self, root: str, signer: UploadSigner):
+        self.root = os.path.abspath(root)
+        self.signer = signer
+
+    def path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise MediaError('Invalid media key', 404)
+        return path
+
+    def create_upload(self, media_id: str, content_type: str, size: int) -> dict:
+        token = self.signer.sign({
+            'id': media_id, 'type': content_type, 'max': size, 'exp': int(time.time()) + MEDIA_UPLOAD_URL_TTL
+        })
+        return {
+            'url': f'/api/media/uploads/{token}',
+            'method': 'PUT',
+            'headers': {'Content-Type': content_type},
+        }
+
+    def write_stream(self, key: str, stream, max_bytes: int) -> int:
+        """
+        Copy `stream` to `key` chunk by chunk; MediaError 413 (and nothing
+        stored) as soon as it goes past max_bytes, 409 if `key` is already stored
+        """
+        path = self.path(key)
+        if os.path.exists(path):
+            raise MediaError('This file has already been uploaded', 409)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{secrets.token_hex(4)}.part'
+        written = 0
+        try:
+            with open(partial, 'wb') as file:
+                while True:
+                    chunk = stream.read(MEDIA_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise MediaError(f'File is larger than {max_bytes} bytes', 413)
+                    file.write(chunk)
+            try:
+                # Unlike a rename, fails if a replayed upload URL stored the object meanwhile
+                os.link(partial, path)
+            except FileExistsError:
+                raise MediaError('This file has already been uploaded', 409)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        return written
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def read(self, key: str) -> bytes:
+        with open(self.path(key), 'rb') as file:
+            return file.read()
+
+    def write(self, key: str, data: bytes, content_type: str) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{secrets.token_hex(4)}.part'
+        with open(partial, 'wb') as file:
+            file.write(data)
+        os.replace(partial, path)
+
+    def public_url(self, key: str) -> str:
+        return f'{MEDIA_PUBLIC_URL}/{key}'
+
+
+class SupabaseMediaStorage:
+    """
+    A Supabase Storage bucket (MEDIA_BUCKET, public read). Uploads go
+    directly from the browser to the signed URL; the bucket's
+    file_size_limit and allowed_mime_types (see the README) enforce the
+    limits there, as nothing passes through the API to count.
+    """
+    name = 'supabase'
+
+    def __init__(self, client, bucket: str):
+        self.client = client
+        self.bucket = bucket
+
+    def _bucket(self):
+        return self.client.storage.from_(self.bucket)
+
+    def create_upload(self, media_id: str, content_type: str, size: int) -> dict:
+        with metrics.timed('db'):
+            signed = self._bucket().create_signed_upload_url(original_key(media_id))
+        return {
+            'url': signed['signed_url'],
+            'method': 'PUT',
+            'headers': {'Content-Type': content_type},
+        }
+
+    def exists(self, key: str) -> bool:
+        folder, _, name = key.rpartition('/')
+        with metrics.timed('db'):
+            files = self._bucket().list(folder, {'limit': 1, 'search': name})
+        return any(file.get('name') == name for file in files)
+
+    def read(self, key: str) -> bytes:
+        with metrics.timed('db'):
+            return self._bucket().download(key)
+
+    def write(self, key: str, data: bytes, content_type: str) -> None:
+        with metrics.timed('db'):
+            self._bucket().upload(key, data, {'content-type': content_type, 'x-upsert': 'true'})
+
+    def public_url(self, key: str) -> str:
+        return self._bucket().get_public_url(key).rstrip('?')
+
+
+def create_media_storage(client=None):
+    backend_name = os.getenv('MEDIA_BACKEND', 'local').lower()
+    if backend_name == 'supabase':
+        if client is None:
+            from utils.supabase_client import supabase as client
+        return SupabaseMediaStorage(client, os.getenv('MEDIA_BUCKET', 'capsule-media'))
+    if backend_name != 'local':
+        raise ValueError('MEDIA_BACKEND must be local or supabase')
+
+    signing_key = os.getenv('MEDIA_SIGNING_KEY')
+    if not signing_key:
+        # Fine for one process; with several workers a token signed by one must verify on the others
+        print('MEDIA_SIGNING_KEY is not set, upload URLs only work on the worker that issued them')
+    signer = UploadSigner(signing_key.encode() if signing_key else secrets.token_bytes(32))
+    default_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'media')
+    return LocalMediaStorage(os.getenv('MEDIA_ROOT', default_root), signer)
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_media_storage():
+    global _storage
+
+    with _storage_lock:
+        if _storage is None:
+            _storage = create_media_storage()
+        return _storage
@@ -0,0 +1,336 @@
+"""
+In-memory backend implementing the parts of the Supabase client the app uses
+(table().select/insert/update/delete with eq/neq/lt/lte/gt/gte/in_/or_,
+order, limit and rpc), with an optional per-call latency. Selected with
+DATA_BACKEND=memory to run the API and its benchmarks without a Supabase
+project. With record_calls=True every execute() is recorded in `calls`, so
+benchmarks can count database round trips per request; it is off by default
+so a long-running DATA_BACKEND=memory server does not grow without bound.
+"""
+import os
+import time
+import itertools
+import threading
+
+
+class MemoryAPIError(Exception):
+    """
+    Raised like postgrest's APIError, with the Postgres SQLSTATE in .code
+    """
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class _Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _coerce(stored, value):
+    if isinstance(stored, bool):
+        return value if isinstance(value, bool) else str(value).lower() == 'true'
+    if isinstance(stored, (int, float)):
+        return type(stored)(value)
+    return str(value)
+
+
+def _compare(op: str, stored, value) -> bool:
+    if op == 'is':
+        return stored is value
+    if stored is None:
+        return False
+    if op == 'in':
+        return str(stored) in [str(item) for item in value]
+    value = _coerce(stored, value)
+    return {
+        'eq': stored == value,
+        'neq': stored != value,
+        'lt': stored < value,
+        'lte': stored <= value,
+        'gt': stored > value,
+        'gte': stored >= value,
+    }[op]
+
+
+def _parse_literal(value: str):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return {'null': None, 'true': True, 'false': False}.get(value, value)
+
+
+def _split_top_level(expression: str) -> list:
+    parts, depth, current = [], 0, ''
+    for char in expression:
+        depth += char == '('
+        depth -= char == ')'
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+
+def _parse_or(expression: str, combine=any):
+    """
+    PostgREST logic tree such as `a.is.null,and(b.lt.1,c.eq.x)` -> predicate
+    """
+    predicates = []
+    for part in _split_top_level(expression):
+        if part.startswith('and('):
+            predicates.append(_parse_or(part[4:-1], all))
+        elif part.startswith('or('):
+            predicates.append(_parse_or(part[3:-1], any))
+        else:
+            column, op, value = part.split('.', 2)
+            predicates.append(lambda row, c=column, o=op, v=_parse_literal(value): _compare(o, row.get(c), v))
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+
+class _Query:
+    def __init__(self, db, table: str):
+        self.db = db
+        self.table = table
+        self.action = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.filters = []
+        # eq('id', ...) is answered from the primary key index instead of a scan
+        self.key = None
+        self.ordering = []
+        self.row_limit = None
+
+    def select(self, columns: str = '*', count=None):
+        self.columns = columns
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = 'insert', payload
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    def _filter(self, op, column, value):
+        self.filters.append(lambda row: _compare(op, row.get(column), value))
+        return self
+
+    def eq(self, column, value):
+        if column == 'id':
+            self.key = str(value)
+        return self._filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._filter('neq', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def in_(self, column, values):
+        return self._filter('in', column, list(values))
+
+    def or_(self, expression: str):
+        self.filters.append(_parse_or(expression))
+        return self
+
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs):
+        self.row_limit = size
+        return self
+
+    def execute(self):
+        return self.db._execute(self)
+
+
+class _RPC:
+    def __init__(self, db, name: str, params: dict):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        if self.db.latency:
+            time.sleep(self.db.latency)
+
+        with self.db.lock:
+            if self.db.record_calls:
+                self.db.calls.append(('rpc', self.name))
+            return _Result(self.db.functions[self.name](self.db, **self.params))
+
+
+def _increment_play_count(db, music_id, delta: int = 1):
+    row = db._by_id.get('music_jars', {}).get(str(music_id))
+    if row is None:
+        return None
+    row['play_count'] = (row.get('play_count') or 0) + delta
+    return row['play_count']
+
+
+def _increment_play_counts(db, deltas: dict) -> list:
+    rows = []
+    for music_id, delta in deltas.items():
+        play_count = _increment_play_count(db, music_id, int(delta))
+        if play_count is not None:
+            rows.append({'id': int(music_id), 'play_count': play_count})
+    return rows
+
+
+def _take_rate_limit_tokens(db, bucket_key: str, rate: float, capacity: float, cost: float = 1) -> float:
+    buckets = db.tables.setdefault('rate_limit_buckets', [])
+    by_key = db._by_id.setdefault('rate_limit_buckets', {})
+    now = time.monotonic()
+
+    bucket = by_key.get(bucket_key)
+    if bucket is None:
+        bucket = by_key[bucket_key] = {'bucket': bucket_key, 'tokens': capacity, 'updated_at': now}
+        buckets.append(bucket)
+    bucket['tokens'] = min(capacity, bucket['tokens'] + (now - bucket['updated_at']) * rate)
+    bucket['updated_at'] = now
+
+    if bucket['tokens'] >= cost:
+        bucket['tokens'] -= cost
+        return 0
+    return (cost - bucket['tokens']) / rate
+
+
+# The SQL functions from the README schema
+DEFAULT_FUNCTIONS = {
+    'increment_play_count': _increment_play_count,
+    'increment_play_counts': _increment_play_counts,
+    'take_rate_limit_tokens': _take_rate_limit_tokens,
+}
+
+# The unique indexes from the README schema
+DEFAULT_UNIQUE = {
+    'jar_types': [('name',)],
+    'music_jars': [('jar_type', 'youtube_video_id')],
+}
+
+
+class MemorySupabase:
+    """
+    `latency` seconds are slept before every query and RPC to stand in for the
+    network round trip. `unique` maps a table to column tuples that must not
+    repeat (rows with a NULL in them are exempt, as in Postgres). Rows must be
+    written through table() so the primary key index stays in step.
+    """
+
+    def __init__(self, latency: float = 0, unique: dict = None, record_calls: bool = False):
+        self.tables = {}
+        self._by_id = {}
+        self.functions = dict(DEFAULT_FUNCTIONS)
+        self.unique = unique or {}
+        self.record_calls = record_calls
+        self.calls = []
+        self.latency = latency
+        self.lock = threading.RLock()
+        self._ids = itertools.count(1)
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: dict) -> _RPC:
+        return _RPC(self, name, params)
+
+    def reset_calls(self) -> list:
+        with self.lock:
+            calls, self.calls = self.calls, []
+        return calls
+
+    def _check_unique(self, table: str, rows: list, candidates: list, replaced: list = ()) -> None:
+        """
+        Raise a unique violation if a candidate row repeats a unique key of
+        another candidate or of `rows` other than those it `replaced`
+        """
+        current = {id(row) for row in replaced}
+        for columns in self.unique.get(table, ()):
+            seen = set()
+            for row in itertools.chain((row for row in rows if id(row) not in current), candidates):
+                key = tuple(row.get(column) for column in columns)
+                if None in key:
+                    continue
+                if key in seen:
+                    raise MemoryAPIError(
+                        f'duplicate key value violates unique constraint on {table} ({", ".join(columns)})', '23505')
+                seen.add(key)
+
+    def _execute(self, query: _Query) -> _Result:
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.lock:
+            if self.record_calls:
+                self.calls.append((query.table, query.action))
+            rows = self.tables.setdefault(query.table, [])
+            by_id = self._by_id.setdefault(query.table, {})
+
+            if query.action == 'insert':
+                items = query.payload if isinstance(query.payload, list) else [query.payload]
+                inserted = [dict(item) for item in items]
+                # All or nothing, like a multi-row INSERT
+                self._check_unique(query.table, rows, inserted)
+                for row in inserted:
+                    row.setdefault('id', next(self._ids))
+                    by_id[str(row['id'])] = row
+                rows.extend(inserted)
+                return _Result([dict(row) for row in inserted])
+
+            if query.key is not None:
+                candidates = [by_id[query.key]] if query.key in by_id else []
+            else:
+                candidates = rows
+            matched = [row for row in candidates if all(f(row) for f in query.filters)]
+
+            if query.action == 'update':
+                if self.unique.get(query.table) and matched:
+                    self._check_unique(query.table, rows, [{**row, **query.payload} for row in matched], matched)
+                for row in matched:
+                    row.update(query.payload)
+                return _Result([dict(row) for row in matched])
+
+            if query.action == 'delete':
+                for row in matched:
+                    rows.remove(row)
+                    del by_id[str(row['id'])]
+                return _Result([dict(row) for row in matched])
+
+            for column, desc in reversed(query.ordering):
+                matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+            if query.row_limit is not None:
+                matched = matched[:query.row_limit]
+            if query.columns != '*':
+                columns = [column.strip() for column in query.columns.split(',')]
+                matched = [{column: row.get(column) for column in columns} for row in matched]
+            return _Result([dict(row) for row in matched], len(matched))
+
+
+def create_memory_backend() -> MemorySupabase:
+    """
+    The backend used for DATA_BACKEND=memory; MEMORY_BACKEND_LATENCY_MS sets the simulated round trip
+    """
+    return MemorySupabase(
+        latency=float(os.getenv('MEMORY_BACKEND_LATENCY_MS', '0')) / 1000,
+        unique=DEFAULT_UNIQUE,
+    )
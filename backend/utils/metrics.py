@@ -0,0 +1,162 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; Prometheus' default buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Time spent outside any request (email workers, capsule dispatcher) is labeled with this route
+BACKGROUND_ROUTE = 'background'
+COMPONENTS = ('db', 'smtp', 'render')
+
+
+class Histogram:
+    """
+    Labeled histogram rendered in the Prometheus text format
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series = {}
+
+    def observe(self, value: float, *labelvalues) -> None:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def expose(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+
+        for labelvalues, values in series:
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues))
+            prefix = f'{labels},' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {values[-1]}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram(
+    'giftcapsule_request_duration_seconds', 'Wall time of HTTP requests', ('route', 'method', 'status'))
+REQUEST_COMPONENT_SECONDS = Histogram(
+    'giftcapsule_request_component_seconds', 'Time one request spent in Supabase calls, SMTP and rendering',
+    ('route', 'component'))
+CALL_SECONDS = Histogram(
+    'giftcapsule_call_duration_seconds', 'Wall time of single Supabase calls, SMTP sends and renders',
+    ('route', 'component'))
+
+_HISTOGRAMS = (REQUEST_SECONDS, REQUEST_COMPONENT_SECONDS, CALL_SECONDS)
+
+
+class RequestTimer:
+    """
+    Per-request accumulator of component time, carried in a context variable
+    so calls deep inside utils/ can charge the request that is running them
+    """
+
+    def __init__(self, route: str, method: str):
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        self.components = dict.fromkeys(COMPONENTS, 0.0)
+        self.finished = False
+
+
+_current = contextvars.ContextVar('giftcapsule_request_timer', default=None)
+
+
+def start_request(route: str, method: str):
+    """
+    Start timing a request; returns the token to hand back to finish_request
+    """
+    return _current.set(RequestTimer(route, method))
+
+
+def finish_request(token, status: int) -> None:
+    timer = _current.get()
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Finished from another context than it started in (e.g. a streamed response)
+        _current.set(None)
+    if timer is None or timer.finished:
+        return
+    timer.finished = True
+
+    REQUEST_SECONDS.observe(time.perf_counter() - timer.started, timer.route, timer.method, str(status))
+    for component, seconds in timer.components.items():
+        REQUEST_COMPONENT_SECONDS.observe(seconds, timer.route, component)
+
+
+def record(component: str, seconds: float) -> None:
+    """
+    Charge `seconds` of `component` time to the current request (if any)
+    """
+    timer = _current.get()
+    CALL_SECONDS.observe(seconds, timer.route if timer else BACKGROUND_ROUTE, component)
+    if timer is not None:
+        timer.components[component] += seconds
+
+
+@contextmanager
+def timed(component: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(component, time.perf_counter() - started)
+
+
+def render_metrics() -> str:
+    lines = []
+    for histogram in _HISTOGRAMS:
+        lines.extend(histogram.expose())
+    return '\n'.join(lines) + '\n'
+
+
+def instrument_app(app) -> None:
+    """
+    Time every Flask request under its URL rule (e.g. /api/gifts/<gift_id>),
+    so label cardinality stays bounded by the number of routes
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        g.metrics_token = start_request(route, request.method)
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_timer(error):
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            # No status means the handler raised past Flask's error handling
+            finish_request(token, g.pop('metrics_status', 500))
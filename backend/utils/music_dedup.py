@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+
+from utils.youtube import extract_video_id
+
+
+def canonical_youtube_url(video_id: str) -> str:
+    return f'https://www.youtube.com/watch?v={video_id}'
+
+
+class MusicDedupIndex:
+    """
+    In-process hash index of (jar_type, youtube_video_id) -> music id, so a
+    new song is told apart from a duplicate without scanning the jar. The
+    database's unique index stays the source of truth: songs added by other
+    workers are learned from the conflict they cause, a hit is confirmed with
+    a primary key lookup (songs deleted in other workers are dropped then),
+    and the whole index is rebuilt every `rebuild_interval`.
+    """
+
+    def __init__(self, client, rebuild_interval: float = 600, page_size: int = 1000):
+        self.client = client
+        self.rebuild_interval = rebuild_interval
+        self.page_size = page_size
+
+        self._songs = {}
+        self._built_at = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'rebuilds': 0}
+
+    def _load(self) -> dict:
+        songs = {}
+        last_id = None
+        while True:
+            query = self.client.table('music_jars').select('id,jar_type,youtube_url,youtube_video_id')
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            rows = query.order('id').limit(self.page_size).execute().data or []
+
+            for row in rows:
+                # Rows from before the youtube_video_id column was backfilled
+                video_id = row.get('youtube_video_id') or extract_video_id(row.get('youtube_url'))
+                if video_id:
+                    songs.setdefault((row['jar_type'], video_id), row['id'])
+
+            if len(rows) < self.page_size:
+                return songs
+            last_id = rows[-1]['id']
+
+    def _ensure_built(self) -> None:
+        if self._built_at is not None and time.monotonic() - self._built_at < self.rebuild_interval:
+            return
+        # Only the first build blocks; later rebuilds run in one request while others use the old index
+        if not self._build_lock.acquire(blocking=self._built_at is None):
+            return
+        try:
+            if self._built_at is not None and time.monotonic() - self._built_at < self.rebuild_interval:
+                return
+            songs = self._load()
+            with self._lock:
+                self._songs = songs
+                self._built_at = time.monotonic()
+                self._stats['rebuilds'] += 1
+        finally:
+            self._build_lock.release()
+
+    def find(self, jar_type: str, video_id: str):
+        """
+        Id of the song with this video in the jar, or None
+        """
+        self._ensure_built()
+        with self._lock:
+            music_id = self._songs.get((jar_type, video_id))
+            if music_id is None:
+                self._stats['misses'] += 1
+                return None
+
+        result = self.client.table('music_jars').select('id').eq('id', music_id).execute()
+        with self._lock:
+            if result.data:
+                self._stats['hits'] += 1
+                return music_id
+            # Deleted since it was indexed; forget it unless another id took its place meanwhile
+            if self._songs.get((jar_type, video_id)) == music_id:
+                del self._songs[(jar_type, video_id)]
+            self._stats['stale'] += 1
+            return None
+
+    def add(self, jar_type: str, video_id: str, music_id) -> None:
+        with self._lock:
+            self._songs[(jar_type, video_id)] = music_id
+
+    def lookup_existing(self, jar_type: str, video_id: str):
+        """
+        Fetch the id of a song the database already has (after a unique violation) and index it
+        """
+        result = (
+            self.client.table('music_jars').select('id')
+            .eq('jar_type', jar_type).eq('youtube_video_id', video_id).limit(1).execute()
+        )
+        if not result.data:
+            return None
+        music_id = result.data[0]['id']
+        self.add(jar_type, video_id, music_id)
+        return music_id
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['songs'] = len(self._songs)
+        return stats
+
+
+def is_unique_violation(error: Exception) -> bool:
+    # postgrest.exceptions.APIError carries the Postgres SQLSTATE in .code
+    return getattr(error, 'code', None) == '23505'
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_music_dedup_index(client) -> MusicDedupIndex:
+    global _index
+
+    with _index_lock:
+        if _index is None:
+            _index = MusicDedupIndex(
+                client,
+                rebuild_interval=float(os.getenv('MUSIC_DEDUP_REBUILD_INTERVAL', '600')),
+            )
+        return _index
@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+
+from utils.music_sampler import ALL_JARS
+
+# Columns served by the music listing and leaderboard endpoints
+MUSIC_COLUMNS = 'id,jar_type,song_name,artist_name,youtube_url,added_by,play_count,created_at'
+
+
+def _rank(row: dict) -> tuple:
+    # play_count DESC, id DESC: the same order the board is loaded in
+    return -(row.get('play_count') or 0), -row['id']
+
+
+class _Board:
+    __slots__ = ('rows', 'loaded_at')
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.loaded_at = time.monotonic()
+
+
+class MusicLeaderboard:
+    """
+    Top `size` songs by play_count per jar (and across all jars), kept in memory.
+    A board is loaded with one ordered query on first read and then patched in
+    place from play count totals (play counter flushes, direct increments and
+    new songs), so reads never hit the database. Boards are reloaded every
+    `ttl` seconds to pick up plays counted by other workers and deleted songs.
+    """
+
+    def __init__(self, client, size: int = 10, ttl: float = 300):
+        self.client = client
+        self.size = size
+        self.ttl = ttl
+
+        self._boards = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._stats = {'loads': 0, 'updates': 0, 'promotions': 0}
+
+    def _load(self, jar_type) -> _Board:
+        query = self.client.table('music_jars').select(MUSIC_COLUMNS)
+        if jar_type is not ALL_JARS:
+            query = query.eq('jar_type', jar_type)
+        rows = query.order('play_count', desc=True).order('id', desc=True).limit(self.size).execute().data or []
+        return _Board(rows)
+
+    def _live_board(self, jar_type):
+        board = self._boards.get(jar_type)
+        if board is not None and time.monotonic() - board.loaded_at < self.ttl:
+            return board
+        return None
+
+    def top(self, jar_type=ALL_JARS, limit: int = None) -> list:
+        """
+        The jar's most played songs, best first
+        """
+        board = self._live_board(jar_type)
+        if board is None:
+            # One load at a time; whoever waited finds the board already loaded
+            with self._load_lock:
+                board = self._live_board(jar_type)
+                if board is None:
+                    board = self._load(jar_type)
+                    with self._lock:
+                        self._boards[jar_type] = board
+                        self._stats['loads'] += 1
+
+        with self._lock:
+            return [dict(row) for row in board.rows[:limit]]
+
+    def _place(self, board: _Board, row: dict) -> bool:
+        """
+        Insert or move `row` on a board; False if it does not make the cut
+        """
+        rows = [existing for existing in board.rows if existing['id'] != row['id']]
+        if len(rows) >= self.size and _rank(row) > _rank(rows[-1]):
+            return False
+        rows.append(row)
+        rows.sort(key=_rank)
+        del rows[self.size:]
+        board.rows = rows
+        return True
+
+    def add(self, row: dict) -> None:
+        """
+        Offer a newly inserted song to its jar's board and the all-jars board
+        """
+        with self._lock:
+            self._promote({column: row.get(column) for column in MUSIC_COLUMNS.split(',')})
+
+    def update_play_counts(self, totals: dict) -> None:
+        """
+        Apply {music_id: play_count} totals. Songs already on a board move in
+        place; songs that may now reach a board's cut-off are placed on the
+        boards of their jar, fetching the ones no board knows in one query.
+        """
+        if not totals:
+            return
+
+        missing = []
+        with self._lock:
+            self._stats['updates'] += 1
+            known = {}
+            for board in self._boards.values():
+                changed = False
+                for row in board.rows:
+                    play_count = totals.get(str(row['id']))
+                    if play_count is not None:
+                        row['play_count'] = play_count
+                        known[str(row['id'])] = row
+                        changed = True
+                if changed:
+                    board.rows.sort(key=_rank)
+
+            # Nothing below the lowest cut-off (of a full board) can enter any board
+            cutoffs = [(board.rows[-1].get('play_count') or 0) if len(board.rows) >= self.size else -1
+                       for board in self._boards.values()]
+            threshold = min(cutoffs) if cutoffs else None
+
+            for music_id, play_count in totals.items():
+                if threshold is None or play_count < threshold:
+                    continue
+                if str(music_id) in known:
+                    self._promote(dict(known[str(music_id)]))
+                else:
+                    missing.append(int(music_id))
+
+        if not missing:
+            return
+
+        rows = self.client.table('music_jars').select(MUSIC_COLUMNS).in_('id', missing).execute().data or []
+        with self._lock:
+            for row in rows:
+                # The fetched count may be older than the flushed total
+                row['play_count'] = max(row.get('play_count') or 0, totals.get(str(row['id']), 0))
+                self._promote(row)
+
+    def _promote(self, row: dict) -> None:
+        for key in (ALL_JARS, row['jar_type']):
+            board = self._boards.get(key)
+            if board is not None and all(existing['id'] != row['id'] for existing in board.rows):
+                if self._place(board, dict(row)):
+                    self._stats['promotions'] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['boards'] = len(self._boards)
+        stats['size'] = self.size
+        stats['ttl'] = self.ttl
+        return stats
+
+
+_leaderboard = None
+_leaderboard_lock = threading.Lock()
+
+
+def get_music_leaderboard(client) -> MusicLeaderboard:
+    global _leaderboard
+
+    with _leaderboard_lock:
+        if _leaderboard is None:
+            _leaderboard = MusicLeaderboard(
+                client,
+                size=int(os.getenv('MUSIC_LEADERBOARD_SIZE', '10')),
+                ttl=float(os.getenv('MUSIC_LEADERBOARD_TTL', '300')),
+            )
+        return _leaderboard
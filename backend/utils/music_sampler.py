@@ -0,0 +1,241 @@
+import os
+import time
+import random
+import bisect
+import threading
+from collections import OrderedDict, deque
+
+# Sentinel key for the index that spans every jar
+ALL_JARS = None
+
+
+class _JarIndex:
+    """
+    Song ids of one jar in a list (O(1) uniform picks, swap-remove) plus their
+    play counts. Cumulative weights for play_count sampling are rebuilt lazily.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+        self.play_counts = {}
+        self._cumulative = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, music_id: str, play_count: int) -> None:
+        if music_id not in self.positions:
+            self.positions[music_id] = len(self.ids)
+            self.ids.append(music_id)
+        self.play_counts[music_id] = play_count or 0
+        self._cumulative = None
+
+    def remove(self, music_id: str) -> None:
+        position = self.positions.pop(music_id, None)
+        if position is None:
+            return
+        last = self.ids.pop()
+        if last != music_id:
+            self.ids[position] = last
+            self.positions[last] = position
+        self.play_counts.pop(music_id, None)
+        self._cumulative = None
+
+    def set_play_count(self, music_id: str, play_count: int) -> None:
+        if music_id in self.positions:
+            self.play_counts[music_id] = play_count
+            self._cumulative = None
+
+    def pick(self, weighted: bool) -> str:
+        if not weighted:
+            return random.choice(self.ids)
+
+        if self._cumulative is None:
+            total = 0
+            cumulative = []
+            for music_id in self.ids:
+                # +1 so songs that were never played can still come up
+                total += self.play_counts[music_id] + 1
+                cumulative.append(total)
+            self._cumulative = cumulative
+
+        point = random.uniform(0, self._cumulative[-1])
+        return self.ids[min(bisect.bisect_left(self._cumulative, point), len(self.ids) - 1)]
+
+
+class MusicSampler:
+    """
+    Picks random songs from an in-memory (id, jar_type, play_count) index so only
+    the chosen row is fetched from the database. New rows are pulled in
+    incrementally by id; the whole index is rebuilt every `full_refresh_interval`
+    to drop deleted songs and pick up play counts.
+    """
+
+    def __init__(self, client, refresh_interval: float = 30, full_refresh_interval: float = 600,
+                 recent_size: int = 5, max_clients: int = 10000, page_size: int = 1000):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_interval
+        self.recent_size = recent_size
+        self.max_clients = max_clients
+        self.page_size = page_size
+
+        self._jars = {}
+        self._max_id = None
+        self._refreshed_at = 0
+        self._rebuilt_at = 0
+        self._recent = OrderedDict()
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+    def _load_rows(self, after_id=None) -> list:
+        rows = []
+        while True:
+            query = self.client.table('music_jars').select('id,jar_type,play_count')
+            if after_id is not None:
+                query = query.gt('id', after_id)
+            page = query.order('id').limit(self.page_size).execute().data or []
+            rows.extend(page)
+            if len(page) < self.page_size:
+                return rows
+            after_id = page[-1]['id']
+
+    def _index_row(self, row: dict) -> None:
+        music_id = str(row['id'])
+        for key in (ALL_JARS, row['jar_type']):
+            self._jars.setdefault(key, _JarIndex()).add(music_id, row.get('play_count'))
+        if self._max_id is None or row['id'] > self._max_id:
+            self._max_id = row['id']
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Pull new songs (or rebuild the index) when the refresh interval has passed.
+        Loading happens outside the index lock; if another thread is already
+        refreshing, the current index keeps being served.
+        """
+        now = time.monotonic()
+        rebuild = force or now - self._rebuilt_at >= self.full_refresh_interval
+        if not rebuild and now - self._refreshed_at < self.refresh_interval:
+            return
+
+        if not self._refresh_lock.acquire(blocking=not self._jars):
+            return
+        try:
+            if rebuild:
+                rows = self._load_rows()
+                with self._lock:
+                    self._jars = {}
+                    self._max_id = None
+                    for row in rows:
+                        self._index_row(row)
+                    self._rebuilt_at = now
+            else:
+                rows = self._load_rows(self._max_id)
+                with self._lock:
+                    for row in rows:
+                        self._index_row(row)
+            self._refreshed_at = now
+        finally:
+            self._refresh_lock.release()
+
+    def add(self, row: dict) -> None:
+        """
+        Index a song that was just inserted
+        """
+        with self._lock:
+            self._index_row(row)
+
+    def remove(self, music_id) -> None:
+        with self._lock:
+            for index in self._jars.values():
+                index.remove(str(music_id))
+
+    def update_play_counts(self, totals: dict) -> None:
+        """
+        Apply {music_id: play_count} totals, e.g. from the play counter flush
+        """
+        with self._lock:
+            for index in self._jars.values():
+                for music_id, play_count in totals.items():
+                    index.set_play_count(str(music_id), play_count)
+
+    def _recent_for(self, client_id: str) -> deque:
+        recent = self._recent.get(client_id)
+        if recent is None:
+            recent = deque(maxlen=self.recent_size)
+            self._recent[client_id] = recent
+            if len(self._recent) > self.max_clients:
+                self._recent.popitem(last=False)
+        else:
+            self._recent.move_to_end(client_id)
+        return recent
+
+    def pick(self, jar_type=ALL_JARS, weighted: bool = False, client_id: str = None):
+        """
+        Return a random song id from the jar (or any jar), or None if it is empty.
+        With a client_id, the client's last `recent_size` songs are avoided when possible.
+        """
+        self.refresh()
+
+        # Another process may have added the first songs to this jar since the last refresh
+        if not self._jars.get(jar_type) and time.monotonic() - self._refreshed_at >= 1:
+            self._refreshed_at = 0
+            self.refresh()
+
+        with self._lock:
+            index = self._jars.get(jar_type)
+            if not index:
+                return None
+
+            recent = self._recent_for(client_id) if client_id else ()
+            # In small jars only the last len-1 picks can be avoided
+            window = min(len(recent), len(index) - 1)
+            avoid = set(list(recent)[len(recent) - window:]) if window > 0 else set()
+
+            for _ in range(10):
+                music_id = index.pick(weighted)
+                if music_id not in avoid:
+                    break
+            else:
+                # Unlucky streak: fall back to a scan over the allowed songs
+                music_id = random.choice([candidate for candidate in index.ids if candidate not in avoid])
+
+            if client_id:
+                recent.append(music_id)
+            return music_id
+
+    def random_row(self, jar_type=ALL_JARS, weighted: bool = False, client_id: str = None, columns: str = '*'):
+        """
+        Pick a song and fetch just that row; songs deleted since the last refresh are skipped
+        """
+        for _ in range(3):
+            music_id = self.pick(jar_type, weighted, client_id)
+            if music_id is None:
+                return None
+
+            result = self.client.table('music_jars').select(columns).eq('id', music_id).execute()
+            if result.data:
+                return result.data[0]
+
+            self.remove(music_id)
+
+        return None
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_music_sampler(client) -> MusicSampler:
+    global _sampler
+
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = MusicSampler(
+                client,
+                refresh_interval=float(os.getenv('MUSIC_INDEX_REFRESH_INTERVAL', '30')),
+                full_refresh_interval=float(os.getenv('MUSIC_INDEX_REBUILD_INTERVAL', '600')),
+                recent_size=int(os.getenv('MUSIC_NO_REPEAT_SIZE', '5')),
+            )
+        return _sampler
@@ -0,0 +1,96 @@
+import json
+import codecs
+
+from flask import current_app
+
+READ_SIZE = 64 * 1024
+_WHITESPACE = ' \t\r\n'
+
+
+def ndjson_line(payload) -> bytes:
+    """
+    One newline-terminated JSON document, serialized by the app's JSON provider
+    """
+    return current_app.json.dumps_bytes(payload) + b'\n'
+
+
+def iter_ndjson(stream):
+    """
+    Yield (item, error) for each non-blank line of an NDJSON body. A line that
+    is not valid JSON yields (None, message) and parsing carries on.
+    """
+    for line in iter(stream.readline, b''):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line), None
+        except ValueError as e:
+            yield None, f'Invalid JSON: {e}'
+
+
+def iter_json_array(stream):
+    """
+    Yield (item, None) for each element of a top-level JSON array, reading the
+    body in READ_SIZE chunks so only one element at a time is held in memory.
+    Raises ValueError if the body is not a well-formed array.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        # Drop what has been consumed, then append the next chunk
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = stream.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + text.decode(chunk or b'', final=eof)
+        pos = 0
+        return bool(chunk)
+
+    def skip_whitespace() -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != '[':
+        raise ValueError('Expected a JSON array')
+    pos += 1
+    skip_whitespace()
+
+    first = True
+    while True:
+        if pos >= len(buffer):
+            raise ValueError('Unterminated JSON array')
+        if buffer[pos] == ']':
+            return
+        if not first:
+            if buffer[pos] != ',':
+                raise ValueError(f'Expected "," or "]" in JSON array, got {buffer[pos]!r}')
+            pos += 1
+            skip_whitespace()
+
+        # Only trust a decode that ends before the buffered text does: a number
+        # cut off at the end of a chunk would otherwise parse as a shorter one
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                if end < len(buffer) or eof:
+                    break
+            except ValueError:
+                if eof:
+                    raise
+            fill()
+
+        yield item, None
+        first = False
+        pos = end
+        skip_whitespace()
@@ -0,0 +1,24 @@
+import json
+import base64
+
+
+def encode_cursor(values: list) -> str:
+    """
+    Opaque, URL-safe cursor for the sort key of the last row on a page
+    """
+    encoded = base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode('utf-8'))
+    return encoded.decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """
+    Inverse of encode_cursor; raises ValueError unless it holds `size` integers
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != size or not all(type(value) is int for value in values):
+        raise ValueError('Invalid cursor')
+    return values
@@ -0,0 +1,145 @@
+import os
+import atexit
+import threading
+
+
+class PlayCounterBuffer:
+    """
+    Write-behind buffer for play counts. Plays are summed per song in memory and
+    flushed as one `increment_play_counts` RPC call, either every
+    `flush_interval` seconds or as soon as `max_pending` plays are waiting.
+    Deltas from a failed flush are merged back and retried, so no play is lost.
+    """
+
+    def __init__(self, client, flush_interval: float = 5, max_pending: int = 1000):
+        self.client = client
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending = {}
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def add(self, music_id, delta: int = 1) -> None:
+        self.start()
+        music_id = str(music_id)
+        with self._lock:
+            self._pending[music_id] = self._pending.get(music_id, 0) + delta
+            self._pending_total += delta
+            full = self._pending_total >= self.max_pending
+
+        if full:
+            self._wakeup.set()
+
+    def pending(self) -> dict:
+        with self._lock:
+            return dict(self._pending)
+
+    def on_flush(self, listener) -> None:
+        """
+        Register a callback that receives {music_id: new_play_count} after each flush
+        """
+        self._listeners.append(listener)
+
+    def flush(self) -> dict:
+        """
+        Send all pending deltas in a single RPC and return the new totals
+        """
+        with self._flush_lock:
+            with self._lock:
+                deltas = self._pending
+                self._pending = {}
+                self._pending_total = 0
+
+            if not deltas:
+                return {}
+
+            try:
+                result = self.client.rpc('increment_play_counts', {'deltas': deltas}).execute()
+            except Exception:
+                # Put the deltas back so the next flush retries them
+                with self._lock:
+                    for music_id, delta in deltas.items():
+                        self._pending[music_id] = self._pending.get(music_id, 0) + delta
+                        self._pending_total += delta
+                raise
+
+            totals = {str(row['id']): row['play_count'] for row in result.data or []}
+
+        for listener in self._listeners:
+            try:
+                listener(totals)
+            except Exception as e:
+                print(f'Play count listener failed: {str(e)}')
+
+        return totals
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f'Play count flush failed: {str(e)}')
+
+    def start(self) -> None:
+        """
+        Start the flusher thread in this process if it is not running yet
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, name='play-counter', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        """
+        Stop the flusher thread and write out whatever is still pending
+        """
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f'Play count flush failed: {str(e)}')
+
+
+def increment_play_count(client, music_id, delta: int = 1):
+    """
+    Atomically add `delta` to one song's play count; returns the new count or None if not found
+    """
+    result = client.rpc('increment_play_count', {'music_id': int(music_id), 'delta': delta}).execute()
+    return result.data
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_play_counter(client) -> PlayCounterBuffer:
+    """
+    Return the process-wide play counter buffer; its flusher starts on the first play
+    """
+    global _buffer
+
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = PlayCounterBuffer(
+                client,
+                flush_interval=float(os.getenv('PLAY_COUNT_FLUSH_INTERVAL', '5')),
+                max_pending=int(os.getenv('PLAY_COUNT_MAX_PENDING', '1000')),
+            )
+            atexit.register(_buffer.stop)
+
+        return _buffer
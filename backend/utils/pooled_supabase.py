@@ -0,0 +1,37 @@
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient
+from supabase import Client
+
+from utils.http_pool import InstrumentedTransport, http2_enabled, pool_limits, pool_timeout
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """
+    PostgREST client whose session goes through the given (instrumented, pooled) transport
+    """
+
+    def __init__(self, base_url: str, headers: dict, schema: str, timeout, transport: InstrumentedTransport):
+        self._transport = transport
+        super().__init__(base_url, headers=headers, schema=schema, timeout=timeout)
+
+    def create_session(self, base_url: str, headers: dict, timeout) -> SyncClient:
+        return SyncClient(base_url=base_url, headers=headers, timeout=timeout, transport=self._transport)
+
+
+class PooledClient(Client):
+    """
+    Supabase client with explicit connection pool limits, keep-alive, timeouts
+    and HTTP/2 (where available) for its PostgREST traffic
+    """
+
+    def __init__(self, supabase_url: str, supabase_key: str):
+        limits = pool_limits()
+        self.http2 = http2_enabled()
+        self.max_connections = limits.max_connections
+        self.transport = InstrumentedTransport(limits=limits, http2=self.http2)
+        self._timeout = pool_timeout()
+        super().__init__(supabase_url, supabase_key)
+
+    def _init_postgrest_client(self, rest_url: str, headers: dict, schema: str, timeout=None) -> PooledPostgrestClient:
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema, timeout=self._timeout,
+                                     transport=self.transport)
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Low-overhead wall-clock profiler for hot-path investigation in a running
+    worker: a daemon thread snapshots every thread's stack each `interval`
+    seconds and counts them in the collapsed format flamegraph tools read
+    ("frame;frame;frame count"). Off until started; stops itself after
+    `duration` seconds so a forgotten session does not keep sampling.
+    """
+
+    def __init__(self, max_depth: int = 64):
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._started_at = None
+        self._interval = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005, duration: float = 30.0) -> bool:
+        """
+        Start a new session, discarding the previous one. False if already running.
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = Counter()
+            self._samples = 0
+            self._interval = interval
+            self._started_at = time.time()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(interval, duration, self._stop),
+                                            name='sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> None:
+        thread = self._thread
+        self._stop.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self, interval: float, duration: float, stop: threading.Event) -> None:
+        own = threading.get_ident()
+        deadline = time.monotonic() + duration
+        while not stop.wait(interval) and time.monotonic() < deadline:
+            stacks = [self._collapse(frame) for ident, frame in sys._current_frames().items() if ident != own]
+            with self._lock:
+                self._stacks.update(stacks)
+                self._samples += 1
+
+    def _collapse(self, frame) -> str:
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            code = frame.f_code
+            frames.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+            frame = frame.f_back
+        return ';'.join(reversed(frames))
+
+    def collapsed(self, limit: int = None) -> str:
+        """
+        The stacks seen so far, most frequent first
+        """
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'running': self.running,
+                'started_at': self._started_at,
+                'interval': self._interval,
+                'samples': self._samples,
+                'stacks': len(self._stacks),
+            }
+
+
+# Process-wide profiler; each gunicorn worker samples only itself
+profiler = SamplingProfiler()
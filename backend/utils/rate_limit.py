@@ -0,0 +1,53 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills `rate` tokens per second and banks at
+    most `capacity` of them, so short bursts pass and the long-run rate is capped
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take `tokens` if they are available. Returns 0.0 on success, otherwise
+        the seconds until they will be (nothing is taken in that case).
+        """
+        if tokens > self.capacity:
+            raise ValueError('Cannot take more tokens than the bucket holds')
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1, timeout: float = None) -> bool:
+        """
+        Block until `tokens` are taken; False if that would take longer than `timeout`
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def available(self) -> float:
+        with self._lock:
+            return min(self.capacity, self._tokens + (time.monotonic() - self._updated) * self.rate)
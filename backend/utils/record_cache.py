@@ -0,0 +1,37 @@
+import os
+
+from utils.cache import TTLCache
+from utils.http_cache import build_cached_body
+from utils.repositories import gift_repository, capsule_repository
+
+# Per-record caches for the shared gift/capsule links, keyed by the id from the URL.
+# Every write to a row must invalidate its key.
+gift_cache = TTLCache(
+    'gifts',
+    maxsize=int(os.getenv('RECORD_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('RECORD_CACHE_TTL', '60'))
+)
+capsule_cache = TTLCache(
+    'capsules',
+    maxsize=int(os.getenv('RECORD_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('RECORD_CACHE_TTL', '60'))
+)
+
+
+def _load_row(repository, record_id):
+    row = repository.get(record_id, repository.public_columns)
+    return build_cached_body(row) if row is not None else None
+
+
+def get_cached_gift(gift_id):
+    """
+    Cache entry whose value is the gift's CachedBody, or None if it does not exist
+    """
+    return gift_cache.get_or_load_entry(str(gift_id), lambda: _load_row(gift_repository, gift_id))
+
+
+def get_cached_capsule(capsule_id):
+    """
+    Cache entry whose value is the capsule's CachedBody, or None if it does not exist
+    """
+    return capsule_cache.get_or_load_entry(str(capsule_id), lambda: _load_row(capsule_repository, capsule_id))
@@ -0,0 +1,208 @@
+"""
+Data access for each table. Routes and background jobs go through these
+instead of building PostgREST queries inline, so the storage backend
+(Supabase, or the in-memory one with DATA_BACKEND=memory) is chosen in one
+place and every query a table serves can be read side by side.
+"""
+from datetime import datetime, timedelta
+
+from utils.supabase_client import supabase
+
+
+def _unclaimed_filter(now: datetime) -> str:
+    """
+    PostgREST `or` filter for rows nobody holds a live notification claim on
+    """
+    # Timestamps contain PostgREST reserved characters (`:` and `.`), so the value is quoted
+    return f'notification_claimed_until.is.null,notification_claimed_until.lt."{now.isoformat()}"'
+
+
+class Repository:
+    table = None
+    # Columns the API serves a row with; the rest stays server-side and off the wire
+    public_columns = '*'
+
+    def __init__(self, client):
+        self.client = client
+
+    def public(self, row: dict) -> dict:
+        """
+        Project a full row (e.g. returned by an UPDATE) onto public_columns
+        """
+        if self.public_columns == '*':
+            return row
+        return {column: row.get(column) for column in self.public_columns.split(',')}
+
+    def query(self):
+        return self.client.table(self.table)
+
+    def get(self, record_id, columns: str = '*'):
+        """
+        The row with this id, or None
+        """
+        result = self.query().select(columns).eq('id', record_id).execute()
+        return result.data[0] if result.data else None
+
+    def insert(self, values: dict):
+        """
+        Insert one row and return it as stored, or None
+        """
+        result = self.query().insert(values).execute()
+        return result.data[0] if result.data else None
+
+    def insert_many(self, rows: list) -> list:
+        """
+        One multi-row insert; PostgREST returns the rows in request order
+        """
+        return self.query().insert(rows).execute().data or []
+
+    def update(self, record_id, values: dict) -> list:
+        return self.query().update(values).eq('id', record_id).execute().data or []
+
+    def iter_rows(self, columns: str = '*', filters: list = (), page_size: int = 1000):
+        """
+        Walk the table in id order with keyset pagination (id > last id), so
+        each query is an index range scan however deep the walk goes.
+        `filters` are (operator, column, value) triples such as ('gte', 'created_at', ...).
+        """
+        last_id = None
+
+        while True:
+            query = self.query().select(columns)
+            for operator, column, value in filters:
+                query = getattr(query, operator)(column, value)
+            if last_id is not None:
+                query = query.gt('id', last_id)
+
+            rows = query.order('id').limit(page_size).execute().data or []
+            yield from rows
+
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]['id']
+
+
+class GiftRepository(Repository):
+    table = 'gifts'
+    public_columns = 'id,sender_name,recipient_name,card_template,message,is_viewed,created_at'
+
+    def mark_viewed(self, gift_id) -> list:
+        return self.update(gift_id, {'is_viewed': True})
+
+
+class CapsuleRepository(Repository):
+    table = 'time_capsules'
+    public_columns = 'id,title,message,media_url,media_thumbnail_url,open_date,is_opened,created_at'
+
+    def open_if_due(self, capsule_id, now: datetime):
+        """
+        Set is_opened with one conditional UPDATE (open_date <= now); the updated row, or None
+        """
+        result = (
+            self.query()
+            .update({'is_opened': True})
+            .eq('id', capsule_id)
+            .lte('open_date', now.isoformat())
+            .execute()
+        )
+        return result.data[0] if result.data else None
+
+    def due_page(self, now: datetime, after_id, limit: int) -> list:
+        """
+        Pending, unclaimed capsules whose open_date has passed, in id order after `after_id`
+        """
+        query = (
+            self.query()
+            .select('id,creator_email,title,open_date')
+            .eq('notification_sent', False)
+            .eq('is_opened', False)
+            .lte('open_date', now.isoformat())
+            .or_(_unclaimed_filter(now))
+        )
+        if after_id is not None:
+            query = query.gt('id', after_id)
+        return query.order('id').limit(limit).execute().data or []
+
+    def claim_notifications(self, capsule_ids: list, token: str, now: datetime, lease: float) -> list:
+        """
+        Take the notification claim of the pending, unclaimed capsules among
+        `capsule_ids` for `lease` seconds; returns the claimed rows
+        """
+        result = (
+            self.query()
+            .update({
+                'notification_claim_token': token,
+                'notification_claimed_until': (now + timedelta(seconds=lease)).isoformat()
+            })
+            .in_('id', capsule_ids)
+            .eq('notification_sent', False)
+            .eq('is_opened', False)
+            .or_(_unclaimed_filter(now))
+            .execute()
+        )
+        return result.data or []
+
+    def finish_notification_claim(self, token: str, sent: bool) -> list:
+        """
+        Clear the claim `token` still holds, marking its capsules as notified if `sent`
+        """
+        payload = {'notification_claim_token': None, 'notification_claimed_until': None}
+        if sent:
+            payload['notification_sent'] = True
+        return self.query().update(payload).eq('notification_claim_token', token).execute().data or []
+
+    def upcoming(self, start: datetime, end: datetime, limit: int) -> list:
+        """
+        Pending capsules opening in (start, end], earliest first
+        """
+        result = (
+            self.query()
+            .select('id,open_date')
+            .eq('notification_sent', False)
+            .eq('is_opened', False)
+            .gt('open_date', start.isoformat())
+            .lte('open_date', end.isoformat())
+            .order('open_date')
+            .limit(limit)
+            .execute()
+        )
+        return result.data or []
+
+
+class MusicRepository(Repository):
+    table = 'music_jars'
+
+    def page(self, columns: str, jar_type: str = None, sort: str = 'newest', after: list = None,
+             limit: int = 20) -> list:
+        """
+        One page of songs, newest first or most played first (sort='play_count').
+        `after` is the sort key of the previous page's last row: [id], or
+        [play_count, id] when sorting by play count.
+        """
+        query = self.query().select(columns)
+        if jar_type:
+            query = query.eq('jar_type', jar_type)
+
+        if sort == 'play_count':
+            if after:
+                play_count, last_id = after
+                query = query.or_(f'play_count.lt.{play_count},and(play_count.eq.{play_count},id.lt.{last_id})')
+            query = query.order('play_count', desc=True)
+        elif after:
+            query = query.lt('id', after[0])
+
+        return query.order('id', desc=True).limit(limit).execute().data or []
+
+
+class JarTypeRepository(Repository):
+    table = 'jar_types'
+    public_columns = 'id,name,emoji,description,color'
+
+    def all(self) -> list:
+        return self.query().select(self.public_columns).execute().data or []
+
+
+gift_repository = GiftRepository(supabase)
+capsule_repository = CapsuleRepository(supabase)
+music_repository = MusicRepository(supabase)
+jar_type_repository = JarTypeRepository(supabase)
@@ -0,0 +1,293 @@
+import os
+import time
+import queue
+import smtplib
+import threading
+
+from utils import metrics
+from utils.rate_limit import TokenBucket
+
+
+def _is_disconnect(error: Exception) -> bool:
+    """
+    True when the error means the session is dead rather than the message being rejected
+    """
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        # 421: service not available, closing transmission channel
+        return getattr(error, 'smtp_code', None) == 421
+    return isinstance(error, OSError)
+
+
+class _PooledConnection:
+    """
+    An authenticated SMTP session plus the bookkeeping the pool needs
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` authenticated SMTP sessions alive and reuses them across sends.
+    A session is recycled after `max_messages_per_connection` messages and is
+    transparently reconnected when the server drops it. With a `rate_limiter`
+    every message first takes a token, which caps the account's send rate
+    across all sessions of the pool.
+    """
+
+    def __init__(self, host: str, port: int, username: str = None, password: str = None,
+                 use_ssl: bool = True, size: int = 2, max_messages_per_connection: int = 100,
+                 idle_timeout: float = 60, timeout: float = 30, rate_limiter: TokenBucket = None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.size = size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._stats = {
+            'connections_opened': 0,
+            'reused': 0,
+            'reconnects': 0,
+            'recycled': 0,
+            'messages_sent': 0,
+            'failures': 0,
+            'throttled': 0,
+        }
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def _connect(self) -> _PooledConnection:
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            server.ehlo()
+
+        if self.username and self.password and server.has_extn('auth'):
+            server.login(self.username, self.password)
+
+        self._count('connections_opened')
+        return _PooledConnection(server)
+
+    @staticmethod
+    def _close(conn: _PooledConnection) -> None:
+        try:
+            conn.server.quit()
+        except Exception:
+            try:
+                conn.server.close()
+            except Exception:
+                pass
+
+    def _acquire(self) -> _PooledConnection:
+        self._slots.acquire()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+
+        # Sessions idle for a while may have been dropped by the server
+        if time.monotonic() - conn.last_used > self.idle_timeout:
+            try:
+                conn.server.noop()
+            except Exception:
+                self._close(conn)
+                self._count('reconnects')
+                try:
+                    return self._connect()
+                except Exception:
+                    self._slots.release()
+                    raise
+
+        self._count('reused')
+        return conn
+
+    def _release(self, conn: _PooledConnection, broken: bool = False) -> None:
+        if conn is None:
+            # Reopening the session failed, there is nothing left to close or keep
+            pass
+        elif broken:
+            self._close(conn)
+        elif conn.messages_sent >= self.max_messages_per_connection:
+            self._close(conn)
+            self._count('recycled')
+        else:
+            conn.last_used = time.monotonic()
+            self._idle.put(conn)
+        self._slots.release()
+
+    @staticmethod
+    def _mail_options(conn: _PooledConnection, message) -> list:
+        # Pre-rendered messages carry an 8bit UTF-8 body
+        if isinstance(message, bytes) and conn.server.has_extn('8bitmime'):
+            return ['BODY=8BITMIME']
+        return []
+
+    def _throttle(self) -> None:
+        if self.rate_limiter is not None and self.rate_limiter.try_acquire():
+            self._count('throttled')
+            self.rate_limiter.acquire()
+
+    def _send_on(self, conn: _PooledConnection, from_addr: str, to_addrs, message: str) -> _PooledConnection:
+        """
+        Send one message, reconnecting once if the session turns out to be dead.
+        Returns the connection that should go back to the pool. On failure the
+        exception carries it as `connection` instead, since the session may have
+        been replaced first; None if no new session could be opened.
+        """
+        try:
+            if conn.messages_sent >= self.max_messages_per_connection:
+                self._close(conn)
+                self._count('recycled')
+                conn = None
+                conn = self._connect()
+
+            try:
+                with metrics.timed('smtp'):
+                    conn.server.sendmail(from_addr, to_addrs, message, self._mail_options(conn, message))
+            except OSError as e:
+                if not _is_disconnect(e):
+                    raise
+                self._close(conn)
+                self._count('reconnects')
+                conn = None
+                conn = self._connect()
+                with metrics.timed('smtp'):
+                    conn.server.sendmail(from_addr, to_addrs, message, self._mail_options(conn, message))
+        except Exception as e:
+            e.connection = conn
+            raise
+
+        conn.messages_sent += 1
+        self._count('messages_sent')
+        return conn
+
+    def send(self, from_addr: str, to_addrs, message: str) -> None:
+        """
+        Send a single message over a pooled session
+        """
+        self.send_many([(from_addr, to_addrs, message)], raise_on_error=True)
+
+    def send_many(self, messages: list, raise_on_error: bool = False) -> list:
+        """
+        Send (from_addr, to_addrs, message) tuples over one session.
+        Returns a list of booleans in the same order as `messages`.
+        """
+        results = []
+        conn = self._acquire()
+        broken = False
+
+        try:
+            for from_addr, to_addrs, message in messages:
+                try:
+                    self._throttle()
+                    conn = self._send_on(conn, from_addr, to_addrs, message)
+                    results.append(True)
+                except Exception as e:
+                    # The session in use now, which _send_on may have replaced or lost
+                    conn = getattr(e, 'connection', conn)
+                    if conn is None:
+                        broken = True
+                    if not isinstance(e, OSError):
+                        raise
+                    self._count('failures')
+                    if _is_disconnect(e):
+                        # Reconnecting did not help, give up on this session
+                        broken = True
+                    if raise_on_error:
+                        raise
+                    if broken:
+                        results.extend([False] * (len(messages) - len(results)))
+                        break
+                    # Recipient/message level rejection, the session is still usable
+                    results.append(False)
+        finally:
+            self._release(conn, broken)
+
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['idle'] = self._idle.qsize()
+        stats['size'] = self.size
+        stats['rate_limit'] = self.rate_limiter.rate if self.rate_limiter else None
+        return stats
+
+    def close(self) -> None:
+        """
+        Close every idle session
+        """
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """
+    Return this process's SMTP pool, configured from environment variables
+    """
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            username = os.getenv('EMAIL_USER')
+            password = os.getenv('EMAIL_PASSWORD')
+
+            if not username or not password:
+                raise ValueError('EMAIL_USER and EMAIL_PASSWORD must be set')
+
+            # One bucket per account; SMTP_RATE_LIMIT=0 turns throttling off
+            rate = float(os.getenv('SMTP_RATE_LIMIT', '10'))
+            burst = float(os.getenv('SMTP_RATE_BURST', str(max(rate, 1))))
+            rate_limiter = TokenBucket(rate, burst) if rate > 0 else None
+
+            _pool = SMTPConnectionPool(
+                host=os.getenv('SMTP_HOST', 'smtp.gmail.com'),
+                port=int(os.getenv('SMTP_PORT', '465')),
+                username=username,
+                password=password,
+                use_ssl=os.getenv('SMTP_USE_SSL', 'true').lower() == 'true',
+                size=int(os.getenv('SMTP_POOL_SIZE', '2')),
+                max_messages_per_connection=int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', '100')),
+                rate_limiter=rate_limiter,
+            )
+            _pool_pid = os.getpid()
+
+        return _pool
+
+
+def smtp_pool_stats() -> dict:
+    """
+    Return the pool stats for this process, or an empty dict if nothing was sent yet
+    """
+    if _pool is None or _pool_pid != os.getpid():
+        return {}
+    return _pool.stats()
@@ -1,17 +1,75 @@
 import os
-from supabase import create_client, Client
+import threading
 
-def get_supabase_client() -> Client:
+
+def get_data_backend() -> str:
+    backend = os.getenv('DATA_BACKEND', 'supabase').lower()
+    if backend not in ('supabase', 'memory'):
+        raise ValueError('DATA_BACKEND must be "supabase" or "memory"')
+    return backend
+
+
+def get_supabase_client():
     """
     Initialize and return Supabase client
+    The supabase package is imported here rather than at module import, so
+    starting the app (or a CLI/test) does not pay for its dependency tree.
+    DATA_BACKEND=memory returns an in-process backend instead (local runs and
+    benchmarks; each worker process has its own data)
     """
+    if get_data_backend() == 'memory':
+        from utils.memory_backend import create_memory_backend
+        return create_memory_backend()
+
     url = os.getenv('SUPABASE_URL')
     key = os.getenv('SUPABASE_KEY')
 
     if not url or not key:
         raise ValueError('SUPABASE_URL and SUPABASE_KEY must be set in environment variables')
 
-    return create_client(url, key)
+    from utils.pooled_supabase import PooledClient
+    return PooledClient(url, key)
+
+
+class ProcessLocalClient:
+    """
+    Stands in for the Supabase client and builds the real one on first use in
+    each process. Sockets of a pool created before gunicorn forks would be
+    shared by every worker, so a worker never reuses its parent's client.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._client = self._factory()
+                    self._pid = os.getpid()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
 
-# Create a singleton instance
-supabase = get_supabase_client()
+# Process-wide client; the first query in each process opens its pool
+supabase = ProcessLocalClient(get_supabase_client)
+
+
+def supabase_pool_stats() -> dict:
+    """
+    Pool metrics of this process's client (empty until it has been used)
+    """
+    if not isinstance(supabase, ProcessLocalClient) or supabase._pid != os.getpid():
+        return {}
+    client = supabase.get()
+    if not hasattr(client, 'transport'):
+        return {}
+    stats = client.transport.stats()
+    stats['http2'] = client.http2
+    stats['max_connections'] = client.max_connections
+    return stats
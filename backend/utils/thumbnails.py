@@ -0,0 +1,130 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import metrics
+from utils.media_storage import get_media_storage, original_key, thumbnail_key, has_thumbnail
+
+try:
+    from PIL import Image
+except ImportError:  # optional, see requirements-media.txt
+    Image = None
+
+MEDIA_THUMBNAIL_WORKERS = int(os.getenv('MEDIA_THUMBNAIL_WORKERS', '2'))
+# Longest side of a thumbnail, in pixels
+MEDIA_THUMBNAIL_SIZE = int(os.getenv('MEDIA_THUMBNAIL_SIZE', '640'))
+# Uploads waiting for a thumbnail beyond this are skipped rather than queued without bound
+MEDIA_THUMBNAIL_MAX_PENDING = int(os.getenv('MEDIA_THUMBNAIL_MAX_PENDING', '100'))
+
+
+def render_thumbnail(data: bytes, size: int = MEDIA_THUMBNAIL_SIZE) -> bytes:
+    """
+    A JPEG no larger than size x size of the image in `data`
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        # Lets the JPEG decoder skip straight to a reduced scale instead of decoding every pixel
+        image.draft('RGB', (size, size))
+        image.thumbnail((size, size))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=80, optimize=True, progressive=True)
+        return output.getvalue()
+
+
+class ThumbnailPool:
+    """
+    Renders capsule thumbnails on a few background threads, so an upload
+    returns as soon as the file is stored and view-capsule.html can show a
+    small preview instead of loading the original. The same upload queued
+    twice is rendered once. `on_ready` callbacks run with the thumbnail's URL
+    once it is stored (or found already stored), never if rendering fails.
+    """
+
+    def __init__(self, workers: int = MEDIA_THUMBNAIL_WORKERS, max_pending: int = MEDIA_THUMBNAIL_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        # media_id -> on_ready callbacks of a queued render
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stats = {'queued': 0, 'generated': 0, 'existing': 0, 'failed': 0, 'skipped': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and self.workers > 0
+
+    def submit(self, media_id: str, on_ready=None) -> bool:
+        """
+        Queue a thumbnail for this upload; False if none will be rendered
+        """
+        if not self.enabled or not has_thumbnail(media_id):
+            return False
+
+        with self._lock:
+            callbacks = self._pending.get(media_id)
+            if callbacks is not None:
+                if on_ready is not None:
+                    callbacks.append(on_ready)
+                return True
+            if len(self._pending) >= self.max_pending:
+                self._stats['skipped'] += 1
+                return False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='thumbnail')
+            self._pending[media_id] = [on_ready] if on_ready is not None else []
+            self._stats['queued'] += 1
+
+        self._executor.submit(self._render, media_id)
+        return True
+
+    def _render(self, media_id: str) -> None:
+        try:
+            storage = get_media_storage()
+            if storage.exists(thumbnail_key(media_id)):
+                outcome = 'existing'
+            else:
+                data = storage.read(original_key(media_id))
+                with metrics.timed('render'):
+                    thumbnail = render_thumbnail(data)
+                storage.write(thumbnail_key(media_id), thumbnail, 'image/jpeg')
+                outcome = 'generated'
+        except Exception as e:
+            print(f'Thumbnail for {media_id} failed: {str(e)}')
+            outcome = 'failed'
+
+        with self._lock:
+            callbacks = self._pending.pop(media_id, [])
+            self._stats[outcome] += 1
+
+        if outcome == 'failed':
+            return
+        url = storage.public_url(thumbnail_key(media_id))
+        for callback in callbacks:
+            try:
+                callback(url)
+            except Exception as e:
+                print(f'Thumbnail callback for {media_id} failed: {str(e)}')
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        stats['enabled'] = self.enabled
+        return stats
+
+
+thumbnail_pool = ThumbnailPool()
+
+
+def media_payload(storage, media_id: str, check_thumbnail: bool = True) -> dict:
+    """
+    The URLs an upload is served from; thumbnail_url is None until its thumbnail is stored
+    """
+    thumbnail = check_thumbnail and has_thumbnail(media_id) and storage.exists(thumbnail_key(media_id))
+    return {
+        'media_id': media_id,
+        'media_url': storage.public_url(original_key(media_id)),
+        'thumbnail_url': storage.public_url(thumbnail_key(media_id)) if thumbnail else None
+    }
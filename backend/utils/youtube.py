@@ -0,0 +1,48 @@
+import re
+from urllib.parse import urlsplit, parse_qs
+
+_VIDEO_ID = re.compile(r'[A-Za-z0-9_-]{11}')
+
+_YOUTUBE_HOSTS = {'youtube.com', 'm.youtube.com', 'music.youtube.com', 'youtube-nocookie.com'}
+
+# Path prefixes that are followed by the video id on youtube.com
+_ID_PATHS = ('embed', 'shorts', 'live', 'v', 'e')
+
+
+def extract_video_id(url: str):
+    """
+    Return the 11-character video id of a YouTube link, or None if it is not one.
+    Accepts watch, youtu.be, embed, shorts and live links on any YouTube host,
+    with or without scheme, as well as a bare video id.
+    """
+    if not isinstance(url, str):
+        return None
+    url = url.strip()
+
+    if _VIDEO_ID.fullmatch(url):
+        return url
+
+    if '://' not in url:
+        url = f'https://{url}'
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    segments = [segment for segment in parts.path.split('/') if segment]
+
+    candidate = None
+    if host == 'youtu.be':
+        candidate = segments[0] if segments else None
+    elif host in _YOUTUBE_HOSTS:
+        if segments == ['watch']:
+            candidate = (parse_qs(parts.query).get('v') or [None])[0]
+        elif len(segments) >= 2 and segments[0] in _ID_PATHS:
+            candidate = segments[1]
+
+    if candidate and _VIDEO_ID.fullmatch(candidate):
+        return candidate
+    return None
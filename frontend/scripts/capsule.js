@@ -1,6 +1,41 @@
 // Global variable to store capsule link
 let currentCapsuleLink = '';
 
+// Upload a file straight to storage with a signed URL; returns its media_id
+async function uploadMedia(file) {
+    const response = await fetch('http://localhost:5000/api/media/uploads', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ content_type: file.type, size: file.size })
+    });
+
+    const data = await response.json();
+
+    if (!response.ok) {
+        throw new Error(data.error || 'Dosya yüklenemedi');
+    }
+
+    // The browser streams the file; it never goes through a JSON request
+    const upload = await fetch(data.upload.url, {
+        method: data.upload.method,
+        headers: data.upload.headers,
+        body: file
+    });
+
+    if (!upload.ok) {
+        throw new Error('Dosya yüklenemedi');
+    }
+
+    // Direct-to-storage uploads are reported back so the thumbnail gets rendered
+    if (data.complete_url) {
+        await fetch(data.complete_url, { method: 'POST' });
+    }
+
+    return data.media_id;
+}
+
 // Capsule form handler
 document.getElementById('capsuleForm').addEventListener('submit', async (e) => {
     e.preventDefault();
@@ -23,6 +58,7 @@ document.getElementById('capsuleForm').addEventListener('submit', async (e) => {
         media_url: document.getElementById('media_url').value || null,
         open_date: openDate.toISOString()
     };
+    const mediaFile = document.getElementById('media_file').files[0];
 
     // Disable submit button
     const submitBtn = document.getElementById('submitBtn');
@@ -35,6 +71,12 @@ document.getElementById('capsuleForm').addEventListener('submit', async (e) => {
     document.getElementById('copyCapsuleSuccess').classList.add('hidden');
 
     try {
+        if (mediaFile) {
+            submitBtn.textContent = 'Dosya yükleniyor...';
+            formData.media_id = await uploadMedia(mediaFile);
+            submitBtn.textContent = 'Oluşturuluyor...';
+        }
+
         const response = await fetch('http://localhost:5000/api/capsules', {
             method: 'POST',
             headers: {
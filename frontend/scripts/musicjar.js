@@ -3,6 +3,13 @@ let jarTypes = [];
 let currentJarType = null;
 let currentMusicId = null;
 
+// Per-browser id so the API can avoid repeating the songs this listener just heard
+let clientId = localStorage.getItem('musicClientId');
+if (!clientId) {
+    clientId = Math.random().toString(36).slice(2) + Date.now().toString(36);
+    localStorage.setItem('musicClientId', clientId);
+}
+
 // Load jar types on page load
 window.addEventListener('DOMContentLoaded', () => {
     loadJarTypes();
@@ -74,7 +81,7 @@ async function selectJar(jarType) {
     document.getElementById('playerSection').classList.add('hidden');
 
     try {
-        const response = await fetch(`http://localhost:5000/api/music/random/${jarType}`);
+        const response = await fetch(`http://localhost:5000/api/music/random/${encodeURIComponent(jarType)}?no_repeat=true&client_id=${clientId}`);
 
         if (!response.ok) {
             throw new Error('Bu jar\'da henüz müzik bulunmuyor');
@@ -225,7 +232,7 @@ async function getRandomMusicAny() {
     currentJarType = null;
 
     try {
-        const response = await fetch('http://localhost:5000/api/music/random');
+        const response = await fetch(`http://localhost:5000/api/music/random?no_repeat=true&client_id=${clientId}`);
 
         if (!response.ok) {
             throw new Error('Henüz müzik bulunmuyor');